@@ -77,6 +77,13 @@ def system(params):
     return sys
 
 
+def derived_system(reference, params):
+
+    # same system as system(params), sharing the mesh and the unchanged
+    # arrays with the reference system
+    rho_GB, E_GB, S_GB, tau = params
+    gb = {'N': rho_GB, 'E': E_GB, 'sigma_e': S_GB, 'sigma_h': S_GB}
+    return reference.derive(tau_e=tau, tau_h=tau, defects={0: gb, 1: gb})
 
 
 if __name__ == '__main__':
@@ -105,12 +112,15 @@ if __name__ == '__main__':
 
     my_param_indices = range(mpirank,njobs,mpisize)
 
+    # the systems of all parameter sets are derived from this one
+    reference = system(paramlist[0])
+
     # cycle over all parameter sets
     for myjobcounter in my_param_indices:
 
         # Get system for given set of parameters
         params = paramlist[myjobcounter]
-        sys = system(params)
+        sys = derived_system(reference, params)
 
         # Get equilibrium solution
         eqsolution = sesame.solve(sys, 'Poisson')
@@ -125,8 +135,10 @@ if __name__ == '__main__':
         for paramvalue in params:
             outputfile = outputfile + '{0}_'.format(paramvalue)
 
-        # Compute J-V curve
-        jv = sesame.IVcurve(sys, voltages, eqsolution, outputfile)
+        # Compute J-V curve, continuing from its checkpoint if the job was
+        # interrupted
+        jv = sesame.IVcurve(sys, voltages, outputfile, guess=eqsolution,
+                            resume=True)
         # Save computed J-V in array
         jvset_local[myjobcounter,:] = jv
 
@@ -17,7 +17,16 @@ for module in __all__:
 
 available = [('builder', ['Scaling', 'Builder']),
              ('solvers', ['solve', 'IVcurve']),
-             ('analyzer', ['Analyzer'])]
+             ('analyzer', ['Analyzer']),
+             ('integration', ['integrate']),
+             ('batch', ['analyze']),
+             ('response', ['ac_analysis', 'current_sensitivities',
+                           'generation_scan', 'eqe']),
+             ('merit', ['figures_of_merit']),
+             ('surrogate', ['Surrogate']),
+             ('mesh', ['interpolate']),
+             ('store', ['SweepStore', 'AsyncWriter', 'open_sim']),
+             ('warmstart', ['SolutionDatabase'])]
 for module, names in available:
     exec('from .{0} import {1}'.format(module, ', '.join(names)))
     __all__.extend(names)
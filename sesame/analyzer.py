@@ -3,8 +3,9 @@
 # This file is part of Sesame. It is subject to the license terms in the file
 # LICENSE.rst found in the top-level directory of this distribution.
 
-from scipy.interpolate import InterpolatedUnivariateSpline as spline, interp2d
-from .utils import Bresenham, get_indices
+from .utils import Bresenham, get_indices, get_defect_segments, get_cached
+from .integration import integrate, quadrature_weights, cross_section_weights
+from .currents import current_field
 from .observables import *
 from .defects import defectsF
 
@@ -35,6 +36,15 @@ class Analyzer():
         Dictionary containing 1D arrays of electron and hole quasi-Fermi levels
         and the electrostatic potential across the system. Keys must be 'efn',
         'efp', and/or 'v'.
+
+    Notes
+    -----
+    The carrier densities, recombination rates, currents and line paths are
+    computed for the entire system the first time they are needed and kept by
+    the instance: later queries, including those on lines, index the stored
+    arrays. The methods return copies of the stored arrays, which can be
+    modified freely. The arrays of the solution must not be modified after
+    the creation of the Analyzer (or :meth:`clear_cache` must be called).
     """
 
     def __init__(self, sys, data):
@@ -54,7 +64,65 @@ class Analyzer():
             self.efp = 0 * self.v
 
         # sites of the system
-        self.sites = np.arange(sys.nx*sys.ny, dtype=int)
+        self.sites = np.arange(sys.nx*sys.ny*sys.nz, dtype=int)
+
+        # derived fields computed so far
+        self._cache = {}
+
+    def clear_cache(self):
+        """
+        Remove the stored densities, recombination rates, currents and line
+        paths, e.g. after a modification of the solution.
+        """
+        self._cache.clear()
+
+    def _cached(self, key, compute):
+        # Value stored under key, computed by compute() the first time. Stored
+        # arrays are read-only, the public methods return copies of them.
+        try:
+            return self._cache[key]
+        except KeyError:
+            value = compute()
+            if isinstance(value, np.ndarray):
+                value.flags.writeable = False
+            self._cache[key] = value
+            return value
+
+    def _line_sites(self, location):
+        # curvilinear abscissa and sites of the line between two points
+        p1, p2 = location
+        key = ('line', tuple(p1[:2]), tuple(p2[:2]))
+        return self._cached(key, lambda: self.line(self.sys, p1, p2))
+
+    def _select(self, field, location):
+        # copy of the values of a field of the entire system, or values on a
+        # line if given
+        if location is None:
+            return field.copy()
+        _, sites = self._line_sites(location)
+        return field[sites]
+
+    def _n(self):
+        return self._cached('n', lambda: get_n(self.sys, self.efn, self.v,
+                                               self.sites))
+
+    def _p(self):
+        return self._cached('p', lambda: get_p(self.sys, self.efp, self.v,
+                                               self.sites))
+
+    def _rr(self, mec):
+        # recombination rate of a bulk mechanism for the entire system
+        def compute():
+            n, p = self._n(), self._p()
+            sys = self.sys
+            excess = n*p - sys.ni**2
+            if mec == 'srh':
+                return excess / (sys.tau_h * (n+sys.n1) + sys.tau_e * (p+sys.p1))
+            if mec == 'auger':
+                return (sys.Cn * n + sys.Cp * p) * excess
+            if mec == 'radiative':
+                return sys.B * excess
+        return self._cached(('rr', mec), compute)
 
     @staticmethod
     def line(system, p1, p2):
@@ -113,7 +181,7 @@ class Analyzer():
             X = self.sys.xpts[idx1:idx2]
             sites = np.arange(idx1, idx2, 1, dtype=int)
         if self.sys.dimension == 2:
-            X, sites = self.line(self.sys, p1, p2)
+            X, sites = self._line_sites(location)
 
         show = False
         if fig is None:
@@ -160,13 +228,7 @@ class Analyzer():
         hole_density
 
         """
-        if location is None:
-            sites = self.sites
-        else:
-            p1, p2 = location
-            _, sites = self.line(self.sys, p1, p2)
-        n = get_n(self.sys, self.efn, self.v, sites)
-        return n
+        return self._select(self._n(), location)
 
     def hole_density(self, location=None):
         """
@@ -187,13 +249,7 @@ class Analyzer():
         electron_density
 
         """
-        if location is None:
-            sites = self.sites
-        else:
-            p1, p2 = location
-            _, sites = self.line(self.sys, p1, p2)
-        p = get_p(self.sys, self.efp, self.v, sites)
-        return p
+        return self._select(self._p(), location)
 
     def bulk_srh_rr(self, location=None):
         """
@@ -210,22 +266,7 @@ class Analyzer():
         r: numpy array
             An array with the values of recombination.
         """
-        if location is None:
-            sites = self.sites
-        else:
-            p1, p2 = location
-            _, sites = self.line(self.sys, p1, p2)
-        p = get_p(self.sys, self.efp, self.v, sites)
-
-        ni2 = self.sys.ni[sites]**2
-        n1 = self.sys.n1[sites]
-        p1 = self.sys.p1[sites]
-        tau_h = self.sys.tau_h[sites]
-        tau_e = self.sys.tau_e[sites]
-        n = get_n(self.sys, self.efn, self.v, sites)
-        p = get_p(self.sys, self.efp, self.v, sites)
-        r = (n*p - ni2)/(tau_h * (n+n1) + tau_e*(p+p1))
-        return r
+        return self._select(self._rr('srh'), location)
 
     def auger_rr(self, location=None):
         """
@@ -242,17 +283,7 @@ class Analyzer():
         r: numpy array
             An array with the values of recombination.
         """
-        if location is None:
-            sites = self.sites
-        else:
-            p1, p2 = location
-            _, sites = self.line(self.sys, p1, p2)
-
-        n = get_n(self.sys, self.efn, self.v, sites)
-        p = get_p(self.sys, self.efp, self.v, sites)
-        ni2 = self.sys.ni[sites]**2
-        r = self.sys.Cn[sites] * n * (n*p - ni2) + self.sys.Cp[sites] * p * (n*p - ni2)
-        return r
+        return self._select(self._rr('auger'), location)
 
     def radiative_rr(self, location=None):
         """
@@ -268,17 +299,7 @@ class Analyzer():
         r: numpy array
             An array with the values of recombination.
         """
-        if location is None:
-            sites = self.sites
-        else:
-            p1, p2 = location
-            _, sites = self.line(self.sys, p1, p2)
-
-        n = get_n(self.sys, self.efn, self.v, sites)
-        p = get_p(self.sys, self.efp, self.v, sites)
-        ni2 = self.sys.ni[sites]**2
-        r = self.sys.B[sites] * (n*p - ni2)
-        return r
+        return self._select(self._rr('radiative'), location)
 
     def defect_rr(self, defect):
         """
@@ -297,17 +318,20 @@ class Analyzer():
             An array with the values of recombination at each sites.
         """
 
-        # Create arrays to pass to defectsF
-        n = self.electron_density()
-        p = self.hole_density()
-        rho = np.zeros_like(n) 
-        r = np.zeros_like(n)
+        def compute():
+            # Create arrays to pass to defectsF
+            n, p = self._n(), self._p()
+            rho = np.zeros_like(n)
+            r = np.zeros_like(n)
 
-        # Update r (and rho but we don't use it)
-        defectsF(self.sys, [defect], n, p, rho, r=r)
-        r = np.multiply(r[defect.sites],defect.perp_dl)
+            # Update r (and rho but we don't use it)
+            defectsF(self.sys, [defect], n, p, rho, r=r)
+            r = np.multiply(r[defect.sites], defect.perp_dl)
+            # the defect is kept with its recombination so that its id is not
+            # reused while stored
+            return defect, r
 
-        return r
+        return self._cached(('defect', id(defect)), compute)[1].copy()
 
     def total_rr(self):
         """
@@ -320,27 +344,25 @@ class Analyzer():
             An array with the values of the total recombination at each sites.
         """
 
-        srh = self.bulk_srh_rr()
-        radiative = self.radiative_rr()
-        auger = self.auger_rr()
-        defects = np.zeros_like(srh)
-        for defect in self.sys.defects_list:
-            sites = defect.sites
-            defects[sites] += self.defect_rr(defect)
+        def compute():
+            r = self._rr('srh') + self._rr('radiative') + self._rr('auger')
+            for defect in self.sys.defects_list:
+                r[defect.sites] += self.defect_rr(defect)
+            return r
 
-        return srh + radiative + auger + defects
+        return self._cached('total_rr', compute).copy()
 
 
     def electron_current(self, component='x', location=None):
         """
-        Compute the electron current either by component (x or y) across the
-        entire system, or on a line defined by two points.
+        Compute the electron current either by component (x, y or z) across
+        the entire system, or on a line defined by two points.
 
         Parameters
         ----------
         component: string
-            Current direction ``'x'`` or ``'y'``. By default returns all currents
-            in the x-direction.
+            Current direction ``'x'``, ``'y'`` or ``'z'``. By default returns all
+            currents in the x-direction.
         location: array-like ((x1,y1), (x2,y2))
             Tuple of two points defining a line over which to compute the electron
             current.
@@ -350,33 +372,18 @@ class Analyzer():
         jn: numpy array of floats
         """
 
-        if location is not None:
-            p1, p2 = location
-            X, sites = self.line(self.sys, p1, p2)
-            jn = get_jn(self.sys, self.efn, self.v, sites[:-1], sites[1:], X[1:]-X[:-1])
-        else:
-            Nx, Ny = self.sys.nx, self.sys.ny
-            sites = self.sites.reshape(Ny, Nx)
-            if component == 'x':
-                sites = sites[:Ny, :Nx-1].flatten()
-                dx = np.tile(self.sys.dx, Ny)
-                jn = get_jn(self.sys, self.efn, self.v, sites, sites+1, dx)
-            if component == 'y':
-                sites = sites[:Ny-1, :Nx].flatten()
-                dy = np.repeat(self.sys.dy, Nx)
-                jn = get_jn(self.sys, self.efn, self.v, sites, sites+Nx, dy)
-        return jn
+        return self._current(get_jn, self.efn, component, location).copy()
 
     def hole_current(self, component='x', location=None):
         """
-        Compute the hole current either by component (x or y) across the entire
-        system, or on a line defined by two points.
+        Compute the hole current either by component (x, y or z) across the
+        entire system, or on a line defined by two points.
 
         Parameters
         ----------
         component: string
-            Current direction ``'x'`` or ``'y'``. By default returns all currents
-            in the x-direction.
+            Current direction ``'x'``, ``'y'`` or ``'z'``. By default returns all
+            currents in the x-direction.
         location: array-like ((x1,y1), (x2,y2))
             Tuple of two points defining a line over which to compute the hole
             current.
@@ -386,22 +393,42 @@ class Analyzer():
         jp: numpy array of floats
         """
 
+        return self._current(get_jp, self.efp, component, location).copy()
+
+    def _current(self, get_j, ef, component, location):
+        # current of a carrier (get_jn or get_jp with its quasi-Fermi level)
+        # along a component or along a line
         if location is not None:
             p1, p2 = location
-            X, sites = self.line(self.sys, p1, p2)
-            jp = get_jp(self.sys, self.efp, self.v, sites[:-1], sites[1:], X[1:]-X[:-1])
+            key = (get_j.__name__, 'line', tuple(p1[:2]), tuple(p2[:2]))
+            def compute():
+                X, sites = self._line_sites(location)
+                return get_j(self.sys, ef, self.v, sites[:-1], sites[1:],
+                             X[1:]-X[:-1])
         else:
-            Nx, Ny = self.sys.nx, self.sys.ny
-            sites = self.sites.reshape(Ny, Nx)
-            if component == 'x':
-                sites = sites[:Ny, :Nx-1].flatten()
-                dx = np.tile(self.sys.dx, Ny)
-                jp = get_jp(self.sys, self.efp, self.v, sites, sites+1, dx)
-            if component == 'y':
-                sites = sites[:Ny-1, :Nx].flatten()
-                dy = np.repeat(self.sys.dy, Nx)
-                jp = get_jp(self.sys, self.efp, self.v, sites, sites+Nx, dy)
-        return jp
+            key = (get_j.__name__, component)
+            def compute():
+                sites, neighbors, dl = self._component_sites(component)
+                return get_j(self.sys, ef, self.v, sites, neighbors, dl)
+        return self._cached(key, compute)
+
+    def _component_sites(self, component):
+        # Sites, their neighbors in the direction of the component and the
+        # lattice distances between them
+        Nx, Ny, Nz = self.sys.nx, self.sys.ny, self.sys.nz
+        sites = self.sites.reshape(Nz, Ny, Nx)
+        if component == 'x':
+            sites = sites[:, :, :Nx-1].flatten()
+            dl = np.tile(self.sys.dx, Ny*Nz)
+            return sites, sites+1, dl
+        if component == 'y':
+            sites = sites[:, :Ny-1, :].flatten()
+            dl = np.tile(np.repeat(self.sys.dy[:Ny-1], Nx), Nz)
+            return sites, sites+Nx, dl
+        if component == 'z':
+            sites = sites[:Nz-1, :, :].flatten()
+            dl = np.repeat(self.sys.dz[:Nz-1], Nx*Ny)
+            return sites, sites+Nx*Ny, dl
 
     def electron_current_map(self, cmap='gnuplot', scale=1e4):
         """
@@ -431,7 +458,51 @@ class Analyzer():
         """
         self.current_map(False, cmap, scale)
 
+    def current_field(self, electron=True, shape=(100, 100)):
+        """
+        Compute the current of a 2D system on a uniform grid.
+
+        The currents between neighboring sites are resampled bilinearly on a
+        uniform grid covering the system (see
+        :func:`~sesame.currents.current_field`).
+
+        Parameters
+        ----------
+        electron: boolean
+            Electron current if True, hole current otherwise.
+        shape: tuple of integers
+            Number of points of the grid in the y- and x-directions.
+
+        Returns
+        -------
+        x, y: numpy arrays of floats
+            Coordinates of the grid, in the units of the mesh of the system.
+        jx, jy: numpy arrays of floats
+            Components of the current on the grid.
+        """
+        def compute():
+            get_j, ef = (get_jn, self.efn) if electron else (get_jp, self.efp)
+            return current_field(self.sys, self._current(get_j, ef, 'x', None),
+                                 self._current(get_j, ef, 'y', None), shape)
+        field = self._cached(('current_field', electron, tuple(shape)), compute)
+        return tuple(a.copy() for a in field)
+
     def current_map(self, electron, cmap, scale, fig=None):
+        """
+        Plot a 2D map of the electron or hole current.
+
+        Parameters
+        ----------
+        electron: boolean
+            Electron current if True, hole current otherwise.
+        cmap: Matplotlib color map
+            Color map used for the plot.
+        scale: float
+            Scale to apply to the axes of the plot.
+        fig: Maplotlib figure
+            A plot is added to it if given. If not given, a new one is created
+            and displayed.
+        """
 
         if not mpl_enabled:
             raise RuntimeError("matplotlib was not found, but is required "
@@ -445,43 +516,24 @@ class Analyzer():
         # add axis to figure
         ax = fig.add_subplot(111)
 
-        Lx = self.sys.xpts[-2] * scale
-        Ly = self.sys.ypts[-2] * scale
-
-        x, y = self.sys.xpts[:-1], self.sys.ypts[:-1]
-        nx, ny = len(x), len(y)
-        
-        s = np.asarray([i + j*self.sys.nx for j in range(self.sys.ny-1)\
-                                     for i in range(self.sys.nx-1)])
-        dx = np.tile(self.sys.dx, ny)
-        dy = np.repeat(self.sys.dy, nx)
+        x, y, jx, jy = self.current_field(electron)
+        jx = jx * self.sys.scaling.current * 1e3
+        jy = jy * self.sys.scaling.current * 1e3
+        norm = np.sqrt(jx**2 + jy**2)
+        x, y = x * scale, y * scale
 
         if electron:
-            Jx = get_jn(self.sys, self.efn, self.v, s, s+1, dx)
-            Jy = get_jn(self.sys, self.efn, self.v, s, s+(nx+1), dy)
             title = r'$\mathregular{J_{n}\ [mA\cdot cm^{-2}]}$'
         else:
-            Jx = get_jp(self.sys, self.efp, self.v, s, s+1, dx)
-            Jy = get_jp(self.sys, self.efp, self.v, s, s+(nx+1), dy)
             title = r'$\mathregular{J_{p}\ [mA\cdot cm^{-2}]}$'
 
-        Jx = np.reshape(Jx, (ny, nx)) * self.sys.scaling.current * 1e3
-        Jy = np.reshape(Jy, (ny, nx)) * self.sys.scaling.current * 1e3
-
-        jx = interp2d(x*scale, y*scale, Jx, kind='linear')
-        jy = interp2d(x*scale, y*scale, Jy, kind='linear')
-
-        xx, yy = np.linspace(0, Lx, 100), np.linspace(0, Ly, 100)
-        jnx, jny = jx(xx, yy), jy(xx, yy)
-        norm = np.sqrt(jnx**2 + jny**2)
-
-        y, x = np.mgrid[0:Ly:100j, 0:Lx:100j]
-        p = ax.pcolor(x, y, norm, cmap=cmap, rasterized=True)
+        p = ax.pcolormesh(x, y, norm, cmap=cmap, shading='nearest',
+                          rasterized=True)
         cbar = fig.colorbar(p, ax=ax)
 
-        ax.streamplot(x, y, jnx, jny, linewidth=1, color='#a9a9a9', density=2)
-        ax.set_xlim(xmax=Lx, xmin=0)
-        ax.set_ylim(ymin=0, ymax=Ly)
+        ax.streamplot(x, y, jx, jy, linewidth=1, color='#a9a9a9', density=2)
+        ax.set_xlim(xmin=x[0], xmax=x[-1])
+        ax.set_ylim(ymin=y[0], ymax=y[-1])
 
         ax.set_xlabel(r'x [$\mathregular{\mu m}$]')
         ax.set_ylabel(r'y [$\mathregular{\mu m}$]')
@@ -534,10 +586,6 @@ class Analyzer():
         -------
         JR: float
             The integrated bulk recombination.
-
-        Warnings
-        --------
-        Not implemented in 3D.
         """
         return self.integrated_recombination('srh')
 
@@ -549,10 +597,6 @@ class Analyzer():
         -------
         JR: float
             The integrated Auger recombination.
-
-        Warnings
-        --------
-        Not implemented in 3D.
         """
         return self.integrated_recombination('auger')
 
@@ -564,39 +608,14 @@ class Analyzer():
         -------
         JR: float
             The integrated radiative recombination.
-
-        Warnings
-        --------
-        Not implemented in 3D.
         """
         return self.integrated_recombination('radiative')
 
     def integrated_recombination(self, mec):
-        # Compute recombination averywhere
-        if mec == 'srh':
-            r = self.bulk_srh_rr()
-        if mec == 'auger':
-            r = self.auger_rr()
-        if mec == 'radiative':
-            r = self.radiative_rr()
-
-        # Integrate along x for each y (if any
-        x = self.sys.xpts / self.sys.scaling.length
-        if self.sys.ny > 1:
-            y = self.sys.ypts / self.sys.scaling.length
-        u = []
-        for j in range(self.sys.ny):
-            # List of sites
-            s = [i + j*self.sys.nx for i in range(self.sys.nx)]
-            sp = spline(x, r[s])
-            u.append(sp.integral(x[0], x[-1]))
-        if self.sys.ny == 1:
-            JR = u[-1]
-        if self.sys.ny > 1:
-            sp = spline(y, u)
-            JR = sp.integral(y[0], y[-1])
-        return JR
-     
+        # Integrate the recombination of the entire system with the spline
+        # weights of the mesh
+        return integrate(self.sys, self._rr(mec))
+
     def integrated_defect_recombination(self, defect):
         """
         Integrate the recombination along a defect in 2D.
@@ -610,48 +629,140 @@ class Analyzer():
         --------
         Not implemented in 3D.
         """
-        # Find the path along which to integrate
-        p1 = defect.location[0]
-        p2 = defect.location[1]
-        X, _ = self.line(self.sys, p1, p2)
+        # recombination on the sites of the defect
+        r = np.zeros((self.sys.nx * self.sys.ny,))
+        r[defect.sites] = self.defect_rr(defect)
 
-        # interpolate recombination and integrate
-        r = self.defect_rr(defect)
-        sp = spline(X, r)
-        JD = sp.integral(X[0], X[-1])
+        # interpolate recombination and integrate along each segment
+        JD = 0
+        for p1, p2 in get_defect_segments(defect.location):
+            X, sites = self._line_sites((p1, p2))
+            if len(X) < 2: # segment within a cell
+                continue
+            JD += quadrature_weights(X).dot(r[sites])
 
         return JD
 
 
-    def full_current(self):
+    def full_current(self, method='planes'):
         """
-        Compute the steady state current in 1D and 2D.
+        Compute the steady state current in 1D, 2D and 3D.
+
+        By default the current is integrated over the cross section of every
+        plane between two columns of sites and averaged over the planes (see
+        :meth:`terminal_current`).
+
+        Parameters
+        ----------
+        method: string
+            'planes' (default) for the average over all the planes, 'middle'
+            for the current of the plane in the middle of the system only,
+            integrated with the spline weights of the cross section (the
+            current returned by earlier versions of Sesame).
 
         Returns
         -------
         J: float
             The integrated full steady state current.
         """
+        j = self._current(get_jn, self.efn, 'x', None) + \
+            self._current(get_jp, self.efp, 'x', None)
+        if method == 'planes':
+            W, _, _ = _terminal_weights(self.sys)
+            return W.dot(j)
+        if method == 'middle':
+            nx = self.sys.nx
+            return cross_section_weights(self.sys).dot(j.reshape(-1, nx-1)[:, nx//2])
+        raise ValueError("Unknown current method '{0}'.".format(method))
+
+    def terminal_current(self):
+        """
+        Compute the steady state current from all the planes of the system,
+        with the continuity error of the solution.
+
+        The electron and hole currents in the x-direction are integrated over
+        the cross section of every plane between two columns of sites, with the
+        control volumes of the discretization. The total current is then the
+        same on all planes for an exact solution of the continuity equations,
+        and the terminal current is the average over the planes weighted by
+        their thickness. The electron (hole) current of each plane is brought
+        back to the plane next to the left contact by adding (subtracting) the
+        generation minus the recombination of the sites in between.
 
-        # System number of sites
-        nx, ny= self.sys.nx, self.sys.ny
-
-        # Define the sites between which computing the currents
-        sites_i = [nx//2 + j*nx  for j in range(ny)]
-        sites_ip1 = [nx//2+1+j*nx  for j in range(ny)]
-        # And the corresponding lattice dimensions
-        dl = self.sys.dx[self.sys.nx//2]
-
-        # Compute the electron and hole currents
-        jn = get_jn(self.sys, self.efn, self.v, sites_i, sites_ip1, dl)
-        jp = get_jp(self.sys, self.efp, self.v, sites_i, sites_ip1, dl)
-
-        if ny == 1:
-            j = jn[0] + jp[0]
-        if ny > 1:
-            # Interpolate the results and integrate over the y-direction
-            y = self.sys.ypts / self.sys.scaling.length
-            j = spline(y, jn+jp).integral(y[0], y[-1])
-
-
-        return j
+        Returns
+        -------
+        current: dictionary
+            Dictionary with the keys
+
+            * 'current': terminal current (as returned by :meth:`full_current`),
+            * 'electron', 'hole': electron and hole currents next to the left
+              contact, averaged over the planes,
+            * 'planes': total current of each plane (nx-1 values),
+            * 'error': largest deviation of the currents of the planes from
+              their average, relative to the largest carrier current. It
+              measures how well the solution conserves the current, and
+              decreases with the tolerance of the solver.
+        """
+        sys = self.sys
+        nx = sys.nx
+        _, w, a = _terminal_weights(sys)
+
+        # currents of the carriers through every plane
+        In = w.dot(self._current(get_jn, self.efn, 'x', None).reshape(len(w), nx-1))
+        Ip = w.dot(self._current(get_jp, self.efp, 'x', None).reshape(len(w), nx-1))
+        I = In + Ip
+        scale = np.max(np.abs(In) + np.abs(Ip))
+
+        # generation minus recombination of each column of inner sites with
+        # the rates of the continuity equations
+        def compute():
+            n, p = self._n(), self._p()
+            r = get_bulk_rr(sys, n, p)
+            if len(sys.defects_list) != 0:
+                defectsF(sys, sys.defects_list, n, p, np.zeros_like(n), r)
+            return sys.g - r
+        u = self._cached('continuity', compute).reshape(len(w), nx)
+        dxbar = (sys.dx[:-1] + sys.dx[1:]) / 2
+        S = np.concatenate(([0], np.cumsum(w.dot(u[:, 1:nx-1]) * dxbar)))
+        In, Ip = In + S, Ip - S
+
+        J, Jn, Jp = a.dot(I), a.dot(In), a.dot(Ip)
+        error = 0.
+        if scale > 0:
+            error = max(np.max(np.abs(I - J)), np.max(np.abs(In - Jn))) / scale
+
+        return {'current': J, 'electron': Jn, 'hole': Jp, 'planes': I,
+                'error': error}
+
+
+def _control_widths(d, n):
+    # Widths of the control volumes of the n nodes of a direction from the
+    # lattice distances d to the next node, the last one across the edge of
+    # the system (infinite without periodic boundary conditions, missing in
+    # systems saved by older versions)
+    if len(d) < n:
+        d = np.append(d, np.inf)
+    dm = np.roll(d, 1)
+    with np.errstate(invalid='ignore'):
+        return np.where(np.isinf(dm), d / 2,
+                        np.where(np.isinf(d), dm / 2, (dm + d) / 2))
+
+
+def _terminal_weights(sys):
+    # Weights of the currents between the sites i and i+1 of the entire system
+    # (ordered as the sites i) in the terminal current, weights of the cross
+    # section of a plane and weights of the planes. The cross section is
+    # integrated with the control volumes of the discretization, so that the
+    # total current is conserved from one plane to the next, normalized to the
+    # width of the integrals over the system. The planes are weighted by their
+    # thickness.
+    def compute(sys):
+        w = np.ones(1)
+        if sys.ny > 1:
+            w = _control_widths(sys.dy, sys.ny)
+        if sys.nz > 1:
+            w = np.outer(_control_widths(sys.dz, sys.nz), w).flatten()
+        w = w * cross_section_weights(sys).sum() / w.sum()
+        a = sys.dx / sys.dx.sum()
+        return np.outer(w, a).flatten(), w, a
+    return get_cached(sys, 'terminal_weights', compute)
@@ -0,0 +1,296 @@
+# Copyright 2017 University of Maryland.
+#
+# This file is part of Sesame. It is subject to the license terms in the file
+# LICENSE.rst found in the top-level directory of this distribution.
+
+import numpy as np
+import os
+import pickle
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from .analyzer import Analyzer
+from .store import SweepStore, open_sim, is_sweep, is_raw, signature, dump, load
+
+import logging
+
+__all__ = ['analyze']
+
+
+# name of the index of the results of a directory
+_index_name = 'analysis.index'
+_index_version = 1
+_extensions = ('.gzip', '.npz', '.sweep')
+
+
+###############################################################################
+#                               quantities                                    #
+###############################################################################
+def integrated_defects_recombination(az):
+    """Recombination integrated along all the defects of a system."""
+    return sum(az.integrated_defect_recombination(defect) \
+               for defect in az.sys.defects_list)
+
+
+def integrated_total_recombination(az):
+    """Sum of the integrated bulk and defect recombination of a system."""
+    return az.integrated_bulk_srh_recombination() \
+         + az.integrated_radiative_recombination() \
+         + az.integrated_auger_recombination() \
+         + integrated_defects_recombination(az)
+
+
+def continuity_error(az):
+    """Continuity error of the terminal current of a solution."""
+    return az.terminal_current()['error']
+
+
+# quantities available by name in addition to the methods of the Analyzer
+_derived = {f.__name__: f for f in (integrated_defects_recombination,
+                                    integrated_total_recombination,
+                                    continuity_error)}
+
+
+def _frozen(value):
+    # hashable and printable form of the arguments of a quantity
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return tuple(_frozen(v) for v in value)
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _definition(spec):
+    # Key of a quantity in the index, and its definition (function or name of
+    # a method of the Analyzer, arguments)
+    if callable(spec):
+        return '{0}.{1}'.format(spec.__module__, spec.__qualname__), (spec, ())
+    if isinstance(spec, str):
+        return spec, (spec, ())
+    name, args = spec[0], _frozen(spec[1:])
+    return '{0}{1}'.format(name, args), (name, args)
+
+
+def _evaluate(az, definition):
+    func, args = definition
+    if not callable(func):
+        func = _derived[func] if func in _derived else getattr(Analyzer, func)
+    value = func(az, *args)
+    if np.ndim(value) == 0:
+        return float(value)
+    return np.array(value)
+
+
+def _analyze_files(jobs, definitions):
+    # Quantities of the solutions (filename, index) computed in one process.
+    # The previous Analyzer is still referenced when the next system is
+    # accessed, so that the files of a sweep share their system.
+    values, az = [], None
+    for filename, idx in jobs:
+        sim = open_sim(filename, 0 if idx is None else idx)
+        az = Analyzer(sim.system, sim.result)
+        values.append({key: _evaluate(az, definition) \
+                       for key, definition in definitions.items()})
+    return values
+
+
+###############################################################################
+#                            solutions and index                              #
+###############################################################################
+def _natural(name):
+    # sort key putting file_name_10 after file_name_9
+    return [int(t) if t.isdigit() else t for t in re.split(r'(\d+)', name)]
+
+
+def _is_result(filename):
+    # files of a directory opened by open_sim
+    if not filename.endswith(_extensions):
+        return False
+    if filename.endswith('.gzip'):
+        return True
+    return is_raw(filename) or is_sweep(filename)
+
+
+def _sources(source):
+    # files of the source and default name of the index
+    if isinstance(source, str) and os.path.isdir(source):
+        names = sorted(os.listdir(source), key=_natural)
+        files = [os.path.join(source, name) for name in names]
+        files = [name for name in files if _is_result(name)]
+        return files, os.path.join(source, _index_name)
+    if isinstance(source, str):
+        return [source], source + '.index'
+    files = list(source)
+    folders = {os.path.dirname(os.path.abspath(name)) for name in files}
+    if len(folders) == 1:
+        return files, os.path.join(folders.pop(), _index_name)
+    return files, None
+
+
+def _read_index(filename):
+    if filename is None or not os.path.exists(filename):
+        return {}
+    try:
+        data = load(filename)
+    except Exception:
+        logging.warning("The index {0} could not be read, it is computed "\
+                        "again.".format(filename))
+        return {}
+    if not isinstance(data, dict) or data.get('version') != _index_version:
+        return {}
+    return data['entries']
+
+
+def _write_index(filename, entries):
+    data = {'version': _index_version, 'entries': entries}
+    dump(pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL), filename,
+         compression='gzip', level=1)
+
+
+def _stacked(values):
+    # array of the values of all the solutions, or list if their shapes differ
+    if len({np.shape(v) for v in values}) <= 1:
+        return np.array(values)
+    return list(values)
+
+
+def analyze(source, quantities, index=None, processes=None):
+    """
+    Compute quantities for all the solutions of a sweep, and store them in an
+    index read by later calls.
+
+    Each solution is opened once, and all the quantities are computed from the
+    same :class:`~sesame.analyzer.Analyzer`. The solutions missing from the
+    index are distributed among worker processes. The index is a small file
+    next to the results, with the values of every quantity computed so far
+    for each solution. A solution whose file changed is analyzed again. When
+    all the quantities are in the index, no result file is opened.
+
+    Parameters
+    ----------
+    source: string or list of strings
+        Directory containing the results (all the files ``.gzip``, results
+        ``.npz`` written by :func:`~sesame.store.save_raw` and sweep stores),
+        sweep store, or list of result files.
+    quantities: list or dictionary
+        Quantities to compute, given by:
+
+        * the name of a method of the :class:`~sesame.analyzer.Analyzer`
+          without arguments (e.g. ``'full_current'``,
+          ``'integrated_bulk_srh_recombination'``, ``'total_rr'``), or one of
+          ``'integrated_defects_recombination'``,
+          ``'integrated_total_recombination'``, ``'continuity_error'``,
+        * a tuple (name, arguments...) for a method with arguments, e.g.
+          ``('electron_density', ((x1, y1), (x2, y2)))`` for the density on a
+          line,
+        * a function of an Analyzer, defined at the top level of a module so
+          that it can be sent to the worker processes.
+
+        A dictionary gives names to the quantities in the result.
+    index: string
+        Name of the index file. By default, ``analysis.index`` in the
+        directory of the results, or the name of the sweep store followed by
+        ``.index``. Set to False to compute the quantities without index.
+    processes: integer
+        Number of worker processes, the number of processors by default. With
+        1, the quantities are computed in the calling process.
+
+    Returns
+    -------
+    data: dictionary
+        Values of the quantities for all the solutions (arrays, or lists for
+        arrays of different sizes), with the keys of the dictionary of
+        quantities or the quantities themselves (tuples are converted to
+        strings, functions to their qualified name). The entries ``'files'``
+        and ``'indices'`` give the file and the index in a sweep store (None
+        for other files) of each solution.
+
+    Examples
+    --------
+    Current-voltage curve and line profiles of a sweep, computed once:
+
+    >>> data = sesame.analyze('IV.sweep', {'J': 'full_current',
+    ...                       'n': ('electron_density', ((0, 1e-4), (3e-4, 1e-4)))})
+    >>> J = data['J'] * sys.scaling.current
+    """
+    if isinstance(quantities, dict):
+        names = list(quantities.keys())
+        specs = list(quantities.values())
+    else:
+        specs = list(quantities)
+        names = [_definition(spec)[0] for spec in specs]
+    definitions = dict(_definition(spec) for spec in specs)
+
+    files, default_index = _sources(source)
+    if index is None:
+        index = default_index
+    elif index is False:
+        index = None
+    folder = os.path.dirname(os.path.abspath(index)) if index else None
+
+    solutions = []
+    for filename in files:
+        if is_sweep(filename):
+            n = len(SweepStore(filename))
+            solutions.extend((filename, idx) for idx in range(n))
+        else:
+            solutions.append((filename, None))
+
+    # solutions whose quantities are missing from the index
+    entries = _read_index(index)
+    keys, missing = [], {}
+    for filename, idx in solutions:
+        name = os.path.abspath(filename)
+        if folder is not None:
+            name = os.path.relpath(name, folder)
+        key = (name, idx)
+        stamp = signature(filename, idx)
+        entry = entries.get(key)
+        if entry is None or entry['stamp'] != stamp:
+            entry = entries[key] = {'stamp': stamp, 'values': {}}
+        todo = {k: d for k, d in definitions.items() if k not in entry['values']}
+        if todo:
+            missing[key] = ((filename, idx), todo)
+        keys.append(key)
+
+    if missing:
+        logging.info("Analyzing {0} of {1} solutions, the others are read "\
+                     "from the index.".format(len(missing), len(solutions)))
+        # solutions with the same quantities to compute are grouped in chunks
+        # of consecutive solutions
+        groups = {}
+        for key, (job, todo) in missing.items():
+            groups.setdefault(tuple(sorted(todo)), []).append((key, job, todo))
+        if processes is None:
+            processes = os.cpu_count() or 1
+        try:
+            if processes == 1 or len(missing) == 1:
+                for group in groups.values():
+                    values = _analyze_files([job for _, job, _ in group],
+                                            group[0][2])
+                    for (key, _, _), v in zip(group, values):
+                        entries[key]['values'].update(v)
+            else:
+                with ProcessPoolExecutor(max_workers=processes) as executor:
+                    futures = []
+                    for group in groups.values():
+                        n = min(len(group), 4 * processes)
+                        for chunk in np.array_split(np.arange(len(group)), n):
+                            chunk = [group[c] for c in chunk]
+                            future = executor.submit(_analyze_files,
+                                     [job for _, job, _ in chunk], chunk[0][2])
+                            futures.append((chunk, future))
+                    for chunk, future in futures:
+                        for (key, _, _), v in zip(chunk, future.result()):
+                            entries[key]['values'].update(v)
+        finally:
+            # the quantities computed are kept even if a solution failed
+            if index:
+                _write_index(index, entries)
+
+    data = {'files': [filename for filename, _ in solutions],
+            'indices': [idx for _, idx in solutions]}
+    for name, spec in zip(names, specs):
+        key = _definition(spec)[0]
+        data[name] = _stacked([entries[k]['values'][key] for k in keys])
+    return data
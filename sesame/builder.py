@@ -3,14 +3,16 @@
 # This file is part of Sesame. It is subject to the license terms in the file
 # LICENSE.rst found in the top-level directory of this distribution.
 
-from scipy.interpolate import InterpolatedUnivariateSpline as spline
 import numpy as np
 import scipy.constants as cts
 from collections import namedtuple
 from itertools import product
 import warnings
+import copy
+from scipy.spatial import Voronoi
 
 from . import utils
+from .integration import integrate
 
 import logging
 logging.basicConfig(level=logging.DEBUG, format='%(levelname)s: %(message)s')
@@ -20,6 +22,11 @@ defect = namedtuple('defect', ['sites', 'location', \
                                'dos', 'energy', 'sigma_e', 'sigma_h',\
                                'transition', 'perp_dl'])
 
+# columns of the table of material parameters of compact systems
+material_fields = ['Nc', 'Nv', 'Eg', 'epsilon', 'mass_e', 'mass_h', 'mu_e',
+                   'mu_h', 'tau_e', 'tau_h', 'Etrap', 'bl', 'B', 'Cn', 'Cp',
+                   'n1', 'p1', 'ni']
+
 class Scaling():
     """
     An object defining the scalings of the drift-diffusion-Poisson equation. The
@@ -103,6 +110,13 @@ class Builder():
         and 'm' for meters.
     T: float
         Temperature for the simulation.
+    periodic: boolean
+        Periodic (True) or abrupt (False) boundary conditions in the y and z
+        directions.
+    compact: boolean
+        Store the material parameters as a table with one row per material,
+        and the index of the material of each site, instead of one array per
+        parameter (see Notes). Default is False.
 
 
     Attributes
@@ -111,8 +125,8 @@ class Builder():
         Mesh with original dimensions.
     dx, dy, dz: numpy arrays of floats
         Dimensionless lattice constants in the x, y, z directions.
-    nx, ny: integers
-        Number of lattice nodes in the x, y directions.
+    nx, ny, nz: integers
+        Number of lattice nodes in the x, y, z directions.
     Nc, Nv: numpy arrays of floats
         Dimensionless effective densities of states of the conduction and
         valence bands.
@@ -138,10 +152,32 @@ class Builder():
         List of named tuples containing the characteristics of the defects in the
         order they were added to the system. The field names are sites,
         location, dos, energy, sigma_e, sigma_h, transition, perp_dl.
+    region: numpy array of integers
+        Index of the material (row of ``materials``) of each site. Compact
+        systems only.
+    materials: numpy array of floats
+        Dimensionless material parameters, one row per material added to the
+        system (the first row is for sites without material) and one column
+        per name of ``sesame.builder.material_fields``. Compact systems only.
+
+    Notes
+    -----
+    In a compact system, the arrays of the material parameters (Nc, Nv, Eg,
+    ...) are created when they are accessed: a read-only array without memory
+    cost if the parameter is the same for all the materials, or the values of
+    the table gathered for each site otherwise. Only parameters given as
+    functions of the position are stored site by site. The arrays must not be
+    modified in place; assign a new array to the attribute instead.
+    Computations on a subset of sites can gather the values directly with
+    ``sys.materials[sys.region[sites], column]``.
+
+    Systems created with :func:`derive` share their arrays with the original
+    system until they are modified by the methods of the class.
     """
 
 
-    def __init__(self, xpts, ypts=np.zeros(1), input_length='cm', T=300, periodic=True):
+    def __init__(self, xpts, ypts=np.zeros(1), zpts=np.zeros(1), input_length='cm',
+                 T=300, periodic=True, compact=False):
 
         self.scaling = Scaling(input_length, T)
         self.input_length = input_length
@@ -166,7 +202,33 @@ class Builder():
 
         self.ny = ypts.shape[0]
 
-        nx, ny = self.nx, self.ny
+        # third dimension, with the same boundary conditions as in the
+        # y-direction
+        self.zpts = zpts
+        self.dz = (self.zpts[1:] - self.zpts[:-1]) / self.scaling.length
+        if len(self.dz) > 0:
+            if self.dimension == 1:
+                raise ValueError("A three-dimensional system requires a mesh "
+                                 "in the y-direction.")
+            self.dimension = 3
+            if periodic is True:
+                self.dz = np.append(self.dz, self.dz[0])
+            else:
+                self.dz = np.append(self.dz, np.inf)
+
+        self.nz = zpts.shape[0]
+
+        nx, ny = self.nx, self.ny * self.nz
+        self.defects_list = []
+        self.compact = compact
+        self.rho     = np.zeros((nx*ny,), dtype=float)
+        self.g       = np.zeros((nx*ny,), dtype=float)
+        if compact:
+            self.region = np.zeros((nx*ny,), dtype=np.int16)
+            self.materials = np.zeros((1, len(material_fields)))
+            self._used = np.zeros((1,), dtype=int)
+            return
+
         self.Nc      = np.zeros((nx*ny,), dtype=float)
         self.Nv      = np.zeros((nx*ny,), dtype=float)
         self.Eg      = np.zeros((nx*ny,), dtype=float)
@@ -180,14 +242,74 @@ class Builder():
         self.n1      = np.zeros((nx*ny,), dtype=float)
         self.p1      = np.zeros((nx*ny,), dtype=float)
         self.bl      = np.zeros((nx*ny,), dtype=float)
-        self.rho     = np.zeros((nx*ny,), dtype=float)
-        self.g       = np.zeros((nx*ny,), dtype=float)
         self.B       = np.zeros((nx*ny,), dtype=float)
         self.Cn      = np.zeros((nx*ny,), dtype=float)
         self.Cp      = np.zeros((nx*ny,), dtype=float)
         self.Etrap   = np.zeros((nx*ny,), dtype=float)
 
-        self.defects_list = []
+    def __getattr__(self, name):
+        # Arrays of the material parameters of compact systems. This is only
+        # called when the attribute is not found (parameters stored site by
+        # site are regular attributes).
+        materials = self.__dict__.get('materials')
+        if materials is None or name not in material_fields:
+            raise AttributeError(name)
+        column = materials[:, material_fields.index(name)]
+        values = column[self._used]
+        if np.all(values == values[0]):
+            return np.broadcast_to(values[0], self.region.shape)
+        return column[self.region]
+
+    def __dir__(self):
+        names = list(super().__dir__())
+        if self.__dict__.get('compact'):
+            names += [f for f in material_fields if f not in names]
+        return names
+
+    def __getstate__(self):
+        # the cached lattice quantities are computed again when needed
+        state = dict(self.__dict__)
+        state.pop('_cache', None)
+        state.pop('_shared', None)
+        return state
+
+    def __setstate__(self, state):
+        # systems saved before the support of three-dimensional and compact
+        # systems have a single node in the z-direction
+        state.setdefault('nz', 1)
+        state.setdefault('zpts', np.zeros(1))
+        state.setdefault('dz', np.zeros(0))
+        state.setdefault('compact', False)
+        self.__dict__.update(state)
+
+    def _own(self, *names):
+        # Copy the arrays shared with a derived (or parent) system before they
+        # are modified in place.
+        shared = self.__dict__.get('_shared', frozenset())
+        for name in shared.intersection(names):
+            setattr(self, name, np.array(self.__dict__[name]))
+        self._shared = shared.difference(names)
+
+    def _material_units(self):
+        # Default values of the material parameters (keys of add_material),
+        # attribute names of the keys that differ, and scales of the
+        # attributes
+        N = self.scaling.density
+        t = self.scaling.time
+        vt = self.scaling.energy
+        mu = self.scaling.mobility
+        if self.input_length == 'm':
+            mt = {'Nc': 1e25, 'Nv': 1e25, 'mu_e': 100e-4, 'mu_h': 100e-4}
+        else:
+            mt = {'Nc': 1e19, 'Nv': 1e19, 'mu_e': 100, 'mu_h': 100}
+        mt.update({'Eg': 1, 'epsilon': 1, 'mass_e': 1, 'mass_h': 1, 'Et': 0,
+                   'tau_e': 1e-6, 'tau_h': 1e-6, 'affinity': 0, 'B': 0,
+                   'Cn': 0, 'Cp': 0})
+        names = {'Et': 'Etrap', 'affinity': 'bl'}
+        scales = {'Nc': N, 'Nv': N, 'Eg': vt, 'mu_e': mu, 'mu_h': mu,
+                  'Etrap': vt, 'tau_e': t, 'tau_h': t, 'bl': vt,
+                  'B': (1./N)/t, 'Cn': (1./N**2)/t, 'Cp': (1./N**2)/t}
+        return mt, names, scales
 
     def add_material(self, mat, location=lambda pos: True):
         """
@@ -217,10 +339,17 @@ class Builder():
         # sites belonging to the region
         s, pos = get_sites(self, location)
 
+        if self.compact:
+            self._add_material_compact(mat, location, s, pos)
+            return
+
         N = self.scaling.density
         t = self.scaling.time
         vt = self.scaling.energy
         mu = self.scaling.mobility
+        self._own('Nc', 'Nv', 'Eg', 'epsilon', 'mass_e', 'mass_h', 'mu_e',
+                  'mu_h', 'Etrap', 'tau_e', 'tau_h', 'bl', 'B', 'Cn', 'Cp',
+                  'n1', 'p1')
 
         # default material parameters
         if self.input_length == 'm':
@@ -265,6 +394,58 @@ class Builder():
 
         self.ni = np.sqrt(self.Nc * self.Nv) * np.exp(-self.Eg/2)
 
+    def _add_material_compact(self, mat, location, s, pos):
+        # Add a row to the table of materials and assign it to the sites s.
+        # Parameters given as functions of the position are stored site by
+        # site.
+        mt, names, scales = self._material_units()
+
+        row = np.zeros((len(material_fields),))
+        values = {}
+        for key, val in mt.items():
+            if key in mat.keys():
+                val = mat[key]
+            name = names.get(key, key)
+            scale = scales.get(name, 1)
+            if not callable(val):
+                row[material_fields.index(name)] = val / scale
+            else:
+                values[name] = (val(pos) * location(pos))[s] / scale
+
+        # derived parameters
+        Nc, Nv, Eg, Et = [row[material_fields.index(k)] for k in \
+                          ('Nc', 'Nv', 'Eg', 'Etrap')]
+        row[material_fields.index('n1')] = np.sqrt(Nc * Nv) * np.exp(-Eg/2 + Et)
+        row[material_fields.index('p1')] = np.sqrt(Nc * Nv) * np.exp(-Eg/2 - Et)
+        row[material_fields.index('ni')] = np.sqrt(Nc * Nv) * np.exp(-Eg/2)
+
+        # parameters stored site by site (before the region map is updated)
+        dense = set(values) | set(f for f in material_fields \
+                                  if f in self.__dict__)
+        if dense & set(['Nc', 'Nv', 'Eg', 'Etrap']):
+            dense |= set(['n1', 'p1', 'ni'])
+        for name in dense:
+            if name not in self.__dict__:
+                setattr(self, name, np.array(getattr(self, name)))
+        self._own('region', *dense)
+
+        self.materials = np.vstack([self.materials, row])
+        self.region[s] = len(self.materials) - 1
+        self._used = np.unique(self.region)
+
+        for name in dense:
+            array = self.__dict__[name]
+            if name in values:
+                array[s] = values[name]
+            else:
+                array[s] = row[material_fields.index(name)]
+        if 'n1' in dense:
+            Nc, Nv, Eg, Et = [getattr(self, k)[s] for k in \
+                              ('Nc', 'Nv', 'Eg', 'Etrap')]
+            self.n1[s] = np.sqrt(Nc * Nv) * np.exp(-Eg/2 + Et)
+            self.p1[s] = np.sqrt(Nc * Nv) * np.exp(-Eg/2 - Et)
+            self.ni[s] = np.sqrt(Nc * Nv) * np.exp(-Eg/2)
+
     def add_defects(self, location, N, sigma_e, sigma_h=None, E=None,
                     transition=(1,-1)):
         """
@@ -275,7 +456,10 @@ class Builder():
         ----------
         location: float or list of two array_like coordinates [(x1, y1), (x2, y2)] 
             Coordinate(s) in [cm] of a point defect or the two end points
-            of a line defect.
+            of a line defect. More than two points define a polyline (the
+            segments joining consecutive points). In a three-dimensional
+            system, the line defines a plane parallel to the z-axis (columnar
+            grain boundary).
         N: float or function
             Defect density of states [cm\ :sup:`-2` ]. Provide a float when the
             defect density of states is a delta function, or a function
@@ -298,15 +482,8 @@ class Builder():
         if E is not None:
             E /= self.scaling.energy
 
-        if isinstance(location, float):
-            s, dl = utils.get_point_defects_sites(self, location)
-        elif len(location) == 2:
-            s, dl = utils.get_line_defects_sites(self, location)
-
-        else:
-            msg = "Wrong definition for the defects location: "\
-                  "the list must contain one number for a point, two points for a line."
-            logging.error(msg)
+        s, dl = self._defect_sites(location)
+        if s is None:
             return
 
         # The scale of the density of states is also the inverse of the scale 
@@ -325,8 +502,236 @@ class Builder():
         params = defect(s, location, f, E, sigma_e, sigma_h, transition, dl)
         self.defects_list.append(params)
 
+    def add_grain_boundaries(self, boundaries, N, sigma_e, sigma_h=None,
+                             E=None, transition=(1,-1)):
+        """
+        Add the grain boundaries of a polycrystalline film as a single defect.
+
+        All the boundaries are discretized at once, and the sites shared by
+        several boundaries (junctions, overlapping boundaries) are counted
+        once. The resulting defect has one entry in ``defects_list``, with
+        arrays of parameters (one value per site) when the boundaries have
+        different parameters. In a three-dimensional system, the boundaries
+        define planes parallel to the z-axis.
+
+        Parameters
+        ----------
+        boundaries: list of polylines or scipy.spatial.Voronoi
+            Polylines given as lists of two or more points [(x1, y1), (x2,
+            y2), ...] in [cm], or a Voronoi tessellation of the plane (x, y)
+            whose edges are clipped to the system.
+        N: float, array_like or function
+            Defect density of states [cm\ :sup:`-2` ], for all boundaries or
+            one value per boundary. Provide a function for a continuum of
+            states, see :func:`add_defects`.
+        sigma_e: float or array_like
+            Electron capture cross section [cm\ :sup:`2`], for all boundaries
+            or one value per boundary.
+        sigma_h: float or array_like (optional)
+            Hole capture cross section [cm\ :sup:`2`]. If not given, the same
+            value as the electron capture cross section will be used.
+        E: float or array_like
+            Energy level of a single state defined with respect to the intrinsic
+            Fermi level [eV], for all boundaries or one value per boundary. Set
+            to `None` for a continuum of states (default).
+        transition: tuple
+            Charge transition occurring at the energy level E, see
+            :func:`add_defects`.
+
+        Notes
+        -----
+        For a continuum of states, the density of states and the capture
+        cross sections must be the same for all boundaries.
+
+        Examples
+        --------
+        >>> from scipy.spatial import Voronoi
+        >>> seeds = np.random.uniform((0, 0), (3e-4, 3e-4), (100, 2))
+        >>> sys.add_grain_boundaries(Voronoi(seeds), 1e13, 1e-15, E=0)
+        """
+        if isinstance(boundaries, Voronoi):
+            boundaries = utils.voronoi_boundaries(self, boundaries)
+        s, dl, owner = utils.get_boundaries_sites(self, boundaries)
+        if self.dimension == 3:
+            owner = np.tile(owner, self.nz)
+            s, dl = utils.extrude_sites(self, s, dl)
+
+        def per_site(value):
+            # one value per site, or a single value for all boundaries
+            value = np.asarray(value, dtype=float)
+            if value.ndim == 0 or np.all(value == value.flat[0]):
+                return float(value.flat[0])
+            if E is None:
+                raise ValueError("The density of states and the capture cross "
+                                 "sections of a continuum of states must be "
+                                 "the same for all boundaries.")
+            return value[owner]
+
+        NN = self.scaling.density * self.scaling.length
+        if sigma_h is None:
+            sigma_h = sigma_e
+        sigma_e = per_site(sigma_e) * NN
+        sigma_h = per_site(sigma_h) * NN
+        if callable(N):
+            f = lambda E: N(E*self.scaling.energy) / NN
+        else:
+            f = per_site(N) / NN
+        if E is not None:
+            E = per_site(E) / self.scaling.energy
+
+        params = defect(s, boundaries, f, E, sigma_e, sigma_h, transition, dl)
+        self.defects_list.append(params)
+
+    def _defect_sites(self, location):
+        # sites of a point, line or plane defect and their lattice distances
+        if isinstance(location, float):
+            return utils.get_point_defects_sites(self, location)
+        elif len(location) >= 2 and self.dimension == 3:
+            return utils.get_plane_defects_sites(self, location)
+        elif len(location) >= 2:
+            return utils.get_line_defects_sites(self, location)
+
+        msg = "Wrong definition for the defects location: "\
+              "the list must contain one number for a point, two points for a line "\
+              "or more points for a polyline."
+        logging.error(msg)
+        return None, None
+
+    def derive(self, location=None, defects=None, **overrides):
+        """
+        Create a copy of the system with different material or defect
+        parameters.
+
+        The mesh and all the arrays that are not changed are shared with the
+        original system instead of being copied, as well as the lattice
+        quantities computed by the solvers. Only the parameters given are
+        made dimensionless again. The derived system can be modified further
+        with the methods of the class (doping, generation, contacts); shared
+        arrays are copied when they are modified by these methods, so that the
+        original system is not affected.
+
+        Parameters
+        ----------
+        location: Boolean function
+            Region where the material parameters are changed (same definition
+            as in :func:`add_material`). The default is the entire system.
+        defects: dictionary
+            Changes of the defects. The keys are the indices of the defects in
+            ``defects_list``, the values are dictionaries with some of the
+            keys location, N, sigma_e, sigma_h, E and transition, given as in
+            :func:`add_defects`.
+        overrides: floats or functions
+            Material parameters, with the keys and units of
+            :func:`add_material`.
+
+        Returns
+        -------
+        sys: Builder
+            The derived system.
+
+        Examples
+        --------
+        Lifetime and grain boundary defect density different from those of
+        ``sys``, where a single defect was added:
+
+        >>> sys2 = sys.derive(tau_e=1e-8, tau_h=1e-8, defects={0: {'N': 1e12}})
+        """
+        new = copy.copy(self)
+        new._cache = self.__dict__.setdefault('_cache', {})
+        shared = frozenset(k for k, a in vars(self).items() \
+                           if isinstance(a, np.ndarray))
+        self._shared = shared
+        new._shared = shared
+        new.defects_list = list(self.defects_list)
+
+        if overrides:
+            new._override_materials(overrides, location)
+        for idx, changes in (defects or {}).items():
+            new.defects_list[idx] = new._override_defect(new.defects_list[idx],
+                                                         changes)
+        return new
+
+    def _override_materials(self, overrides, location):
+        # Replace the material parameters in the region given by location.
+        # New arrays are created for the parameters changed, the table of a
+        # compact system is copied.
+        mt, names, scales = self._material_units()
+        for key in overrides:
+            if key not in mt:
+                raise ValueError("Unknown material parameter {0}.".format(key))
+
+        whole = location is None
+        if whole:
+            location = lambda pos: True
+        s, pos = get_sites(self, location)
+
+        changed = set()
+        for key, val in overrides.items():
+            name = names.get(key, key)
+            scale = scales.get(name, 1)
+            changed.add(name)
+            if self.compact and whole and not callable(val) \
+               and name not in self.__dict__:
+                self.materials = self.materials.copy()
+                self.materials[:, material_fields.index(name)] = val / scale
+                continue
+            array = np.array(getattr(self, name), dtype=float)
+            if not callable(val):
+                array[s] = val / scale
+            else:
+                array[s] = (val(pos) * location(pos))[s] / scale
+            setattr(self, name, array)
+            self._shared = self._shared.difference([name])
+
+        # derived parameters
+        if not changed & set(['Nc', 'Nv', 'Eg', 'Etrap']):
+            return
+        inputs = ('Nc', 'Nv', 'Eg', 'Etrap')
+        if self.compact and not any(k in self.__dict__ for k in inputs):
+            self.materials = self.materials.copy()
+            Nc, Nv, Eg, Et = [self.materials[:, material_fields.index(k)] \
+                              for k in inputs]
+            target = lambda k: self.materials[:, material_fields.index(k)]
+            target('n1')[:] = np.sqrt(Nc * Nv) * np.exp(-Eg/2 + Et)
+            target('p1')[:] = np.sqrt(Nc * Nv) * np.exp(-Eg/2 - Et)
+            target('ni')[:] = np.sqrt(Nc * Nv) * np.exp(-Eg/2)
+        else:
+            Nc, Nv, Eg, Et = [getattr(self, k) for k in inputs]
+            self.n1 = np.sqrt(Nc * Nv) * np.exp(-Eg/2 + Et)
+            self.p1 = np.sqrt(Nc * Nv) * np.exp(-Eg/2 - Et)
+            self.ni = np.sqrt(Nc * Nv) * np.exp(-Eg/2)
+            self._shared = self._shared.difference(['n1', 'p1', 'ni'])
+
+    def _override_defect(self, d, changes):
+        # Named tuple of a defect with the parameters given in changes (keys
+        # and units of add_defects) made dimensionless
+        NN = self.scaling.density * self.scaling.length
+        params = {}
+        for key, val in changes.items():
+            if key == 'location':
+                s, dl = self._defect_sites(val)
+                if s is None:
+                    raise ValueError("Wrong definition for the defects location.")
+                params.update(sites=s, location=val, perp_dl=dl)
+            elif key == 'N':
+                if not callable(val):
+                    params['dos'] = val / NN
+                else:
+                    params['dos'] = lambda E, N=val: N(E*self.scaling.energy) / NN
+            elif key in ('sigma_e', 'sigma_h'):
+                params[key] = val * NN
+            elif key == 'E':
+                params['energy'] = None if val is None \
+                                   else val / self.scaling.energy
+            elif key == 'transition':
+                params['transition'] = val
+            else:
+                raise ValueError("Unknown defect parameter {0}.".format(key))
+        return d._replace(**params)
+
     def doping_profile(self, density, location):
         s, _ = get_sites(self, location)
+        self._own('rho')
         self.rho[s] = self.rho[s] + density / self.scaling.density
 
     def add_donor(self, density, location=lambda pos: True):
@@ -374,33 +779,24 @@ class Builder():
         """
 
         if callable(f):
+            nx, ny, nz = self.nx, self.ny, self.nz
             if f.__code__.co_argcount == 1 and self.ny==1:
-                g = [f(x, *args) for x in self.xpts]
+                pos = (self.xpts,)
+            elif self.dimension == 3:
+                pos = (np.tile(self.xpts, ny*nz),
+                       np.tile(np.repeat(self.ypts, nx), nz),
+                       np.repeat(self.zpts, nx*ny))
             else:
-                g = [f(x, y, *args) for y in self.ypts for x in self.xpts]
+                pos = (np.tile(self.xpts, ny), np.repeat(self.ypts, nx))
+            g = _evaluate(f, pos, args)
         else:
             g = f
 
-        self.g = np.asarray(g) / self.scaling.generation
-
-        # compute the integral of the generation
-        x = self.xpts / self.scaling.length
-        y = self.ypts / self.scaling.length
-
-        w = []
-        u = []
-        for j in range(self.ny):
-            s = [i + j*self.nx for i in range(self.nx)]
-            sp = spline(x, self.g[s])
-            u.append(sp.integral(x[0], x[-1]))
-        if self.ny > 1:
-            sp = spline(y, u)
-            w.append(sp.integral(y[0], y[-1]))
-        if self.ny == 1:
-            self.gtot = u[-1]
-        else:
-            self.gtot = w[-1]
+        self.g = np.asarray(g, dtype=float) / self.scaling.generation
 
+        # compute the integral of the generation with the spline weights of
+        # the mesh
+        self.gtot = float(integrate(self, self.g))
 
 
     def contact_S(self, Scn_left, Scp_left, Scn_right, Scp_right):
@@ -458,10 +854,37 @@ class Builder():
         self.contacts_bcs = [left_contact, right_contact]
         self.contacts_WF = [left_wf, right_wf]
 
+def _evaluate(f, pos, args):
+    # Evaluate f on all the nodes at once. Functions that do not accept arrays
+    # (or return a result inconsistent with a node by node evaluation) are
+    # evaluated node by node.
+    size = len(pos[0])
+    try:
+        with np.errstate(all='ignore'):
+            g = np.broadcast_to(np.asarray(f(*pos, *args), dtype=float),
+                                (size,))
+        for idx in {0, size//2, size-1}:
+            gi = f(*[p[idx] for p in pos], *args)
+            if not np.isclose(g[idx], gi, rtol=1e-12, atol=0, equal_nan=True):
+                raise ValueError
+        return np.array(g)
+    except Exception:
+        return [f(*p, *args) for p in zip(*pos)]
+
+
 def get_sites(sys, location):
     # find the sites which belong to a region
-    nx, ny = sys.nx, sys.ny
-    sites = np.arange(nx*ny, dtype=int)
+    nx, ny, nz = sys.nx, sys.ny, sys.nz
+    sites = np.arange(nx*ny*nz, dtype=int)
+
+    if sys.dimension == 3:
+        pos = (np.tile(sys.xpts, ny*nz), np.tile(np.repeat(sys.ypts, nx), nz),
+               np.repeat(sys.zpts, nx*ny))
+        mask = location(pos)
+        if type(mask) == bool:
+            return sites, pos
+        else:
+            return sites[mask.astype(bool)], pos
 
     pos = np.transpose([np.tile(sys.xpts, ny), np.repeat(sys.ypts, nx)])
     if location.__code__.co_argcount == 1 and sys.ny==1:
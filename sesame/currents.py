@@ -0,0 +1,110 @@
+# Copyright 2017 University of Maryland.
+#
+# This file is part of Sesame. It is subject to the license terms in the file
+# LICENSE.rst found in the top-level directory of this distribution.
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from .utils import get_cached
+
+__all__ = ['bilinear_map', 'current_field']
+
+
+def _cells(p, q):
+    # Index of the interval of the points p containing each point q, and
+    # relative position of q in the interval. Points outside take the value of
+    # the nearest end.
+    if len(p) == 1:
+        return np.zeros(len(q), dtype=int), np.zeros(len(q))
+    i = np.clip(np.searchsorted(p, q, side='right') - 1, 0, len(p) - 2)
+    t = np.clip((q - p[i]) / (p[i+1] - p[i]), 0, 1)
+    return i, t
+
+
+def bilinear_map(xp, yp, x, y):
+    """
+    Matrix of the bilinear interpolation between two tensor product meshes.
+
+    Parameters
+    ----------
+    xp, yp: numpy arrays of floats
+        Increasing coordinates of the mesh of the values.
+    x, y: numpy arrays of floats
+        Coordinates of the mesh of the interpolated values. Points outside of
+        the mesh (xp, yp) take the values of the nearest edge.
+
+    Returns
+    -------
+    M: sparse matrix
+        Matrix of shape (len(y)*len(x), len(yp)*len(xp)) such that ``M.dot(f)``
+        gives the values on the mesh (x, y) of the values f given on the mesh
+        (xp, yp), both ordered with x first (as the sites of a system).
+    """
+    ix, tx = _cells(np.asarray(xp, dtype=float), np.asarray(x, dtype=float))
+    iy, ty = _cells(np.asarray(yp, dtype=float), np.asarray(y, dtype=float))
+    nx = len(xp)
+
+    # four corners of the cell of each point
+    rows, columns, weights = [], [], []
+    points = np.arange(len(y) * len(x))
+    for dj, wy in ((0, 1 - ty), (1, ty)):
+        for di, wx in ((0, 1 - tx), (1, tx)):
+            j = np.minimum(iy + dj, len(yp) - 1)
+            i = np.minimum(ix + di, nx - 1)
+            rows.append(points)
+            columns.append((j[:, None] * nx + i[None, :]).flatten())
+            weights.append(np.outer(wy, wx).flatten())
+    return csr_matrix((np.concatenate(weights),
+                       (np.concatenate(rows), np.concatenate(columns))),
+                      shape=(len(y) * len(x), len(yp) * nx))
+
+
+def _grid(sys, shape):
+    # Uniform grid over a two-dimensional system, and bilinear maps from the
+    # staggered meshes of the currents in the x- and y-directions
+    xpts, ypts = sys.xpts, sys.ypts
+    x = np.linspace(xpts[0], xpts[-1], shape[1])
+    y = np.linspace(ypts[0], ypts[-1], shape[0])
+    Mx = bilinear_map((xpts[:-1] + xpts[1:]) / 2, ypts, x, y)
+    My = bilinear_map(xpts, (ypts[:-1] + ypts[1:]) / 2, x, y)
+    return x, y, Mx, My
+
+
+def current_field(sys, jx, jy, shape=(100, 100)):
+    """
+    Resample the currents of a two-dimensional system on a uniform grid.
+
+    The currents between neighboring sites are located at the middle of the
+    edges joining them (staggered meshes). Each component is interpolated
+    bilinearly on its own mesh. The interpolation matrices are computed once
+    for a system and a grid, and stored on the system.
+
+    Parameters
+    ----------
+    sys: Builder
+        The discretized system.
+    jx: numpy array of floats
+        Currents between the sites i and i+1 in the x-direction, for all the
+        sites with i < nx-1 (ny*(nx-1) values, as given by
+        :func:`~sesame.analyzer.Analyzer.electron_current` with
+        ``component='x'``).
+    jy: numpy array of floats
+        Currents between the sites j and j+1 in the y-direction, for all the
+        sites with j < ny-1 ((ny-1)*nx values).
+    shape: tuple of integers
+        Number of points of the grid in the y- and x-directions.
+
+    Returns
+    -------
+    x, y: numpy arrays of floats
+        Coordinates of the grid, in the units of the mesh of the system.
+    Jx, Jy: numpy arrays of floats
+        Components of the current on the grid, of the given shape.
+    """
+    shape = tuple(shape)
+    x, y, Mx, My = get_cached(sys, ('current_grid', shape),
+                              lambda sys: _grid(sys, shape))
+    Jx = Mx.dot(np.asarray(jx)).reshape(shape)
+    Jy = My.dot(np.asarray(jy)).reshape(shape)
+    return x, y, Jx, Jy
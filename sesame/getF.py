@@ -6,9 +6,10 @@
 import numpy as np
 from .observables import *
 from .defects import defectsF
+from .utils import get_lattice
 
 
-def getF(sys, v, efn, efp, veq):
+def getF(sys, v, efn, efp, veq, sites=None, defects=None, lattice=None):
     ###########################################################################
     #               organization of the right hand side vector                #
     ###########################################################################
@@ -21,37 +22,51 @@ def getF(sys, v, efn, efp, veq):
     # fn_row = 3*s
     # fp_row = 3*s+1
     # fv_row = 3*s+2
+    #
+    # The rows of the given sites only can be computed (other rows are zero).
+    # They depend on the unknowns of the sites and of their neighbors, and on
+    # the defects given (those containing the sites). lattice is the result
+    # of get_lattice(sys), computed if not given.
 
     Nx, Ny = sys.xpts.shape[0], sys.ypts.shape[0]
     N = Nx* Ny
-    dx, dy = sys.dx, sys.dy
 
     # right hand side vector
     vec = np.zeros((3 * Nx * Ny,))
 
+    if sites is None:
+        sites = np.arange(N, dtype=int)
+        s = slice(None)
+    else:
+        s = sites
+    if defects is None:
+        defects = sys.defects_list
+    if lattice is None:
+        lattice = get_lattice(sys)
+
     ###########################################################################
     #                     For all sites in the system                         #
     ###########################################################################
     # carrier densities
-    n = sys.Nc * np.exp(+sys.bl + efn + v)
-    p = sys.Nv * np.exp(-sys.Eg - sys.bl - efp - v)
-
-    # equilibrium carrier densities
-    n_eq = sys.Nc * np.exp(+sys.bl + veq)
-    p_eq = sys.Nv * np.exp(-sys.Eg - sys.bl - veq)
+    n, p = np.zeros((N,)), np.zeros((N,))
+    n[s] = sys.Nc[s] * np.exp(+sys.bl[s] + efn[s] + v[s])
+    p[s] = sys.Nv[s] * np.exp(-sys.Eg[s] - sys.bl[s] - efp[s] - v[s])
 
     # bulk charges
-    rho = sys.rho - n + p
+    rho = np.zeros((N,))
+    rho[s] = sys.rho[s] - n[s] + p[s]
 
     # recombination rates
-    r = get_bulk_rr(sys, n, p)
+    r = np.zeros((N,))
+    r[s] = get_bulk_rr(sys, n, p, s)
 
     # charge defects
-    if len(sys.defects_list) != 0:
-        defectsF(sys, sys.defects_list, n, p, rho, r)
+    if len(defects) != 0:
+        defectsF(sys, defects, n, p, rho, r)
 
-    # reshape the array as array[y-indices, x-indices]
-    _sites = np.arange(Nx * Ny, dtype=int).reshape(Ny, Nx)
+    # position of the sites in the x-direction
+    i = sites % Nx
+    left, right = sites[i == 0], sites[i == Nx-1]
 
     ###########################################################################
     #       inside the system: 0 < i < Nx-1 and 0 <= j <= Ny-1                #
@@ -60,25 +75,13 @@ def getF(sys, v, efn, efp, veq):
     # inner part of the system. All the edges containing boundary conditions.
 
     # list of the sites inside the system
-    sites = _sites[0:Ny, 1:Nx - 1].flatten()
+    sites = sites[(i > 0) & (i < Nx-1)]
 
     # lattice distances
-    dx = np.tile(sys.dx[1:], Ny)
-    dxm1 = np.tile(sys.dx[:-1], Ny)
-
-    dy = np.repeat(sys.dy,Nx-2)
-    dym1 = np.repeat(np.roll(sys.dy,1),Nx-2)
-
-    dxbar = (dxm1 + dx) / 2.
-    dybar = (dym1 + dy) / 2.
-
-    infind = np.where(np.isinf(dybar))
-    for i in infind[0]:
-        if np.isinf(dy[i]):
-            dybar[i] = dy[i-Nx] / 2.
-        else:
-            dybar[i] = dy[i] / 2.
-
+    if not isinstance(s, slice):
+        k = sites // Nx * (Nx-2) + sites % Nx - 1
+        lattice = [a[k] for a in lattice]
+    dx, dxm1, dy, dym1, dxbar, dybar = lattice
 
     # compute the currents
     jnx_s = get_jn(sys, efn, v, sites, sites + 1, dx)
@@ -119,7 +122,11 @@ def getF(sys, v, efn, efp, veq):
     #                 left boundary: i = 0 and 0 <= j <= Ny-1                 #
     ###########################################################################
     # list of the sites on the left side
-    sites = _sites[:, 0].flatten()
+    sites = left
+
+    # equilibrium carrier densities
+    n_eq = sys.Nc[sites] * np.exp(+sys.bl[sites] + veq[sites])
+    p_eq = sys.Nv[sites] * np.exp(-sys.Eg[sites] - sys.bl[sites] - veq[sites])
 
     # compute the currents
     # s_sp1 = [i for i in zip(sites, sites + 1)]
@@ -127,8 +134,8 @@ def getF(sys, v, efn, efp, veq):
     jpx = get_jp(sys, efp, v, sites, sites + 1, sys.dx[0])
 
     # compute an, ap, av
-    an = jnx - sys.Scn[0] * (n[sites] - n_eq[sites])
-    ap = jpx + sys.Scp[0] * (p[sites] - p_eq[sites])
+    an = jnx - sys.Scn[0] * (n[sites] - n_eq)
+    ap = jpx + sys.Scp[0] * (p[sites] - p_eq)
     av = 0  # to ensure Dirichlet BCs
 
     vec[3 * sites] = an
@@ -139,15 +146,19 @@ def getF(sys, v, efn, efp, veq):
     #               right boundary: i = Nx-1 and 0 <= j <= Ny-1                 #
     ###########################################################################
     # list of the sites on the right side
-    sites = _sites[:, Nx - 1].flatten()
+    sites = right
+
+    # equilibrium carrier densities
+    n_eq = sys.Nc[sites] * np.exp(+sys.bl[sites] + veq[sites])
+    p_eq = sys.Nv[sites] * np.exp(-sys.Eg[sites] - sys.bl[sites] - veq[sites])
 
     # currents
     jnx_sm1 = get_jn(sys, efn, v, sites - 1, sites, sys.dx[-1])
     jpx_sm1 = get_jp(sys, efp, v, sites - 1, sites, sys.dx[-1])
 
     # b_n, b_p and b_v values
-    bn = jnx_sm1 + sys.Scn[1] * (n[sites] - n_eq[sites])
-    bp = jpx_sm1 - sys.Scp[1] * (p[sites] - p_eq[sites])
+    bn = jnx_sm1 + sys.Scn[1] * (n[sites] - n_eq)
+    bp = jpx_sm1 - sys.Scp[1] * (p[sites] - p_eq)
     bv = 0  # Dirichlet BC
 
     vec[3 * sites] = bn
@@ -0,0 +1,113 @@
+# Copyright 2017 University of Maryland.
+#
+# This file is part of Sesame. It is subject to the license terms in the file
+# LICENSE.rst found in the top-level directory of this distribution.
+
+import numpy as np
+from .observables import *
+from .defects import defectsF
+from .utils import get_neighbors
+
+
+def getF3d(sys, v, efn, efp, veq):
+    ###########################################################################
+    #               organization of the right hand side vector                #
+    ###########################################################################
+    # A site with coordinates (i,j,k) corresponds to a site number s as follows:
+    # k = s//(Nx*Ny)
+    # j = (s-k*Nx*Ny)//Nx
+    # i = s - j*Nx - k*Nx*Ny
+    #
+    # Rows for (efn_s, efp_s, v_s)
+    # ----------------------------
+    # fn_row = 3*s
+    # fp_row = 3*s+1
+    # fv_row = 3*s+2
+
+    Nx, Ny, Nz = sys.nx, sys.ny, sys.nz
+
+    # right hand side vector
+    vec = np.zeros((3 * Nx * Ny * Nz,))
+
+    ###########################################################################
+    #                     For all sites in the system                         #
+    ###########################################################################
+    # carrier densities
+    n = sys.Nc * np.exp(+sys.bl + efn + v)
+    p = sys.Nv * np.exp(-sys.Eg - sys.bl - efp - v)
+
+    # equilibrium carrier densities
+    n_eq = sys.Nc * np.exp(+sys.bl + veq)
+    p_eq = sys.Nv * np.exp(-sys.Eg - sys.bl - veq)
+
+    # bulk charges
+    rho = sys.rho - n + p
+
+    # recombination rates
+    r = get_bulk_rr(sys, n, p)
+
+    # charge defects
+    if len(sys.defects_list) != 0:
+        defectsF(sys, sys.defects_list, n, p, rho, r)
+
+    # reshape the array as array[z-indices, y-indices, x-indices]
+    _sites = np.arange(Nx * Ny * Nz, dtype=int).reshape(Nz * Ny, Nx)
+
+    ###########################################################################
+    #              inside the system: 0 < i < Nx-1 (7-point stencil)          #
+    ###########################################################################
+    # The divergences are accumulated direction by direction with the neighbor
+    # tables, so that only the arrays of one direction are kept in memory.
+    sites = _sites[:, 1:Nx - 1].flatten()
+
+    fn = sys.g[sites] - r[sites]
+    fp = r[sites] - sys.g[sites]
+    fv = - rho[sites]
+
+    for axis in range(3):
+        _, sm, sp, dm, dp, dbar = get_neighbors(sys, axis)
+
+        # ---------------------------- fn, fp ----------------------------------
+        jn_s = get_jn(sys, efn, v, sites, sp, dp)
+        jn_sm = get_jn(sys, efn, v, sm, sites, dm)
+        fn += (jn_s - jn_sm) / dbar
+
+        jp_s = get_jp(sys, efp, v, sites, sp, dp)
+        jp_sm = get_jp(sys, efp, v, sm, sites, dm)
+        fp += (jp_s - jp_sm) / dbar
+
+        # ------------------------------ fv ------------------------------------
+        eps_m = .5 * (sys.epsilon[sm] + sys.epsilon[sites])
+        eps_p = .5 * (sys.epsilon[sp] + sys.epsilon[sites])
+        fv += (eps_m * (v[sites] - v[sm]) / dm \
+               - eps_p * (v[sp] - v[sites]) / dp) / dbar
+
+    vec[3 * sites] = fn
+    vec[3 * sites + 1] = fp
+    vec[3 * sites + 2] = fv
+
+    ###########################################################################
+    #                 left boundary: i = 0 and all (j, k)                     #
+    ###########################################################################
+    sites = _sites[:, 0]
+
+    jnx = get_jn(sys, efn, v, sites, sites + 1, sys.dx[0])
+    jpx = get_jp(sys, efp, v, sites, sites + 1, sys.dx[0])
+
+    vec[3 * sites] = jnx - sys.Scn[0] * (n[sites] - n_eq[sites])
+    vec[3 * sites + 1] = jpx + sys.Scp[0] * (p[sites] - p_eq[sites])
+    vec[3 * sites + 2] = 0  # Dirichlet BC
+
+    ###########################################################################
+    #                right boundary: i = Nx-1 and all (j, k)                  #
+    ###########################################################################
+    sites = _sites[:, Nx - 1]
+
+    jnx_sm1 = get_jn(sys, efn, v, sites - 1, sites, sys.dx[-1])
+    jpx_sm1 = get_jp(sys, efp, v, sites - 1, sites, sys.dx[-1])
+
+    vec[3 * sites] = jnx_sm1 + sys.Scn[1] * (n[sites] - n_eq[sites])
+    vec[3 * sites + 1] = jpx_sm1 - sys.Scp[1] * (p[sites] - p_eq[sites])
+    vec[3 * sites + 2] = 0  # Dirichlet BC
+
+    return vec
@@ -8,6 +8,7 @@ from itertools import chain, product
 
 from .observables import get_n, get_p
 from .defects  import defectsF, defectsJ
+from .utils import get_lattice
 # remember that efn and efp are zero at equilibrium
 
 def getFandJ_eq(sys, v):
@@ -72,19 +73,7 @@ def getFandJ_eq(sys, v):
     sites = _sites[0:Ny, 1:Nx-1].flatten()
 
     # lattice distances
-    dx = np.tile(sys.dx[1:], Ny)
-    dxm1 = np.tile(sys.dx[:-1], Ny)
-    dy = np.repeat(sys.dy[:], Nx-2)
-    dym1 = np.repeat(np.roll(sys.dy,1),Nx-2)
-
-    dxbar = (dx + dxm1) / 2.
-    dybar = (dy + dym1) / 2.
-    infind = np.where(np.isinf(dybar))
-    for i in infind[0]:
-        if np.isinf(dy[i]):
-            dybar[i] = dy[i-Nx] / 2
-        else:
-            dybar[i] = dy[i] / 2
+    dx, dxm1, dy, dym1, dxbar, dybar = get_lattice(sys)
 
 
     #------------------------------ fv ----------------------------------------
@@ -0,0 +1,123 @@
+# Copyright 2017 University of Maryland.
+#
+# This file is part of Sesame. It is subject to the license terms in the file
+# LICENSE.rst found in the top-level directory of this distribution.
+
+import numpy as np
+
+from .defects  import defectsF, defectsJ
+from .jacobian3d import _CSRBuilder
+from .utils import get_neighbors
+# remember that efn and efp are zero at equilibrium
+
+def getFandJ_eq3d(sys, v):
+    ###########################################################################
+    #                     organization of the Jacobian matrix                 #
+    ###########################################################################
+    # A site with coordinates (i,j,k) corresponds to a site number s as follows:
+    # k = s//(Nx*Ny)
+    # j = (s-k*Nx*Ny)//Nx
+    # i = s - j*Nx - k*Nx*Ny
+    #
+    # Row for v_s
+    # ----------------------------
+    # fv_row = s
+    #
+    # Inside the system, the rows contain the derivatives with respect to v_s
+    # and to the potential of the 6 neighbors of s (7 elements).
+
+    Nx, Ny, Nz = sys.nx, sys.ny, sys.nz
+    Num = Nx * Ny * Nz
+
+    # right hand side vector
+    vec = np.zeros((Num,))
+
+    ###########################################################################
+    #                     For all sites in the system                         #
+    ###########################################################################
+    # carrier densities
+    n = sys.Nc * np.exp(+sys.bl + v)
+    p = sys.Nv * np.exp(-sys.Eg - sys.bl - v)
+
+    # bulk charges
+    rho = sys.rho - n + p
+    drho_dv = -n - p
+
+    # charge defects
+    if len(sys.defects_list) != 0:
+        defectsF(sys, sys.defects_list, n, p, rho)
+        defectsJ(sys, sys.defects_list, n, p, drho_dv)
+
+    # reshape the array as array[z-indices, y-indices, x-indices]
+    _sites = np.arange(Num, dtype=int).reshape(Nz * Ny, Nx)
+    inner = _sites[:, 1:Nx - 1].flatten()
+    left = _sites[:, 0]
+    right = _sites[:, Nx - 1]
+
+    # number of non-zero elements in each row
+    nnz_row = np.ones((Num,), dtype=np.int64)
+    nnz_row[inner] = 7
+    if sys.contacts_bcs[0] == "Neutral":
+        nnz_row[left] = 2
+    if sys.contacts_bcs[1] == "Neutral":
+        nnz_row[right] = 2
+    J = _CSRBuilder(nnz_row)
+
+    ###########################################################################
+    #              inside the system: 0 < i < Nx-1 (7-point stencil)          #
+    ###########################################################################
+    sites = inner
+    fv = - rho[sites]
+    dv = - drho_dv[sites]
+
+    for axis in range(3):
+        _, sm, sp, dm, dp, dbar = get_neighbors(sys, axis)
+
+        eps_m = .5 * (sys.epsilon[sm] + sys.epsilon[sites])
+        eps_p = .5 * (sys.epsilon[sp] + sys.epsilon[sites])
+
+        #------------------------------ fv ------------------------------------
+        fv += (eps_m * (v[sites] - v[sm]) / dm \
+               - eps_p * (v[sp] - v[sites]) / dp) / dbar
+
+        #-------------------------- fv derivatives ----------------------------
+        dv += eps_m / (dm * dbar) + eps_p / (dp * dbar)
+        J.fill(sites, 1 + 2 * axis, [sm, sp], \
+               [- eps_m / (dm * dbar), - eps_p / (dp * dbar)])
+
+    vec[sites] = fv
+    J.fill(sites, 0, [sites], [dv])
+
+    ###########################################################################
+    #                   left contact: i = 0 and all (j, k)                    #
+    ###########################################################################
+    sites = left
+
+    if sys.contacts_bcs[0] == "Neutral":
+        # no surface charges
+        vec[sites] = v[sites+1] - v[sites]
+        J.fill(sites, 0, [sites, sites+1], \
+               [-np.ones((len(sites),)), np.ones((len(sites),))])
+
+    if sys.contacts_bcs[0] == "Ohmic" or sys.contacts_bcs[0] == "Schottky":
+        # Dirichlet BCs
+        vec[sites] = 0
+        J.fill(sites, 0, [sites], [np.ones((len(sites),))])
+
+    ###########################################################################
+    #                 right contact: i = Nx-1 and all (j, k)                  #
+    ###########################################################################
+    sites = right
+
+    if sys.contacts_bcs[1] == "Neutral":
+        # no surface charges
+        vec[sites] = v[sites] - v[sites-1]
+        J.fill(sites, 0, [sites-1, sites], \
+               [-np.ones((len(sites),)), np.ones((len(sites),))])
+
+    if sys.contacts_bcs[1] == "Ohmic" or sys.contacts_bcs[1] == "Schottky":
+        # Dirichlet BCs
+        vec[sites] = 0
+        J.fill(sites, 0, [sites], [np.ones((len(sites),))])
+
+    return vec, J.tocsr()
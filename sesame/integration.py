@@ -0,0 +1,167 @@
+# Copyright 2017 University of Maryland.
+#
+# This file is part of Sesame. It is subject to the license terms in the file
+# LICENSE.rst found in the top-level directory of this distribution.
+
+import numpy as np
+from scipy.interpolate import make_interp_spline, BSpline
+from scipy.sparse.linalg import spsolve
+
+from .utils import get_cached
+
+__all__ = ['quadrature_weights', 'site_weights', 'cross_section_weights',
+           'integrate']
+
+
+def quadrature_weights(x, rule='spline'):
+    """
+    Weights of the integral over [x[0], x[-1]] of values given on the points x.
+
+    Parameters
+    ----------
+    x: numpy array of floats
+        Increasing coordinates of the points.
+    rule: string
+        ``'spline'`` for the integral of the cubic spline interpolation of the
+        values (same interpolation as
+        :class:`scipy.interpolate.InterpolatedUnivariateSpline`, the degree is
+        reduced for less than four points), ``'simpson'`` for Simpson's rule
+        and ``'trapezoid'`` for the trapezoidal rule.
+
+    Returns
+    -------
+    w: numpy array of floats
+        Weights such that ``w.dot(f)`` is the integral of the values ``f``.
+    """
+    x = np.asarray(x, dtype=float)
+    n = len(x)
+    if n == 1:
+        return np.ones(1)
+
+    if rule == 'trapezoid':
+        dx = np.diff(x)
+        w = np.zeros(n)
+        w[:-1] += dx / 2
+        w[1:] += dx / 2
+        return w
+
+    if rule == 'simpson':
+        if n < 3:
+            return quadrature_weights(x, 'trapezoid')
+        # composite Simpson's rule for unequal intervals applied to pairs of
+        # intervals, the last interval of an odd number of intervals is
+        # integrated with the parabola of the last three points
+        w = np.zeros(n)
+        h = np.diff(x)
+        m = (n - 1) // 2 * 2
+        h0, h1 = h[0:m:2], h[1:m:2]
+        s = h0 + h1
+        w[0:m:2] += s / 6 * (2 - h1 / h0)
+        w[1:m:2] += s / 6 * s**2 / (h0 * h1)
+        w[2:m+1:2] += s / 6 * (2 - h0 / h1)
+        if m < n - 1:
+            h0, h1 = h[-2], h[-1]
+            w[-1] += h1 * (2*h1 + 3*h0) / (6 * (h0 + h1))
+            w[-2] += h1 * (h1 + 3*h0) / (6 * h0)
+            w[-3] -= h1**3 / (6 * h0 * (h0 + h1))
+        return w
+
+    if rule == 'spline':
+        # The integral of the spline is b.c, where c are the coefficients of
+        # the B-splines interpolating the values (A c = f) and b the integrals
+        # of the B-splines, so that the weights solve A^T w = b.
+        k = min(3, n-1)
+        t = make_interp_spline(x, np.zeros(n), k=k).t
+        A = BSpline.design_matrix(x, t, k).tocsc()
+        b = (t[k+1:] - t[:-k-1]) / (k + 1)
+        return np.atleast_1d(spsolve(A.T.tocsc(), b))
+
+    raise ValueError("Unknown integration rule '{0}'.".format(rule))
+
+
+def _weights(system, axes, rule):
+    # Tensor product of the weights of the given directions of the mesh (in
+    # dimensionless units), ordered as the sites. Directions with a single
+    # node are skipped.
+    W = np.ones(1)
+    for pts, n in zip(('xpts', 'ypts', 'zpts'), ('nx', 'ny', 'nz')):
+        if pts in axes and getattr(system, n) > 1:
+            x = getattr(system, pts) / system.scaling.length
+            W = np.outer(quadrature_weights(x, rule), W).flatten()
+    return W
+
+
+def site_weights(system, rule='spline'):
+    """
+    Weights of the integral of a field given on the sites of a system.
+
+    The weights are the tensor product of the weights of each direction of the
+    mesh. They are computed once and stored on the system.
+
+    Parameters
+    ----------
+    system: Builder
+        The discretized system.
+    rule: string
+        Integration rule (see :func:`quadrature_weights`).
+
+    Returns
+    -------
+    W: numpy array of floats
+        Read-only array of the weights of the sites. The integral has the
+        dimensionless units of the field times a length (1D), a surface (2D) or
+        a volume (3D).
+    """
+    return get_cached(system, ('site_weights', rule), lambda system: \
+                      (_weights(system, ('xpts', 'ypts', 'zpts'), rule),))[0]
+
+
+def cross_section_weights(system, rule='spline'):
+    """
+    Weights of the integral over the y- and z-directions of values given on
+    the sites of a plane of constant x (ny * nz values, ordered as the sites).
+
+    Parameters
+    ----------
+    system: Builder
+        The discretized system.
+    rule: string
+        Integration rule (see :func:`quadrature_weights`).
+
+    Returns
+    -------
+    w: numpy array of floats
+        Read-only array of the weights, equal to one in 1D.
+    """
+    return get_cached(system, ('cross_section_weights', rule), lambda system: \
+                      (_weights(system, ('ypts', 'zpts'), rule),))[0]
+
+
+def integrate(system, fields, rule='spline'):
+    """
+    Integrate fields given on the sites of a system over the entire system.
+
+    Parameters
+    ----------
+    system: Builder
+        The discretized system.
+    fields: array-like
+        Field of shape (nx*ny*nz,), or several fields stacked along the first
+        axes (e.g. the recombination of all the files of a sweep, shape
+        (number of files, nx*ny*nz)).
+    rule: string
+        Integration rule (see :func:`quadrature_weights`).
+
+    Returns
+    -------
+    integral: float or numpy array of floats
+        Integral of each field, in dimensionless units.
+
+    Examples
+    --------
+    >>> gtot = sesame.integrate(sys, sys.g)
+    >>> R = [sesame.Analyzer(sys, result).bulk_srh_rr() for result in results]
+    >>> JR = sesame.integrate(sys, R)
+    """
+    W = site_weights(system, rule)
+    return np.asarray(fields, dtype=float).dot(W)
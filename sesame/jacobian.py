@@ -3,6 +3,7 @@ from itertools import chain
 
 from .observables import *
 from .defects  import defectsJ
+from .utils import get_lattice
 
 
 def getJ(sys, v, efn, efp):
@@ -157,21 +158,7 @@ def getJ(sys, v, efn, efp):
     sites = _sites[0:Ny, 1:Nx - 1].flatten()
 
     # lattice distances
-    dx = np.tile(sys.dx[1:], Ny)
-    dxm1 = np.tile(sys.dx[:-1], Ny)
-
-    dy = np.repeat(sys.dy,Nx-2)
-    dym1 = np.repeat(np.roll(sys.dy,1),Nx-2)
-
-    dxbar = (dxm1 + dx) / 2.
-    dybar = (dym1 + dy) / 2.
-
-    infind = np.where(np.isinf(dybar))
-    for i in infind[0]:
-        if np.isinf(dy[i]):
-            dybar[i] = dy[i-Nx] / 2.
-        else:
-            dybar[i] = dy[i] / 2.
+    dx, dxm1, dy, dym1, dxbar, dybar = get_lattice(sys)
 
     # ------------------------ fn derivatives ----------------------------------
     # get the derivatives of jx_s, jx_sm1, jy_s, jy_smN
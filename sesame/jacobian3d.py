@@ -0,0 +1,200 @@
+# Copyright 2017 University of Maryland.
+#
+# This file is part of Sesame. It is subject to the license terms in the file
+# LICENSE.rst found in the top-level directory of this distribution.
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from .observables import *
+from .defects  import defectsJ
+from .utils import get_neighbors
+
+
+class _CSRBuilder():
+    # The sparse matrix is filled in place in the compressed sparse row format.
+    # The number of non-zero elements of each row is known beforehand, so no
+    # lists of (rows, columns, data) are created. Each row is filled column
+    # slot by column slot with vectorized assignments.
+    def __init__(self, nnz_row):
+        self.indptr = np.zeros((len(nnz_row) + 1,), dtype=np.int64)
+        np.cumsum(nnz_row, out=self.indptr[1:])
+        size = self.indptr[-1]
+        itype = np.int32 if len(nnz_row) < 2**31 else np.int64
+        self.indices = np.zeros((size,), dtype=itype)
+        self.data = np.zeros((size,), dtype=np.float64)
+
+    def fill(self, rows, slot, columns, data):
+        # columns and data of the rows, starting at the column slot
+        start = self.indptr[rows] + slot
+        for c, (col, val) in enumerate(zip(columns, data)):
+            self.indices[start + c] = col
+            self.data[start + c] = val
+
+    def tocsr(self):
+        n = len(self.indptr) - 1
+        J = csr_matrix((self.data, self.indices, self.indptr), shape=(n, n))
+        # neighbors can coincide for periodic systems with two nodes only
+        J.sum_duplicates()
+        return J
+
+
+def getJ3d(sys, v, efn, efp):
+    ###########################################################################
+    #                     organization of the Jacobian matrix                 #
+    ###########################################################################
+    # A site with coordinates (i,j,k) corresponds to a site number s as follows:
+    # k = s//(Nx*Ny)
+    # j = (s-k*Nx*Ny)//Nx
+    # i = s - j*Nx - k*Nx*Ny
+    #
+    # Rows for (efn_s, efp_s, v_s)
+    # ----------------------------
+    # fn_row = 3*s
+    # fp_row = 3*s+1
+    # fv_row = 3*s+2
+    #
+    # Inside the system, the rows of fn (fp) contain the derivatives with
+    # respect to efn (efp) and v of the 6 neighbors of s, and with respect to
+    # efn_s, efp_s and v_s (15 elements). The rows of fv contain the
+    # derivatives with respect to v of the 6 neighbors of s, and with respect
+    # to efn_s, efp_s and v_s (9 elements).
+
+    Nx, Ny, Nz = sys.nx, sys.ny, sys.nz
+    Num = Nx * Ny * Nz
+
+    ###########################################################################
+    #                     For all sites in the system                         #
+    ###########################################################################
+    # carrier densities
+    n = sys.Nc * np.exp(+sys.bl + efn + v)
+    p = sys.Nv * np.exp(-sys.Eg - sys.bl - efp - v)
+
+    # bulk charges
+    drho_defn_s = - n
+    drho_defp_s = - p
+    drho_dv_s = - n - p
+
+    # derivatives of the bulk recombination rates
+    dr_defn_s, dr_defp_s, dr_dv_s = get_bulk_rr_derivs(sys, n, p)
+
+    # charge defects
+    if len(sys.defects_list) != 0:
+        defectsJ(sys, sys.defects_list, n, p, drho_dv_s, drho_defn_s, \
+                 drho_defp_s, dr_defn_s, dr_defp_s, dr_dv_s)
+
+    # reshape the array as array[z-indices, y-indices, x-indices]
+    _sites = np.arange(Num, dtype=int).reshape(Nz * Ny, Nx)
+    inner = _sites[:, 1:Nx - 1].flatten()
+    left = _sites[:, 0]
+    right = _sites[:, Nx - 1]
+
+    # number of non-zero elements in each row
+    nnz_row = np.zeros((3 * Num,), dtype=np.int64)
+    nnz_row[3 * inner] = 15
+    nnz_row[3 * inner + 1] = 15
+    nnz_row[3 * inner + 2] = 9
+    for sites in (left, right):
+        nnz_row[3 * sites] = 4
+        nnz_row[3 * sites + 1] = 4
+        nnz_row[3 * sites + 2] = 1
+    J = _CSRBuilder(nnz_row)
+
+    ###########################################################################
+    #              inside the system: 0 < i < Nx-1 (7-point stencil)          #
+    ###########################################################################
+    sites = inner
+
+    # diagonal blocks: generation-recombination and charge
+    dfn = [- dr_defn_s[sites], - dr_defp_s[sites], - dr_dv_s[sites]]
+    dfp = [dr_defn_s[sites], dr_defp_s[sites], dr_dv_s[sites]]
+    dfv = [- drho_defn_s[sites], - drho_defp_s[sites], - drho_dv_s[sites]]
+
+    for axis in range(3):
+        _, sm, sp, dm, dp, dbar = get_neighbors(sys, axis)
+        slot = 3 + 4 * axis # columns of the neighbors in the rows of fn, fp
+
+        # ------------------------ fn derivatives ------------------------------
+        djs_defn_s, djs_defn_sp, djs_dv_s, djs_dv_sp = \
+            get_jn_derivs(sys, efn, v, sites, sp, dp)
+        djm_defn_sm, djm_defn_s, djm_dv_sm, djm_dv_s = \
+            get_jn_derivs(sys, efn, v, sm, sites, dm)
+
+        dfn[0] += (djs_defn_s - djm_defn_s) / dbar
+        dfn[2] += (djs_dv_s - djm_dv_s) / dbar
+        columns = [3 * sm, 3 * sm + 2, 3 * sp, 3 * sp + 2]
+        data = [- djm_defn_sm / dbar, - djm_dv_sm / dbar, \
+                djs_defn_sp / dbar, djs_dv_sp / dbar]
+        J.fill(3 * sites, slot, columns, data)
+
+        # ------------------------ fp derivatives ------------------------------
+        djs_defp_s, djs_defp_sp, djs_dv_s, djs_dv_sp = \
+            get_jp_derivs(sys, efp, v, sites, sp, dp)
+        djm_defp_sm, djm_defp_s, djm_dv_sm, djm_dv_s = \
+            get_jp_derivs(sys, efp, v, sm, sites, dm)
+
+        dfp[1] += (djs_defp_s - djm_defp_s) / dbar
+        dfp[2] += (djs_dv_s - djm_dv_s) / dbar
+        columns = [3 * sm + 1, 3 * sm + 2, 3 * sp + 1, 3 * sp + 2]
+        data = [- djm_defp_sm / dbar, - djm_dv_sm / dbar, \
+                djs_defp_sp / dbar, djs_dv_sp / dbar]
+        J.fill(3 * sites + 1, slot, columns, data)
+
+        # ------------------------ fv derivatives ------------------------------
+        eps_m = .5 * (sys.epsilon[sm] + sys.epsilon[sites])
+        eps_p = .5 * (sys.epsilon[sp] + sys.epsilon[sites])
+        dfv[2] += eps_m / (dm * dbar) + eps_p / (dp * dbar)
+        columns = [3 * sm + 2, 3 * sp + 2]
+        data = [- eps_m / (dm * dbar), - eps_p / (dp * dbar)]
+        J.fill(3 * sites + 2, 3 + 2 * axis, columns, data)
+
+    columns = [3 * sites, 3 * sites + 1, 3 * sites + 2]
+    J.fill(3 * sites, 0, columns, dfn)
+    J.fill(3 * sites + 1, 0, columns, dfp)
+    J.fill(3 * sites + 2, 0, columns, dfv)
+
+    ###########################################################################
+    #                 left boundary: i = 0 and all (j, k)                     #
+    ###########################################################################
+    sites = left
+
+    # -------------------------- an derivatives --------------------------------
+    defn_s, defn_sp1, dv_s, dv_sp1 = get_jn_derivs(sys, efn, v, sites, sites + 1, sys.dx[0])
+    defn_s -= sys.Scn[0] * n[sites]
+    dv_s -= sys.Scn[0] * n[sites]
+    columns = [3 * sites, 3 * sites + 2, 3 * (sites + 1), 3 * (sites + 1) + 2]
+    J.fill(3 * sites, 0, columns, [defn_s, dv_s, defn_sp1, dv_sp1])
+
+    # -------------------------- ap derivatives --------------------------------
+    defp_s, defp_sp1, dv_s, dv_sp1 = get_jp_derivs(sys, efp, v, sites, sites + 1, sys.dx[0])
+    defp_s -= sys.Scp[0] * p[sites]
+    dv_s -= sys.Scp[0] * p[sites]
+    columns = [3 * sites + 1, 3 * sites + 2, 3 * (sites + 1) + 1, 3 * (sites + 1) + 2]
+    J.fill(3 * sites + 1, 0, columns, [defp_s, dv_s, defp_sp1, dv_sp1])
+
+    # -------------------------- av derivatives --------------------------------
+    J.fill(3 * sites + 2, 0, [3 * sites + 2], [np.ones((len(sites),))])
+
+    ###########################################################################
+    #                right boundary: i = Nx-1 and all (j, k)                  #
+    ###########################################################################
+    sites = right
+
+    # -------------------------- bn derivatives --------------------------------
+    defn_sm1, defn_s, dv_sm1, dv_s = get_jn_derivs(sys, efn, v, sites - 1, sites, sys.dx[-1])
+    defn_s += sys.Scn[1] * n[sites]
+    dv_s += sys.Scn[1] * n[sites]
+    columns = [3 * (sites - 1), 3 * (sites - 1) + 2, 3 * sites, 3 * sites + 2]
+    J.fill(3 * sites, 0, columns, [defn_sm1, dv_sm1, defn_s, dv_s])
+
+    # -------------------------- bp derivatives --------------------------------
+    defp_sm1, defp_s, dv_sm1, dv_s = get_jp_derivs(sys, efp, v, sites - 1, sites, sys.dx[-1])
+    defp_s += sys.Scp[1] * p[sites]
+    dv_s += sys.Scp[1] * p[sites]
+    columns = [3 * (sites - 1) + 1, 3 * (sites - 1) + 2, 3 * sites + 1, 3 * sites + 2]
+    J.fill(3 * sites + 1, 0, columns, [defp_sm1, dv_sm1, defp_s, dv_s])
+
+    # -------------------------- bv derivatives --------------------------------
+    J.fill(3 * sites + 2, 0, [3 * sites + 2], [np.ones((len(sites),))])
+
+    return J.tocsr()
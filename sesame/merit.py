@@ -0,0 +1,294 @@
+# Copyright 2017 University of Maryland.
+#
+# This file is part of Sesame. It is subject to the license terms in the file
+# LICENSE.rst found in the top-level directory of this distribution.
+
+import numpy as np
+from scipy.sparse.linalg import splu
+from scipy.special import lambertw
+
+from .analyzer import Analyzer
+from .response import _jacobian, _current_functional, _warm_start, \
+                      _operating_point
+
+import logging
+
+__all__ = ['figures_of_merit']
+
+
+class _Curve():
+    # Points of the current-voltage curve solved so far. Each point holds the
+    # solution, the current and the derivatives of both with respect to the
+    # applied voltage, obtained from the Jacobian of the solution. A new
+    # voltage is solved starting from the linear prediction of the nearest
+    # point.
+
+    def __init__(self, sys, solver, tol, maxiter, vtol, maxsolves):
+        self.sys, self.solver = sys, solver
+        self.tol, self.maxiter = tol, maxiter
+        self.vtol, self.maxsolves = vtol, maxsolves
+        self.points = []
+        self.solves = 0
+        # sign of the short-circuit current
+        self.sign = 1
+
+        # sites of the right contact and sign of the voltage to apply, as in
+        # Solver.IVcurve
+        nx = sys.nx
+        self.contact = np.arange(sys.ny * sys.nz) * nx + nx-1
+        self.q = 1 if sys.rho[nx-1] < 0 else -1
+
+    def add(self, voltage, solution):
+        sys = self.sys
+        size = 3 * sys.nx * sys.ny * sys.nz
+
+        # derivative of the solution with respect to the applied voltage (the
+        # contact rows of the Jacobian are the identity)
+        b = np.zeros((size,))
+        b[3*self.contact+2] = self.q / sys.scaling.energy
+        tangent = splu(_jacobian(sys, solution)).solve(b)
+        _, _, _, _, grad = _current_functional(sys, solution)
+
+        point = {'voltage': voltage, 'solution': solution,
+                 'current': Analyzer(sys, solution).full_current(),
+                 'slope': grad.dot(tangent), 'tangent': tangent}
+        self.points.append(point)
+        return point
+
+    def solve(self, voltage):
+        # nearest point and linear prediction of the solution
+        p = min(self.points, key=lambda p: abs(p['voltage'] - voltage))
+        dv = voltage - p['voltage']
+        guess = _warm_start(p['solution'], dv * p['tangent'])
+        guess['v'][self.contact] = self.solver.equilibrium[self.contact] \
+                                 + self.q * voltage / self.sys.scaling.energy
+
+        if self.solves >= self.maxsolves:
+            raise RuntimeError("The figures of merit were not found within "\
+                               "{0} solves.".format(self.maxsolves))
+        self.solves += 1
+        solution = self.solver.solve(self.sys, guess=guess, tol=self.tol,
+                                     maxiter=self.maxiter, verbose=False)
+
+        if solution is None:
+            # continuation through the middle of the voltage step
+            if abs(dv) < 2 * self.vtol:
+                raise RuntimeError("The solver failed to converge for the "\
+                                   "applied voltage {0} V.".format(voltage))
+            logging.info("The solver failed to converge for the applied "\
+                         "voltage {0} V, the step is halved.".format(voltage))
+            self.solve(p['voltage'] + dv / 2)
+            return self.solve(voltage)
+        return self.add(voltage, solution)
+
+
+def _diode(p, jsc):
+    # Parameters (m, A) of the diode model j = jsc - A exp(V / m) matching the
+    # current and its derivative at the point p, or None if the losses are
+    # too small to be resolved. Currents are counted positive at short circuit.
+    loss = jsc - p['j']
+    if loss < 1e-3 * jsc or p['dj'] >= 0:
+        return None
+    m = loss / -p['dj']
+    return m, loss * np.exp(-p['voltage'] / m)
+
+
+def _open_circuit(curve, jsc, step, vmax):
+    # Voltage at which the current vanishes. Newton steps on the logarithm of
+    # the losses of the diode model, limited to the given step and kept
+    # within the bracket of the root once it is known.
+    lo, hi = curve.points[0], None
+    p = lo
+    while True:
+        if p['j'] > 0 and p['voltage'] >= lo['voltage']:
+            lo = p
+        if p['j'] <= 0 and (hi is None or p['voltage'] < hi['voltage']):
+            hi = p
+
+        model = _diode(p, jsc)
+        if model is not None:
+            m, A = model
+            v = m * np.log(jsc / A)
+        elif p['dj'] < 0:
+            v = p['voltage'] - p['j'] / p['dj']
+        else:
+            v = np.inf
+        v = np.clip(v, p['voltage'] - step, p['voltage'] + step)
+
+        if hi is not None and not lo['voltage'] < v < hi['voltage']:
+            # secant step between the ends of the bracket
+            v = lo['voltage'] - lo['j'] * (hi['voltage'] - lo['voltage']) \
+                                        / (hi['j'] - lo['j'])
+        if abs(v - p['voltage']) < curve.vtol:
+            return p
+        if v > vmax and p['voltage'] >= vmax:
+            raise RuntimeError("The open-circuit voltage is larger than "\
+                               "{0} V.".format(vmax))
+        v = min(v, vmax)
+        p = _signed(curve.solve(v), curve.sign)
+
+
+def _maximum_power(curve, jsc, voc):
+    # Voltage at which the derivative of the power j*V vanishes, bracketed by
+    # the short and open circuits. The first step goes to the maximum of the
+    # diode model at the open circuit, the next ones are secant steps on the
+    # derivative of the power through the last point and its nearest
+    # neighbor. Steps leaving the bracket are replaced by a secant step between
+    # its ends, and by a bisection when they are not half the step before the
+    # last one. A step smaller than the tolerance is extended to the other side
+    # of the root, so that the bracket closes on it.
+    def dpower(p):
+        return p['j'] + p['voltage'] * p['dj']
+
+    def secant(p1, p2):
+        return p1['voltage'] - dpower(p1) * (p2['voltage'] - p1['voltage']) \
+                                          / (dpower(p2) - dpower(p1))
+
+    inside = [p for p in curve.points if 0 <= p['voltage'] <= voc['voltage']]
+    lo = max([p for p in inside if dpower(p) > 0], key=lambda p: p['voltage'])
+    hi = min([p for p in inside if dpower(p) <= 0], key=lambda p: p['voltage'])
+    steps = [np.inf, np.inf]
+    p = None
+    while hi['voltage'] - lo['voltage'] > 2 * curve.vtol:
+        model = _diode(voc, jsc)
+        if p is None and model is not None:
+            m, A = model
+            v = m * (lambertw(np.e * (jsc + A) / A).real - 1)
+        elif p is None:
+            v = secant(lo, hi)
+        else:
+            q = min((q for q in curve.points if q is not p),
+                    key=lambda q: abs(q['voltage'] - p['voltage']))
+            v = secant(p, q)
+            if abs(v - p['voltage']) < curve.vtol:
+                v = v + np.sign(v - p['voltage']) * curve.vtol / 2
+        if not lo['voltage'] < v < hi['voltage']:
+            v = secant(lo, hi)
+        if p is not None and abs(v - p['voltage']) > steps[-2] / 2:
+            v = (lo['voltage'] + hi['voltage']) / 2
+
+        steps.append(abs(v - (voc if p is None else p)['voltage']))
+        p = _signed(curve.solve(v), curve.sign)
+        if dpower(p) > 0:
+            lo = p
+        else:
+            hi = p
+    return max((lo, hi), key=lambda p: p['j'] * p['voltage'])
+
+
+def _signed(p, sign):
+    # current and its derivative counted positive at short circuit
+    p['j'], p['dj'] = sign * p['current'], sign * p['slope']
+    return p
+
+
+def figures_of_merit(sys, step=0.3, vmax=None, vtol=1e-4, tol=1e-6,
+                     maxiter=300, maxsolves=40, solver=None):
+    """
+    Compute the short-circuit current, open-circuit voltage, fill factor and
+    maximum power point of an illuminated system.
+
+    The current-voltage curve is solved at a few voltages chosen to locate its
+    remarkable points, instead of a regular voltage grid. For each solution,
+    the derivatives of the solution and of the steady state current with
+    respect to the applied voltage are obtained with the Jacobian of the
+    solution. The next voltage is solved starting from the linear prediction
+    of the nearest solution, which converges for voltage steps of several
+    tenths of volts. The open-circuit voltage is found with Newton steps on
+    the logarithm of the recombination losses. The maximum power point is
+    first estimated with the diode model fitted at the open circuit, then
+    refined with secant steps on the derivative of the power. Both searches
+    are safeguarded within the bracket of the root. A typical extraction takes
+    10 to 15 solves.
+
+    Parameters
+    ----------
+    sys: Builder
+        The discretized system (one- or two-dimensional), with the generation
+        rate of the illumination.
+    step: float
+        Largest voltage step taken before the open-circuit voltage is
+        bracketed [V].
+    vmax: float
+        Largest voltage applied [V]. Default is the largest band gap of the
+        system.
+    vtol: float
+        Accuracy of the open-circuit voltage and of the voltage of the
+        maximum power point [V].
+    tol: float
+        Accepted error made by the Newton-Raphson scheme.
+    maxiter: integer
+        Maximum number of steps taken by the Newton-Raphson scheme.
+    maxsolves: integer
+        Maximum number of solves. An exception is raised if the figures of
+        merit are not found within this number of solves.
+    solver: Solver
+        Solver used for the solutions. A new instance is created if not given.
+
+    Returns
+    -------
+    result: dictionary
+        Dictionary with the following keys (the currents are dimensionless,
+        multiply by ``sys.scaling.current`` to obtain A/cm\ :sup:`2`, and by
+        ``sys.scaling.length`` in 2D to obtain A/cm):
+
+        * 'Jsc': short-circuit current.
+        * 'Voc': open-circuit voltage [V].
+        * 'Vmp', 'Jmp': voltage [V] and current at the maximum power point.
+        * 'Pmax': maximum power, Vmp * Jmp, counted positive.
+        * 'FF': fill factor, Pmax / (Voc * Jsc).
+        * 'solutions': dictionary of the solutions at the 'short_circuit',
+          'open_circuit' and 'maximum_power' points.
+        * 'voltages', 'currents': all the points of the current-voltage curve
+          solved, in increasing voltage order.
+        * 'solves': number of nonlinear solves, including the equilibrium
+          potential and the solves that did not converge.
+
+    Notes
+    -----
+    The currents have the sign of :func:`~sesame.analyzer.Analyzer.full_current`.
+    Voltages are applied on the right contact with the sign convention of
+    :func:`~sesame.solvers.Solver.IVcurve`, positive voltages forward biasing
+    the system.
+
+    Examples
+    --------
+    >>> fom = sesame.figures_of_merit(sys)
+    >>> Jsc = fom['Jsc'] * sys.scaling.current * 1e3  # [mA/cm^2]
+    >>> print(fom['Voc'], fom['FF'], fom['solves'])
+    """
+
+    if sys.dimension == 3:
+        raise ValueError("figures_of_merit is not implemented for "
+                         "three-dimensional systems.")
+
+    if vmax is None:
+        vmax = np.max(sys.Eg) * sys.scaling.energy
+
+    # short circuit
+    solves = 1 if solver is not None and solver.equilibrium is not None else 2
+    solution, solver = _operating_point(sys, None, solver, tol, maxiter)
+    curve = _Curve(sys, solver, tol, maxiter, vtol, maxsolves - solves)
+    sc = curve.add(0., solution)
+    if sc['current'] == 0:
+        raise ValueError("The system does not produce a short-circuit current.")
+    curve.sign = np.sign(sc['current'])
+    _signed(sc, curve.sign)
+    jsc = sc['j']
+
+    oc = _open_circuit(curve, jsc, step, vmax)
+    mp = _maximum_power(curve, jsc, oc)
+
+    voc, vmp = oc['voltage'], mp['voltage']
+    pmax = vmp * mp['j']
+    points = sorted(curve.points, key=lambda p: p['voltage'])
+    result = {'Jsc': sc['current'], 'Voc': voc, 'Vmp': vmp,
+              'Jmp': mp['current'], 'Pmax': pmax, 'FF': pmax / (voc * jsc),
+              'solutions': {'short_circuit': sc['solution'],
+                            'open_circuit': oc['solution'],
+                            'maximum_power': mp['solution']},
+              'voltages': np.array([p['voltage'] for p in points]),
+              'currents': np.array([p['current'] for p in points]),
+              'solves': solves + curve.solves}
+    logging.info("Figures of merit found with {0} solves.".format(result['solves']))
+    return result
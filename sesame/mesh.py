@@ -0,0 +1,501 @@
+# Copyright 2017 University of Maryland.
+#
+# This file is part of Sesame. It is subject to the license terms in the file
+# LICENSE.rst found in the top-level directory of this distribution.
+
+import numpy as np
+import copy
+
+from .observables import get_jn, get_jp, get_bulk_rr
+from .utils import get_indices, get_point_defects_sites, get_line_defects_sites, \
+                   get_boundaries_sites, get_defect_segments
+
+import logging
+logging.basicConfig(level=logging.DEBUG, format='%(levelname)s: %(message)s')
+
+__all__ = ['coarsen', 'prolongate', 'interpolate', 'adapt']
+
+
+# material parameters whose discontinuities are kept in coarsened meshes
+_material_keys = ['Nc', 'Nv', 'Eg', 'epsilon', 'mu_e', 'mu_h', 'tau_e', 'tau_h',
+                  'bl', 'B', 'Cn', 'Cp', 'Etrap']
+
+
+def _interfaces(sys, axis):
+    # Indices of the nodes (along x if axis=1, along y if axis=0) on both sides
+    # of a junction (sign change of the doping), of a step of the doping, or of
+    # a change of material.
+    nx, ny = sys.nx, sys.ny
+    keep = np.zeros(((ny, nx)[axis],), dtype=bool)
+    if (nx, ny)[1-axis] < 2:
+        return keep
+
+    def jumps(a, threshold):
+        a = a.reshape(ny, nx)
+        a0 = a[:, :-1] if axis == 1 else a[:-1, :]
+        a1 = a[:, 1:] if axis == 1 else a[1:, :]
+        scale = np.maximum(np.abs(a0), np.abs(a1))
+        scale[scale == 0] = 1
+        return np.any(np.abs(a1 - a0) > threshold * scale, axis=1-axis)
+
+    rho = sys.rho.reshape(ny, nx)
+    r0 = rho[:, :-1] if axis == 1 else rho[:-1, :]
+    r1 = rho[:, 1:] if axis == 1 else rho[1:, :]
+    change = np.any(r0 * r1 < 0, axis=1-axis) | jumps(sys.rho, 0.5)
+    for key in _material_keys:
+        change |= jumps(getattr(sys, key), 0.1)
+
+    keep[:-1] |= change
+    keep[1:] |= change
+    return keep
+
+
+def _decimate(n, keep):
+    # Every other node between the nodes that must be kept
+    keep = np.copy(keep)
+    keep[0] = keep[-1] = True
+    kept = np.nonzero(keep)[0]
+    idx = [kept[0]]
+    for a, b in zip(kept[:-1], kept[1:]):
+        idx.extend(range(a+2, b, 2))
+        idx.append(b)
+    return np.unique(idx)
+
+
+def coarsen(sys, minimum=5):
+    """
+    Create a system on a coarser mesh, obtained by removing every other line of
+    the mesh of a given system. The nodes on both sides of junctions and of
+    material interfaces are kept, as well as the lines containing the ends of
+    the defects, so that the refinement of the original mesh in these regions
+    is preserved.
+
+    Parameters
+    ----------
+    sys: Builder
+        The discretized system.
+    minimum: integer
+        Minimum number of nodes in a direction for it to be coarsened.
+
+    Returns
+    -------
+    coarse: Builder
+        System on the coarse mesh, or None if the mesh cannot be coarsened.
+        The indices of the nodes of the original mesh kept in the x and y
+        directions are stored as the attributes ``ix`` and ``iy``.
+    """
+
+    if sys.dimension == 3:
+        logging.warning("Coarsening is not implemented for three-dimensional "
+                        "systems.")
+        return None
+
+    nx, ny = sys.nx, sys.ny
+
+    keepx = _interfaces(sys, 1)
+    keepy = _interfaces(sys, 0) if ny > 1 else np.ones((1,), dtype=bool)
+    for d in sys.defects_list:
+        if isinstance(d.location, float):
+            points = [(d.location, 0)]
+        else:
+            points = [p for segment in get_defect_segments(d.location) \
+                        for p in segment]
+        for (x, y) in points:
+            i, j = get_indices(sys, (x, y, 0))
+            keepx[min(i, nx-1)] = True
+            if ny > 1:
+                keepy[min(j, ny-1)] = True
+
+    ix = np.arange(nx)
+    if nx >= minimum:
+        ix = _decimate(nx, keepx)
+    iy = np.arange(ny)
+    if ny >= minimum:
+        iy = _decimate(ny, keepy)
+    if len(ix) == nx and len(iy) == ny:
+        return None
+
+    coarse = copy.copy(sys)
+    coarse._cache = {} # the lattice quantities of sys do not apply
+    coarse.ix, coarse.iy = ix, iy
+    coarse.xpts = sys.xpts[ix]
+    coarse.ypts = sys.ypts[iy]
+    coarse.nx, coarse.ny = len(ix), len(iy)
+    coarse.dx = (coarse.xpts[1:] - coarse.xpts[:-1]) / sys.scaling.length
+    if ny == 1:
+        coarse.dy = np.array([coarse.dx[0]])
+    else:
+        last = sys.dy[-1] if np.isinf(sys.dy[-1]) else None
+        coarse.dy = (coarse.ypts[1:] - coarse.ypts[:-1]) / sys.scaling.length
+        coarse.dy = np.append(coarse.dy, coarse.dy[0] if last is None else last)
+
+    # site dependent quantities
+    sites = (iy[:, None] * nx + ix[None, :]).flatten()
+    for key, value in vars(sys).items():
+        if isinstance(value, np.ndarray) and value.shape == (nx*ny,):
+            setattr(coarse, key, value[sites])
+
+    # defects located on the new mesh
+    coarse.defects_list = []
+    for d in sys.defects_list:
+        if isinstance(d.location, float):
+            s, dl = get_point_defects_sites(coarse, d.location)
+        elif np.isscalar(d.location[0][0]):
+            s, dl = get_line_defects_sites(coarse, d.location)
+        else:
+            coarse.defects_list.append(_relocate_boundaries(sys, coarse, d))
+            continue
+        coarse.defects_list.append(d._replace(sites=s, perp_dl=dl))
+
+    return coarse
+
+
+def _relocate_boundaries(sys, coarse, d):
+    # Grain boundaries (see Builder.add_grain_boundaries) on the mesh of
+    # coarse. The parameters given site by site are those of the boundary
+    # each site belongs to.
+    _, _, owner = get_boundaries_sites(sys, d.location)
+    s, dl, new_owner = get_boundaries_sites(coarse, d.location)
+    params = {'sites': s, 'perp_dl': dl}
+    for name in ('dos', 'energy', 'sigma_e', 'sigma_h'):
+        value = getattr(d, name)
+        if isinstance(value, np.ndarray):
+            boundary = np.zeros((len(d.location),))
+            boundary[owner] = value
+            params[name] = boundary[new_owner]
+    return d._replace(**params)
+
+
+def _weights(xc, xf):
+    # Linear interpolation weights from the nodes xc to the nodes xf
+    idx = np.clip(np.searchsorted(xc, xf, side='right') - 1, 0, len(xc) - 2)
+    w = (xf - xc[idx]) / (xc[idx+1] - xc[idx])
+    return idx, np.clip(w, 0, 1)
+
+
+def _tensor_interpolation(f, xs, ys, xt, yt):
+    # Bilinear interpolation of f (shape (len(ys), len(xs))) onto the nodes
+    # (xt, yt). A single node in one direction is replicated.
+    if len(xs) > 1:
+        ix, wx = _weights(xs, xt)
+        f = f[:, ix] * (1 - wx) + f[:, ix+1] * wx
+    else:
+        f = np.tile(f, (1, len(xt)))
+    if len(ys) > 1:
+        iy, wy = _weights(ys, yt)
+        f = f[iy, :] * (1 - wy[:, None]) + f[iy+1, :] * wy[:, None]
+    else:
+        f = np.tile(f, (len(yt), 1))
+    return f
+
+
+def prolongate(coarse, solution, sys):
+    """
+    Interpolate a solution computed on a coarsened system onto the mesh of the
+    original system (bilinear interpolation).
+
+    Parameters
+    ----------
+    coarse: Builder
+        System on the coarse mesh, as returned by :func:`coarsen`.
+    solution: dictionary of numpy arrays of floats
+        Solution on the coarse mesh. Keys are 'efn', 'efp' and/or 'v'.
+    sys: Builder
+        System on the fine mesh (one- or two-dimensional).
+
+    Returns
+    -------
+    result: dictionary of numpy arrays of floats
+        Solution on the fine mesh, with the same keys.
+    """
+
+    if sys.dimension == 3:
+        raise ValueError("prolongate is not implemented for "
+                         "three-dimensional systems.")
+
+    result = {}
+    for key, value in solution.items():
+        f = np.asarray(value).reshape(coarse.ny, coarse.nx)
+        f = _tensor_interpolation(f, coarse.xpts, coarse.ypts[:coarse.ny],
+                                  sys.xpts, sys.ypts[:sys.ny])
+        result[key] = f.flatten()
+    return result
+
+
+def interpolate(source, solution, target):
+    """
+    Interpolate a solution computed on the mesh of a system onto the mesh of
+    another system, to be used as a guess for the solver.
+
+    The electrostatic potential and the quasi-Fermi levels are interpolated
+    bilinearly on the tensor product meshes, in physical units (the two
+    systems can have different temperatures or length units). The
+    electrostatic potential on the contacts is a Dirichlet boundary condition:
+    it is set to the equilibrium value of the target system, shifted by the
+    voltage applied in the source solution, so that the guess keeps the
+    boundary conditions of the source solution.
+
+    Parameters
+    ----------
+    source: Builder
+        System on which the solution was computed (one- or two-dimensional).
+    solution: dictionary of numpy arrays of floats
+        Solution on the mesh of the source system. Keys are 'efn', 'efp'
+        and/or 'v'.
+    target: Builder
+        System onto which the solution is interpolated (one- or
+        two-dimensional).
+
+    Returns
+    -------
+    result: dictionary of numpy arrays of floats
+        Solution on the mesh of the target system, with the same keys.
+
+    Examples
+    --------
+    Reuse a solution saved with :func:`~sesame.utils.save_sim` on a modified
+    mesh:
+
+    >>> sys0, result = sesame.load_sim('solution.gzip')
+    >>> guess = sesame.interpolate(sys0, result, sys)
+    >>> result = sesame.solve(sys, guess=guess)
+    """
+    from .solvers import Solver
+
+    if source.dimension == 3 or target.dimension == 3:
+        raise ValueError("interpolate is not implemented for "
+                         "three-dimensional systems.")
+
+    # mesh nodes in the length unit of the target system
+    units = {'cm': 1., 'm': 100.}
+    ratio = units[source.input_length] / units[target.input_length]
+    xs, ys = source.xpts * ratio, source.ypts[:source.ny] * ratio
+    xt, yt = target.xpts, target.ypts[:target.ny]
+    # energy unit of the target system
+    factor = source.scaling.energy / target.scaling.energy
+
+    result = {}
+    for key, value in solution.items():
+        f = np.asarray(value).reshape(source.ny, source.nx) * factor
+        result[key] = _tensor_interpolation(f, xs, ys, xt, yt).flatten()
+
+    if 'v' in solution:
+        # shift of the contact potentials with respect to equilibrium
+        v = np.asarray(solution['v']).reshape(source.ny, source.nx)
+        veq = Solver().make_guess(source).reshape(source.ny, source.nx)
+        shift = (v[:, [0, -1]] - veq[:, [0, -1]]) * factor
+        shift = _tensor_interpolation(shift, np.array([xt[0], xt[-1]]), ys,
+                                      np.array([xt[0], xt[-1]]), yt)
+        v = result['v'].reshape(target.ny, target.nx)
+        veq = Solver().make_guess(target).reshape(target.ny, target.nx)
+        v[:, [0, -1]] = veq[:, [0, -1]] + shift
+    return result
+
+
+def _refinement_indicators(sys, solution, resolution, tol):
+    # Intervals of the mesh to refine in the x and y directions. An interval is
+    # marked if
+    # - the variations of the potential or of the quasi-Fermi levels, or the
+    #   second difference of the potential, exceed the resolution (in units of
+    #   kT/q),
+    # - the second difference of the carrier currents along x (variation of
+    #   the generation and recombination rates, current continuity) exceeds
+    #   the fraction tol of the current,
+    # - it is next to a contact and the net generation rate of the half cell
+    #   of the contact, which does not contribute to the current, exceeds the
+    #   fraction tol of the current.
+    nx, ny = sys.nx, sys.ny
+    v = solution['v'].reshape(ny, nx)
+    efn = solution['efn'].reshape(ny, nx)
+    efp = solution['efp'].reshape(ny, nx)
+
+    def variations(axis):
+        eta = np.zeros((ny, nx-1) if axis == 1 else (ny-1, nx))
+        for f in (v, efn, efp):
+            eta = np.maximum(eta, np.abs(np.diff(f, axis=axis)))
+        curv = np.abs(np.diff(v, n=2, axis=axis))
+        if axis == 1:
+            eta[:, :-1] = np.maximum(eta[:, :-1], curv)
+            eta[:, 1:] = np.maximum(eta[:, 1:], curv)
+        else:
+            eta[:-1, :] = np.maximum(eta[:-1, :], curv)
+            eta[1:, :] = np.maximum(eta[1:, :], curv)
+        return eta.max(axis=1-axis) > resolution
+
+    markx = variations(1)
+    marky = variations(0) if ny > 1 else np.zeros((0,), dtype=bool)
+
+    # currents along x
+    sites = np.arange(nx*ny, dtype=int).reshape(ny, nx)[:, :-1].flatten()
+    dx = np.tile(sys.dx, ny)
+    jn = get_jn(sys, solution['efn'], solution['v'], sites, sites+1, dx)
+    jp = get_jp(sys, solution['efp'], solution['v'], sites, sites+1, dx)
+    jn, jp = jn.reshape(ny, nx-1), jp.reshape(ny, nx-1)
+    jmax = np.abs(jn + jp).max()
+    if jmax == 0:
+        return markx, marky
+
+    if nx > 3:
+        c = (np.abs(np.diff(jn, n=2, axis=1)) + np.abs(np.diff(jp, n=2, axis=1)))
+        c = c.max(axis=0) / jmax > tol
+        markx[:-2] |= c
+        markx[1:-1] |= c
+        markx[2:] |= c
+
+    # net generation of the contact cells
+    n = sys.Nc * np.exp(sys.bl + solution['efn'] + solution['v'])
+    p = sys.Nv * np.exp(-sys.Eg - sys.bl - solution['efp'] - solution['v'])
+    u = np.abs(sys.g - get_bulk_rr(sys, n, p)).reshape(ny, nx)
+    if u[:, 0].max() * sys.dx[0] / 2 > tol * jmax:
+        markx[0] = True
+    if u[:, -1].max() * sys.dx[-1] / 2 > tol * jmax:
+        markx[-1] = True
+    return markx, marky
+
+
+def _midpoints(pts, mark):
+    # Insert the midpoints of the marked intervals
+    mid = (pts[:-1] + pts[1:])[mark] / 2.
+    return np.sort(np.concatenate((pts, mid)))
+
+
+def adapt(build, xpts, ypts=None, voltages=(0,), tol=1e-3, resolution=1.,
+          max_nodes=100000, maxiter=10, solver_tol=1e-6, verbose=True):
+    """
+    Adaptive refinement of a tensor product mesh. The system is solved on an
+    initial (coarse) mesh, grid lines are inserted where the solution varies
+    rapidly, and the system is rebuilt and solved again, until the steady
+    state current no longer changes.
+
+    Parameters
+    ----------
+    build: function
+        Function taking the arrays of the mesh nodes in the x and y directions
+        (the second one is None for a one-dimensional system) and returning
+        the discretized system (Builder).
+    xpts, ypts: numpy arrays of floats
+        Initial mesh in the x and y directions [cm].
+    voltages: array-like
+        Voltages applied on the right contact at which the current is
+        computed [V].
+    tol: float
+        Accepted relative variation of the current between two successive
+        meshes. Intervals where the second difference of the carrier currents
+        exceeds this fraction of the current are refined.
+    resolution: float
+        Largest accepted variation of the electrostatic potential and of the
+        quasi-Fermi levels (and second difference of the electrostatic
+        potential) between neighboring nodes (in units of kT/q).
+    max_nodes: integer
+        Maximum number of nodes of the mesh.
+    maxiter: integer
+        Maximum number of refinement steps.
+    solver_tol: float
+        Accepted error made by the Newton-Raphson scheme.
+    verbose: boolean
+        Print the size of the mesh and the currents at each step.
+
+    Returns
+    -------
+    sys: Builder
+        The system on the final mesh.
+    solutions: list of dictionaries
+        Steady states of the system for each voltage.
+    J: numpy array of floats
+        Steady state current for each voltage.
+    """
+    from .solvers import Solver
+    from .analyzer import Analyzer
+
+    previous = None
+    J0 = None
+    for it in range(maxiter + 1):
+        sys = build(xpts) if ypts is None else build(xpts, ypts)
+        solver = Solver()
+
+        # equilibrium, starting from the previous mesh if available
+        guess = None
+        if previous is not None:
+            psys, psolutions, pequilibrium = previous
+            guess = interpolate(psys, {'v': pequilibrium}, sys)['v']
+        solver.solve(sys, compute='Poisson', guess=guess, tol=solver_tol,
+                     verbose=False)
+        if solver.equilibrium is None:
+            logging.error("The equilibrium could not be computed on the mesh "
+                          "of step {0}.".format(it))
+            if previous is None:
+                return sys, [], np.full((len(voltages),), np.nan)
+            break
+
+        # steady states for all voltages
+        nx = sys.nx
+        right = [nx-1 + j*nx for j in range(sys.ny)]
+        q = 1 if sys.rho[nx-1] < 0 else -1
+        result = {'efn': np.zeros_like(solver.equilibrium),
+                  'efp': np.zeros_like(solver.equilibrium),
+                  'v': np.copy(solver.equilibrium)}
+        solutions, J = [], np.zeros((len(voltages),))
+        vprev = 0
+        for vdx, vapp in enumerate(voltages):
+            if previous is not None:
+                result = interpolate(psys, psolutions[vdx], sys)
+                vprev = vapp
+            # voltage steps are halved until the solver converges
+            for level in range(5):
+                steps = [vapp]
+                if vapp != vprev:
+                    steps = np.linspace(vprev, vapp, 2**level + 1)[1:]
+                guess = {k: np.copy(a) for k, a in result.items()}
+                for vstep in steps:
+                    guess['v'][right] = solver.equilibrium[right] +\
+                                        q * vstep / sys.scaling.energy
+                    guess = solver.solve(sys, guess=guess, tol=solver_tol,
+                                         verbose=False)
+                    if guess is None:
+                        break
+                if guess is not None:
+                    break
+            result = guess
+            vprev = vapp
+            if result is None:
+                break
+            solutions.append(result)
+            J[vdx] = Analyzer(sys, result).full_current()
+        if len(solutions) < len(voltages):
+            logging.error("The steady state could not be computed on the mesh "
+                          "of step {0}.".format(it))
+            if previous is None:
+                J[len(solutions):] = np.nan
+                return sys, solutions, J
+            break
+
+        if verbose:
+            logging.info("Mesh {0} x {1}: J = {2}".format(sys.nx, sys.ny, J))
+        previous = (sys, solutions, solver.equilibrium)
+        best = (sys, solutions, J)
+
+        # convergence of the current
+        if J0 is not None:
+            scale = np.maximum(np.abs(J), np.abs(J).max() * 1e-3)
+            if np.all(np.abs(J - J0) <= tol * scale):
+                break
+        J0 = J
+
+        # refinement
+        markx = np.zeros((sys.nx-1,), dtype=bool)
+        marky = np.zeros((max(sys.ny-1, 0),), dtype=bool)
+        for solution in solutions:
+            mx, my = _refinement_indicators(sys, solution, resolution, tol)
+            markx |= mx
+            if sys.ny > 1:
+                marky |= my
+        if not np.any(markx) and not np.any(marky):
+            break
+        newx = _midpoints(xpts, markx)
+        newy = ypts if ypts is None or sys.ny == 1 else _midpoints(ypts, marky)
+        if len(newx) * (1 if newy is None else len(newy)) > max_nodes:
+            logging.info("Maximum number of nodes reached.")
+            break
+        xpts, ypts = newx, newy
+
+    return best
@@ -227,8 +227,8 @@ class DMumpsContext(_MumpsBaseContext):
 # Functions
 ########################################################################
 
-def spsolve(A, b):
-    """Sparse solve A\b."""
+def spsolve(A, b, out_of_core=False):
+    """Sparse solve A\b. The factors are stored on disk if out_of_core is True."""
     assert A.dtype == 'd' and b.dtype == 'd', "Only double precision supported."
     with DMumpsContext(sym=0) as ctx:
         # Set the sparse matrix
@@ -245,6 +245,10 @@ def spsolve(A, b):
         # 5: METIS
         ctx.set_icntl(7, 4)
 
+        # Out-of-core factorization
+        if out_of_core:
+            ctx.set_icntl(22, 1)
+
         # Analysis + Factorization + Solve
         ctx.run(job=6)
 
@@ -57,14 +57,16 @@ def get_p(sys, efp, v, sites):
     return p
 
 
-def get_bulk_rr(sys, n, p):
-    # Compute the bulk recombination of the entire system for SRH, radiative and
-    # Auger mechanisms
-    ni2 = sys.ni ** 2
+def get_bulk_rr(sys, n, p, sites=None):
+    # Compute the bulk recombination of the entire system (or of the given
+    # sites only) for SRH, radiative and Auger mechanisms
+    s = slice(None) if sites is None else sites
+    n, p = n[s], p[s]
+    ni2 = sys.ni[s] ** 2
     _np = n * p
-    r = (_np - ni2) / (sys.tau_h * (n + sys.n1) + sys.tau_e * (p + sys.p1)) \
-        + (sys.Cn * n + sys.Cp * p) * (_np - ni2) \
-        + sys.B * (_np - ni2)
+    r = (_np - ni2) / (sys.tau_h[s] * (n + sys.n1[s]) + sys.tau_e[s] * (p + sys.p1[s])) \
+        + (sys.Cn[s] * n + sys.Cp[s] * p) * (_np - ni2) \
+        + sys.B[s] * (_np - ni2)
     return r
 
 
@@ -273,17 +275,17 @@ def get_jp_derivs(sys, efp, v, sites_i, sites_ip1, dl):
                 -exp(efpp1) * exp(-vp0)*(1-(efpp0 - efpp1)) / (dl) / (1 - .5*(vp0-vp1) + 1/6.*(vp0-vp1)**2.) * (np.abs(dv0) < tol2)) * (np.abs(defp) < tol3)
 
     dv_i = (-exp(efpp0)*(1 - exp(efpp1-efpp0)) * ev0 * (exp(-dv) + (-1 + dv)) / (dl * exp(2 * vp0) * (1 - exp(-dv)) ** 2) * (np.abs(dv0) >= tol2) + \
-           -6* exp(efpp0)*(1 - exp(efpp1-efpp0)) / dl * (-exp(-vp0)) * (3 + (-1 + vp0)*vp0 + vp1 - 2*vp0*vp1 + vp1**2) \
+           -6* exp(efpp0)*(1 - exp(efpp1-efpp0)) / dl * exp(-vp0) * (3 + (-1 + vp0)*vp0 + vp1 - 2*vp0*vp1 + vp1**2) \
            / (6 + vp0**2 + vp1*(3+vp1) - vp0*(3 + 2*vp1)) ** 2 * (np.abs(dv0) < tol2)) * (np.abs(defp) >= tol3) + \
            (-exp(efpp0) * (-(efpp1 - efpp0)) * ev0 * (exp(-dv) + (-1 + dv)) / (dl * exp(2 * vp0) * (1 - exp(-dv)) ** 2) * (np.abs(dv0) >= tol2) + \
-            -6 * exp(efpp0) * (-(efpp1 - efpp0)) / dl * (-exp(-vp0)) * (3 + (-1 + vp0) * vp0 + vp1 - 2 * vp0 * vp1 + vp1 ** 2) \
+            -6 * exp(efpp0) * (-(efpp1 - efpp0)) / dl * exp(-vp0) * (3 + (-1 + vp0) * vp0 + vp1 - 2 * vp0 * vp1 + vp1 ** 2) \
             / (6 + vp0 ** 2 + vp1 * (3 + vp1) - vp0 * (3 + 2 * vp1)) ** 2 * (np.abs(dv0) < tol2)) * (np.abs(defp) < tol3)
 
     dv_ip1 = (-exp(efpp0)*(1 - exp(efpp1-efpp0)) * ev0 * (1 + exp(-dv) * (-1 - dv)) / (dl * exp(2 * vp0) * (1 - exp(-dv)) ** 2) * (np.abs(dv0) >= tol2) + \
-             6 * exp(efpp0)*(1 - exp(efpp1-efpp0)) / dl * (-exp(-vp0)) * (-3 + 2*vp0 - 2*vp1) \
+             6 * exp(efpp0)*(1 - exp(efpp1-efpp0)) / dl * exp(-vp0) * (-3 + 2*vp0 - 2*vp1) \
                 / (6 + vp0 ** 2 + vp1 * (3 + vp1) - vp0 * (3 + 2 * vp1)) ** 2 * (np.abs(dv0) < tol2)) * (np.abs(defp) >= tol3) + \
              (-exp(efpp0) * (-(efpp1 - efpp0)) * ev0 * (1 + exp(-dv) * (-1 - dv)) / (dl * exp(2 * vp0) * (1 - exp(-dv)) ** 2) * (np.abs(dv0) >= tol2) + \
-              6 * exp(efpp0) * (-(efpp1 - efpp0)) / dl * (-exp(-vp0)) * (-3 + 2 * vp0 - 2 * vp1) \
+              6 * exp(efpp0) * (-(efpp1 - efpp0)) / dl * exp(-vp0) * (-3 + 2 * vp0 - 2 * vp1) \
               / (6 + vp0 ** 2 + vp1 * (3 + vp1) - vp0 * (3 + 2 * vp1)) ** 2 * (np.abs(dv0) < tol2)) * (np.abs(defp) < tol3)
 
 
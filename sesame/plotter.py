@@ -80,13 +80,12 @@ def plot_line_defects(sys, ls='-o', fig=None):
         ax = fig.add_subplot(111)
 
     for c in sys.defects_list:
-        xa, ya = c.location[0]
-        xb, yb = c.location[1]
+        # segments of lines, polylines and grain boundaries
+        for (xa, ya), (xb, yb) in utils.get_defect_segments(c.location):
+            _, _, xcoord, ycoord = utils.Bresenham(sys, (xa, ya,0), (xb,yb,0))
 
-        _, _, xcoord, ycoord = utils.Bresenham(sys, (xa, ya,0), (xb,yb,0))
-
-        # plot the path of added charges
-        ax.plot(sys.xpts[xcoord], sys.ypts[ycoord], ls)
+            # plot the path of added charges
+            ax.plot(sys.xpts[xcoord], sys.ypts[ycoord], ls)
 
     if sys.input_length == 'm':
         ax.set_xlabel('x [m]')
@@ -0,0 +1,651 @@
+# Copyright 2017 University of Maryland.
+#
+# This file is part of Sesame. It is subject to the license terms in the file
+# LICENSE.rst found in the top-level directory of this distribution.
+
+import numpy as np
+from scipy.sparse import csc_matrix
+from scipy.sparse.linalg import splu
+
+from .observables import *
+from .getF import getF
+from .jacobian import getJ
+from .defects import defectsF
+from .analyzer import Analyzer, _terminal_weights
+from .integration import site_weights
+from .solvers import Solver
+
+import logging
+logging.basicConfig(level=logging.DEBUG, format='%(levelname)s: %(message)s')
+
+__all__ = ['ac_analysis', 'current_sensitivities', 'generation_scan', 'eqe']
+
+
+def _jacobian(sys, solution):
+    # Newton Jacobian of the drift-diffusion-Poisson equations at the operating
+    # point given by solution, in compressed column format
+    size = 3 * sys.nx * sys.ny
+    rows, columns, data = getJ(sys, solution['v'], solution['efn'],
+                               solution['efp'])
+    J = csc_matrix((data, (rows, columns)), shape=(size, size),
+                   dtype=np.float64)
+    return J
+
+
+def _storage(sys, solution):
+    # Derivatives of the time dependent terms of the continuity equations with
+    # respect to (efn, efp, v). With the rows of getF, fn = dn/dt and
+    # fp = -dp/dt, so the entries are positive. Contact rows have no storage.
+    nx, ny = sys.nx, sys.ny
+    size = 3 * nx * ny
+    sites = np.arange(nx * ny, dtype=int).reshape(ny, nx)[:, 1:nx-1].flatten()
+
+    n = get_n(sys, solution['efn'], solution['v'], sites)
+    p = get_p(sys, solution['efp'], solution['v'], sites)
+
+    rows = np.concatenate((3*sites, 3*sites, 3*sites+1, 3*sites+1))
+    columns = np.concatenate((3*sites, 3*sites+2, 3*sites+1, 3*sites+2))
+    data = np.concatenate((n, n, p, p))
+    M = csc_matrix((data, (rows, columns)), shape=(size, size),
+                   dtype=np.float64)
+    return M
+
+
+def _current_functional(sys, solution):
+    # Linearization of Analyzer.full_current: returns the sites i and i+1 of
+    # all the planes between two columns of sites, their lattice distances and
+    # weights in the average over the planes, and the derivatives of the
+    # steady state current with respect to the unknowns (efn, efp, v).
+    nx, ny = sys.nx, sys.ny
+    efn, efp, v = solution['efn'], solution['efp'], solution['v']
+
+    sites_i = np.arange(nx*ny, dtype=int).reshape(ny, nx)[:, :nx-1].flatten()
+    sites_ip1 = sites_i + 1
+    dl = np.tile(sys.dx, ny)
+
+    # weights of the currents, identical to those of full_current
+    w, _, _ = _terminal_weights(sys)
+
+    defn_i, defn_ip1, dvn_i, dvn_ip1 = get_jn_derivs(sys, efn, v, sites_i,
+                                                     sites_ip1, dl)
+    defp_i, defp_ip1, dvp_i, dvp_ip1 = get_jp_derivs(sys, efp, v, sites_i,
+                                                     sites_ip1, dl)
+
+    # a site is the site i of a plane and the site i+1 of the previous one
+    grad = np.zeros((3*nx*ny,))
+    np.add.at(grad, 3*sites_i, w * defn_i)
+    np.add.at(grad, 3*sites_ip1, w * defn_ip1)
+    np.add.at(grad, 3*sites_i+1, w * defp_i)
+    np.add.at(grad, 3*sites_ip1+1, w * defp_ip1)
+    np.add.at(grad, 3*sites_i+2, w * (dvn_i + dvp_i))
+    np.add.at(grad, 3*sites_ip1+2, w * (dvn_ip1 + dvp_ip1))
+
+    return sites_i, sites_ip1, dl, w, grad
+
+
+def _generation_rhs(sys, g):
+    # Right hand sides -dF/dg * g of the linearized system for the generation
+    # profiles given as columns of g. The generation rate appears as +g in fn
+    # and -g in fp for the inner sites only.
+    nx, ny = sys.nx, sys.ny
+    inner = np.zeros((nx*ny,), dtype=bool)
+    inner.reshape(ny, nx)[:, 1:nx-1] = True
+
+    g = g * inner[:, None]
+    b = np.zeros((3*nx*ny, g.shape[1]))
+    b[0::3] = -g
+    b[1::3] = g
+    return b
+
+
+def _warm_start(solution, dx):
+    # Starting point of a nonlinear solution from a linear variation dx of the
+    # steady state. The variations of the carrier densities are linear in dx,
+    # not the quasi-Fermi levels themselves, which matters for minority
+    # carriers: the quasi-Fermi levels are obtained from the new densities.
+    dn = 1 + dx[0::3] + dx[2::3]
+    dp = 1 - dx[1::3] - dx[2::3]
+    tiny = 1e-10
+    v = solution['v'] + dx[2::3]
+    efn = solution['efn'] + np.log(np.maximum(dn, tiny)) - dx[2::3]
+    efp = solution['efp'] - np.log(np.maximum(dp, tiny)) - dx[2::3]
+    return {'efn': efn, 'efp': efp, 'v': v}
+
+
+def _nonlinear_current(sys, solution, dx, g, solver, tol, maxiter):
+    # Current of the nonlinear solution with the generation profile g added to
+    # the generation rate of the system, starting from the linear variation dx
+    # of the steady state, or from the steady state itself if this fails.
+    # Returns None if the solution does not converge.
+    g0 = sys.g
+    sys.g = g0 + g
+    try:
+        result = solver.solve(sys, guess=_warm_start(solution, dx), tol=tol,
+                              maxiter=maxiter, verbose=False)
+        if result is None:
+            result = solver.solve(sys, guess=solution, tol=tol,
+                                  maxiter=maxiter, verbose=False)
+    finally:
+        sys.g = g0
+    if result is None:
+        return None
+    return Analyzer(sys, result).full_current()
+
+
+def _operating_point(sys, solution, solver, tol, maxiter):
+    # Make sure the solver holds the equilibrium potential of the system and
+    # compute the steady state if it was not given
+    if solver is None:
+        solver = Solver()
+    if solver.equilibrium is None:
+        solver.solve(sys, compute='Poisson', tol=tol, maxiter=maxiter,
+                     verbose=False)
+        if solver.equilibrium is None:
+            raise RuntimeError("The equilibrium potential could not be computed.")
+    if solution is None:
+        solution = solver.solve(sys, tol=tol, maxiter=maxiter, verbose=False)
+        if solution is None:
+            raise RuntimeError("The steady state could not be computed.")
+    return solution, solver
+
+
+def ac_analysis(sys, solution, frequencies):
+    """
+    Compute the small-signal admittance of a system around a steady state.
+
+    A small sinusoidal voltage is superimposed on the right contact of the
+    system. The drift-diffusion-Poisson equations are linearized around the
+    steady state given by solution, and the time derivatives of the carrier
+    densities add a storage term to the Newton Jacobian. The terminal current
+    includes the displacement current and is averaged over the same planes as
+    :func:`~sesame.analyzer.Analyzer.full_current`.
+
+    Parameters
+    ----------
+    sys: Builder
+        The discretized system (one- or two-dimensional).
+    solution: dictionary of numpy arrays of floats
+        Steady state around which the system is linearized. Keys must be 'efn',
+        'efp' and 'v'.
+    frequencies: array-like
+        Frequencies of the small signal [Hz].
+
+    Returns
+    -------
+    result: dictionary
+        Dictionary with the keys 'frequencies', 'admittance' (complex
+        admittance [S/cm\ :sup:`2`]), 'conductance' (real part of the
+        admittance [S/cm\ :sup:`2`]) and 'capacitance' (imaginary part of the
+        admittance divided by the angular frequency [F/cm\ :sup:`2`]). In 2D
+        the admittance is integrated along the y-direction, so these quantities
+        are given per unit length of the contact [S/cm, F/cm].
+
+    Notes
+    -----
+    The admittance is defined so that a passive device has a positive
+    conductance. At low frequencies it reduces to the derivative of the
+    steady state current with respect to the forward applied voltage.
+
+    The sparsity pattern of the linearized system does not depend on the
+    frequency: the column ordering of the sparse LU decomposition is computed
+    once and reused for all the frequencies.
+
+    Charges trapped at defects are assumed to follow the small signal
+    instantaneously.
+    """
+
+    if sys.dimension == 3:
+        raise ValueError("ac_analysis is not implemented for "
+                         "three-dimensional systems.")
+
+    nx, ny = sys.nx, sys.ny
+    size = 3 * nx * ny
+    frequencies = np.atleast_1d(np.asarray(frequencies, dtype=float))
+
+    J = _jacobian(sys, solution)
+    M = _storage(sys, solution)
+
+    # fill-reducing column ordering obtained once from the real Jacobian
+    perm = np.argsort(splu(J).perm_c)
+    Jp, Mp = J[:, perm], M[:, perm]
+
+    # unit variation of the electrostatic potential on the right contact (the
+    # contact rows of the Jacobian are the identity)
+    contact = np.array([nx-1 + j*nx for j in range(ny)])
+    b = np.zeros((size,), dtype=complex)
+    b[3*contact+2] = 1
+
+    # conduction and displacement currents averaged over the planes of
+    # full_current: the total current is conserved including the displacement
+    # current
+    sites_i, sites_ip1, dl, w, grad = _current_functional(sys, solution)
+    eps = .5 * (sys.epsilon[sites_i] + sys.epsilon[sites_ip1])
+
+    Y = np.zeros(frequencies.shape, dtype=complex)
+    for idx, f in enumerate(frequencies):
+        omega = 2 * np.pi * f * sys.scaling.time
+        lu = splu((Jp - 1j*omega*Mp).tocsc(), permc_spec='NATURAL')
+        dx = np.zeros((size,), dtype=complex)
+        dx[perm] = lu.solve(b)
+
+        dv = dx[3*sites_ip1+2] - dx[3*sites_i+2]
+        dj = grad.dot(dx) - 1j*omega * np.sum(w * eps * dv / dl)
+
+        # raising the potential of the right contact drives a negative current
+        Y[idx] = -dj
+
+    Y = Y * sys.scaling.current / sys.scaling.energy
+    if ny > 1:
+        Y = Y * sys.scaling.length
+    omega = 2 * np.pi * frequencies
+    with np.errstate(divide='ignore', invalid='ignore'):
+        C = np.where(omega > 0, Y.imag / omega, np.nan)
+
+    return {'frequencies': frequencies, 'admittance': Y,
+            'conductance': Y.real, 'capacitance': C}
+
+
+def current_sensitivities(sys, solution):
+    """
+    Compute the derivatives of the steady state current with respect to the
+    bulk lifetimes and the defect parameters of a system.
+
+    The derivatives are obtained with the adjoint method: a single linear
+    solve with the transposed Newton Jacobian gives the sensitivities of the
+    current computed by :func:`~sesame.analyzer.Analyzer.full_current` with
+    respect to all the parameters at once. The applied voltage is held fixed.
+
+    Parameters
+    ----------
+    sys: Builder
+        The discretized system (one- or two-dimensional).
+    solution: dictionary of numpy arrays of floats
+        Converged steady state. Keys must be 'efn', 'efp' and 'v'.
+
+    Returns
+    -------
+    result: dictionary
+        The key 'current' contains the current of the steady state. The keys
+        'tau_e' and 'tau_h' contain arrays with the derivatives of the current
+        with respect to the bulk lifetimes of every site [s\ :sup:`-1`]; their
+        sum is the derivative for a uniform change of lifetime. The key
+        'defects' contains a list of dictionaries, one per defect in the order
+        of ``sys.defects_list``, with the derivatives with respect to the
+        density of states 'dos' [cm\ :sup:`2`] (only when it is not a
+        function), and to the capture cross sections 'sigma_e' and 'sigma_h'
+        [cm\ :sup:`-2`]. For parameters given site by site (see
+        :func:`~sesame.builder.Builder.add_grain_boundaries`), the derivative
+        is taken for a change of all the values in proportion, per unit of
+        their mean.
+
+    Notes
+    -----
+    The current is dimensionless as returned by
+    :func:`~sesame.analyzer.Analyzer.full_current`, while the parameters have
+    the units used to build the system.
+    """
+
+    if sys.dimension == 3:
+        raise ValueError("current_sensitivities is not implemented for "
+                         "three-dimensional systems.")
+
+    nx, ny = sys.nx, sys.ny
+    efn, efp, v = solution['efn'], solution['efp'], solution['v']
+
+    # adjoint variables: J^T lambda = dI/dx
+    J = _jacobian(sys, solution)
+    _, _, _, _, grad = _current_functional(sys, solution)
+    lam = splu(J).solve(grad, trans='T')
+    lam_n, lam_p, lam_v = lam[0::3], lam[1::3], lam[2::3]
+
+    # the recombination and the charge only enter the rows of the inner sites
+    inner = np.zeros((nx*ny,), dtype=bool)
+    inner.reshape(ny, nx)[:, 1:nx-1] = True
+
+    # rows (fn, fp, fv) contain (-r, +r, -rho) so that dI/dtheta =
+    # (lam_n - lam_p) dr/dtheta + lam_v drho/dtheta
+    n = sys.Nc * np.exp(+sys.bl + efn + v)
+    p = sys.Nv * np.exp(-sys.Eg - sys.bl - efp - v)
+    ni2 = sys.ni**2
+    d = sys.tau_h * (n + sys.n1) + sys.tau_e * (p + sys.p1)
+    dr_dtau_e = -(n*p - ni2) * (p + sys.p1) / d**2
+    dr_dtau_h = -(n*p - ni2) * (n + sys.n1) / d**2
+
+    lam_r = (lam_n - lam_p) * inner
+    t = sys.scaling.time
+    result = {'current': Analyzer(sys, solution).full_current(),
+              'tau_e': lam_r * dr_dtau_e / t,
+              'tau_h': lam_r * dr_dtau_h / t,
+              'defects': []}
+
+    # defect contributions are linear in the density of states and smooth in
+    # the capture cross sections: use centered differences of defectsF
+    NN = sys.scaling.density * sys.scaling.length
+    h = 1e-6
+    for defect in sys.defects_list:
+        derivs = {}
+        names = ['sigma_e', 'sigma_h']
+        if not callable(defect.dos):
+            names.insert(0, 'dos')
+        for name in names:
+            value = getattr(defect, name)
+            drho = np.zeros((nx*ny,))
+            dr = np.zeros((nx*ny,))
+            for sign in (1, -1):
+                perturbed = defect._replace(**{name: value * (1 + sign*h)})
+                _rho = np.zeros((nx*ny,))
+                _r = np.zeros((nx*ny,))
+                defectsF(sys, [perturbed], n, p, _rho, _r)
+                drho += sign * _rho / (2*h*np.mean(value))
+                dr += sign * _r / (2*h*np.mean(value))
+            dI = np.sum(lam_r * dr + lam_v * inner * drho)
+            if name == 'dos':
+                derivs[name] = dI / NN
+            else:
+                derivs[name] = dI * NN
+        result['defects'].append(derivs)
+
+    return result
+
+
+def generation_scan(sys, profiles, solution=None, check=3, tol=1e-6,
+                    maxiter=300, solver=None):
+    """
+    Compute the current collected for a series of generation profiles, such
+    as the positions of an electron or laser beam in EBIC and LBIC
+    experiments.
+
+    In the low injection regime the response of the system is linear in the
+    generation rate. The Jacobian of the steady state is factorized once and
+    all the generation profiles are solved as right hand sides of the same
+    linearized system. The linearity is verified by a full nonlinear solution
+    for a few profiles.
+
+    Parameters
+    ----------
+    sys: Builder
+        The discretized system (one- or two-dimensional).
+    profiles: list
+        Generation profiles superimposed on the generation rate of the system.
+        Each profile is either a function or an array accepted by
+        :func:`~sesame.builder.Builder.generation` [cm\ :sup:`-3` s\ :sup:`-1`].
+    solution: dictionary of numpy arrays of floats
+        Steady state of the system without the profiles (dark steady state
+        for instance). Keys must be 'efn', 'efp' and 'v'. It is computed if not
+        given.
+    check: integer
+        Number of profiles, evenly distributed in the list, for which the
+        linear response is compared to a nonlinear solution.
+    tol: float
+        Accepted error made by the Newton-Raphson scheme.
+    maxiter: integer
+        Maximum number of steps taken by the Newton-Raphson scheme.
+    solver: Solver
+        Solver used for the nonlinear solutions. A new instance is created if
+        not given.
+
+    Returns
+    -------
+    result: dictionary
+        Dictionary with the following keys (dimensionless quantities are
+        those returned by :class:`~sesame.analyzer.Analyzer`):
+
+        * 'current': current for each profile.
+        * 'gtot': integrated generation rate of each profile.
+        * 'efficiency': ratio of the current induced by each profile to its
+          integrated generation rate.
+        * 'radiative': increase of the integrated radiative recombination
+          for each profile (cathodoluminescence signal).
+        * 'collection': collection efficiency of the carriers generated on
+          each site of the system. The current induced by any profile g is the
+          integral of collection * g.
+        * 'checked': indices of the profiles solved with the nonlinear solver.
+        * 'linearity_error': relative error between the linear and nonlinear
+          induced currents for these profiles.
+    """
+
+    if sys.dimension == 3:
+        raise ValueError("generation_scan is not implemented for "
+                         "three-dimensional systems.")
+
+    nx, ny = sys.nx, sys.ny
+    N = nx * ny
+
+    solution, solver = _operating_point(sys, solution, solver, tol, maxiter)
+
+    # generation rates of the profiles (the generation of the system is
+    # restored afterwards)
+    g0 = np.copy(sys.g)
+    gtot0 = getattr(sys, 'gtot', 0)
+    g = np.zeros((N, len(profiles)))
+    try:
+        for idx, f in enumerate(profiles):
+            sys.generation(f)
+            g[:, idx] = sys.g
+    finally:
+        sys.g, sys.gtot = g0, gtot0
+
+    W = site_weights(sys)
+    gtot = W.dot(g)
+
+    # factorization of the Jacobian at the operating point
+    lu = splu(_jacobian(sys, solution))
+    _, _, _, _, grad = _current_functional(sys, solution)
+    I0 = Analyzer(sys, solution).full_current()
+
+    # collection efficiency of every inner site from the adjoint solution
+    lam = lu.solve(grad, trans='T')
+    inner = _generation_rhs(sys, np.ones((N, 1)))[1::3, 0] != 0
+    collection = np.zeros((N,))
+    collection[inner] = (lam[1::3] - lam[0::3])[inner] / W[inner]
+
+    # radiative recombination B(np - ni^2) varies as B n p (defn - defp)
+    n = get_n(sys, solution['efn'], solution['v'], np.arange(N))
+    p = get_p(sys, solution['efp'], solution['v'], np.arange(N))
+    wr = W * sys.B * n * p
+
+    checked = np.array([], dtype=int)
+    if check > 0 and len(profiles) > 0:
+        checked = np.unique(np.linspace(0, len(profiles)-1, check).astype(int))
+    guesses = {}
+
+    # solve the profiles by blocks to bound the memory
+    current = np.zeros((len(profiles),))
+    radiative = np.zeros((len(profiles),))
+    block = 64
+    for start in range(0, len(profiles), block):
+        stop = min(start + block, len(profiles))
+        dx = lu.solve(_generation_rhs(sys, g[:, start:stop]))
+        current[start:stop] = I0 + grad.dot(dx)
+        radiative[start:stop] = wr.dot(dx[0::3] - dx[1::3])
+        for idx in checked[(checked >= start) & (checked < stop)]:
+            guesses[idx] = dx[:, idx-start]
+
+    # nonlinear solutions for a few profiles
+    errors = np.zeros((len(checked),))
+    for cdx, idx in enumerate(checked):
+        I = _nonlinear_current(sys, solution, guesses[idx], g[:, idx], solver,
+                               tol, maxiter)
+        if I is None:
+            errors[cdx] = np.nan
+            logging.warning("The nonlinear solution of profile {0} could not "
+                            "be computed.".format(idx))
+            continue
+        errors[cdx] = abs(current[idx] - I) / abs(I - I0)
+    if np.any(errors > 0.01):
+        logging.warning("The linear response differs from the nonlinear "
+                        "solutions by up to {0:.1%}: the generation rates may "
+                        "be too large for the low injection regime."\
+                        .format(np.nanmax(errors)))
+
+    return {'current': current, 'gtot': gtot,
+            'efficiency': (current - I0) / gtot, 'radiative': radiative,
+            'collection': collection, 'checked': checked,
+            'linearity_error': errors}
+
+
+def eqe(sys, wavelengths, alpha, flux=1e15, solution=None, threshold=1e-3,
+        steps=4, tol=1e-6, maxiter=300, solver=None):
+    """
+    Compute the external quantum efficiency spectrum of the system illuminated
+    from the left contact (x=0).
+
+    The monochromatic generation profiles follow the Beer-Lambert law and are
+    superimposed on the generation rate of the system (bias light). All the
+    wavelengths are solved as right hand sides of the system linearized
+    around the steady state, with a single factorization of its Jacobian.
+    These solutions are refined with a few simplified Newton steps that
+    reuse the same factorization, and the wavelengths for which the current
+    has not converged are solved with the nonlinear solver.
+
+    Parameters
+    ----------
+    sys: Builder
+        The discretized system (one- or two-dimensional).
+    wavelengths: numpy array of floats
+        Wavelengths of the spectrum [nm].
+    alpha: numpy array of floats or function
+        Absorption coefficients at these wavelengths [cm\ :sup:`-1`], or
+        function of the wavelength returning the absorption coefficient.
+        Negative values are treated as no absorption.
+    flux: float
+        Photon flux of the monochromatic probe [cm\ :sup:`-2` s\ :sup:`-1`].
+    solution: dictionary of numpy arrays of floats
+        Steady state of the system without the probe. Keys must be 'efn',
+        'efp' and 'v'. The short circuit steady state is computed if not given.
+    threshold: float
+        Largest accepted relative change of the current in the last
+        simplified Newton step.
+    steps: integer
+        Maximum number of simplified Newton steps.
+    tol: float
+        Accepted error made by the Newton-Raphson scheme.
+    maxiter: integer
+        Maximum number of steps taken by the Newton-Raphson scheme.
+    solver: Solver
+        Solver used for the nonlinear solutions. A new instance is created if
+        not given.
+
+    Returns
+    -------
+    result: dictionary
+        Dictionary with the following keys:
+
+        * 'wavelengths': the wavelengths of the spectrum [nm].
+        * 'eqe': collected carriers per incident photon.
+        * 'iqe': collected carriers per absorbed photon.
+        * 'absorptance': fraction of the incident photons absorbed in the
+          system.
+        * 'current': dimensionless current induced by the probe, counted
+          positive in the direction of the photocurrent.
+        * 'error': relative change of the current in the last simplified
+          Newton step.
+        * 'nonlinear': boolean array, True for the wavelengths solved with
+          the nonlinear solver.
+
+    Notes
+    -----
+    The incident photons are counted per unit area of the left contact, so
+    that the results do not depend on the lateral size of a two-dimensional
+    system. Reflection at the front surface is not included. The grid must
+    resolve the absorption length at the shortest wavelengths, otherwise the
+    integrated generation rates, and the absorptance, are overestimated.
+    """
+
+    if sys.dimension == 3:
+        raise ValueError("eqe is not implemented for "
+                         "three-dimensional systems.")
+
+    nx, ny = sys.nx, sys.ny
+    N = nx * ny
+    wavelengths = np.atleast_1d(np.asarray(wavelengths, dtype=float))
+    if callable(alpha):
+        alpha = np.array([alpha(l) for l in wavelengths], dtype=float)
+    else:
+        alpha = np.asarray(alpha, dtype=float) * np.ones(wavelengths.shape)
+    alpha = np.maximum(alpha, 0)
+
+    solution, solver = _operating_point(sys, solution, solver, tol, maxiter)
+
+    # Beer-Lambert generation profiles of all the wavelengths at once
+    x = sys.xpts - sys.xpts[0]
+    g = alpha * flux * np.exp(-np.outer(x, alpha))
+    g = np.tile(g, (ny, 1)) / sys.scaling.generation
+
+    W = site_weights(sys)
+    gtot = W.dot(g)
+
+    # incident photons in the units of the integrated generation rates
+    photons = flux / (sys.scaling.generation * sys.scaling.length)
+    if ny > 1:
+        photons *= (sys.ypts[-1] - sys.ypts[0]) / sys.scaling.length
+
+    lu = splu(_jacobian(sys, solution))
+    _, _, _, _, grad = _current_functional(sys, solution)
+    I0 = Analyzer(sys, solution).full_current()
+
+    # direction of the photocurrent, given by a uniform generation rate
+    sign = np.sign(grad.dot(lu.solve(_generation_rhs(sys, np.ones((N, 1))))))
+    sign = 1 if sign[0] == 0 else sign[0]
+
+    current = np.zeros(wavelengths.shape)
+    error = np.zeros(wavelengths.shape)
+    dx_all = {}
+    block = 64
+    for start in range(0, len(wavelengths), block):
+        stop = min(start + block, len(wavelengths))
+        dx = lu.solve(_generation_rhs(sys, g[:, start:stop]))
+
+        # simplified Newton steps reusing the factorization of the Jacobian:
+        # the variations dx of the unknowns are refined with the residuals of
+        # the nonlinear equations at the corresponding carrier densities, and
+        # the change of the current at each step estimates the error made
+        err = np.zeros((stop - start,))
+        active = np.arange(stop - start)
+        g0 = sys.g
+        for step in range(steps):
+            res = np.zeros((3*N, len(active)))
+            try:
+                for cdx, col in enumerate(active):
+                    guess = _warm_start(solution, dx[:, col])
+                    sys.g = g0 + g[:, start + col]
+                    res[:, cdx] = getF(sys, guess['v'], guess['efn'],
+                                       guess['efp'], solver.equilibrium)
+            finally:
+                sys.g = g0
+            ddx = lu.solve(-res)
+            dx[:, active] += ddx
+            dI = np.abs(grad.dot(ddx))
+            I = np.abs(grad.dot(dx[:, active]))
+            err[active] = np.where(I > 0, dI / np.where(I > 0, I, 1), 0)
+            active = active[err[active] > threshold]
+            if len(active) == 0:
+                break
+        current[start:stop] = grad.dot(dx)
+        error[start:stop] = err
+        for col in np.nonzero(err > threshold)[0]:
+            dx_all[start + col] = dx[:, col]
+
+    # nonlinear solutions where the linear response is not accurate enough
+    nonlinear = np.zeros(wavelengths.shape, dtype=bool)
+    for idx in sorted(dx_all):
+        I = _nonlinear_current(sys, solution, dx_all[idx], g[:, idx], solver,
+                               tol, maxiter)
+        if I is None:
+            logging.warning("The nonlinear solution at {0} nm could not be "
+                            "computed.".format(wavelengths[idx]))
+            current[idx] = np.nan
+            continue
+        current[idx] = I - I0
+        nonlinear[idx] = True
+    if np.any(nonlinear):
+        logging.info("{0} of {1} wavelengths were solved with the nonlinear "
+                     "solver.".format(np.sum(nonlinear), len(wavelengths)))
+
+    current = sign * current
+    with np.errstate(divide='ignore', invalid='ignore'):
+        iqe = np.where(gtot > 0, current / gtot, 0)
+
+    return {'wavelengths': wavelengths, 'eqe': current / photons, 'iqe': iqe,
+            'absorptance': gtot / photons, 'current': current,
+            'error': error, 'nonlinear': nonlinear}
@@ -4,9 +4,12 @@
 # LICENSE.rst found in the top-level directory of this distribution.
 
 import numpy as np
+import os
 from scipy.io import savemat
 from . import analyzer
 from .utils import save_sim
+from .store import SweepStore, AsyncWriter, Checkpoint
+from . import mesh
 
 from .analyzer import Analyzer
 
@@ -15,6 +18,9 @@ from scipy.sparse import coo_matrix, csr_matrix
 from .getFandJ_eq import getFandJ_eq
 from .getF import getF
 from .jacobian import getJ
+from .getFandJ_eq3d import getFandJ_eq3d
+from .getF3d import getF3d
+from .jacobian3d import getJ3d
 
 import logging
 logging.basicConfig(level=logging.DEBUG, format='%(levelname)s: %(message)s')
@@ -58,6 +64,20 @@ class Solver():
     use_mumps: boolean
         Flag for the use of the MUMPS library if available. The flag is set to
         True by default. If the MUMPS library is absent, the flag has no effect.
+    iterative: boolean
+        Solve the linear systems of the Newton-Raphson scheme with the GMRES
+        iterative method preconditioned by an incomplete LU factorization
+        instead of a direct (complete) factorization. This reduces the memory
+        footprint for large three-dimensional systems. Default is False.
+    out_of_core: boolean
+        Store the factors of the MUMPS direct solver on disk instead of in
+        memory. The flag has no effect if MUMPS is not used. Default is False.
+    database: SolutionDatabase
+        Database of converged solutions (see
+        :class:`~sesame.warmstart.SolutionDatabase`). The solutions of
+        :func:`IVcurve` are stored in it, and a stored solution closer to an
+        applied voltage than the previous voltage of the loop is used as
+        starting point of the solver. Default is None (no database).
 
     Attributes
     ----------
@@ -65,9 +85,13 @@ class Solver():
         Electrostatic potential computed at thermal equilibrium.
     """
 
-    def __init__(self, use_mumps=True):
+    def __init__(self, use_mumps=True, iterative=False, out_of_core=False,
+                 database=None):
         self.equilibrium = None
         self.use_mumps = use_mumps
+        self.iterative = iterative
+        self.out_of_core = out_of_core
+        self.database = database
     
     def make_guess(self, system):
         # Make a linear assumption based on Dirichlet contacts
@@ -96,15 +120,15 @@ class Solver():
 
         # Make a linear guess for the equilibrium potential
         v = np.linspace(v_left, v_right, system.nx)
-        if system.dimension == 2:
-            # replicate the guess in the y-direction
-            v = np.tile(v, system.ny) 
+        if system.dimension > 1:
+            # replicate the guess in the y- and z-directions
+            v = np.tile(v, system.ny * system.nz)
 
 
         return v
 
     def solve(self, system,  compute='all', guess=None, tol=1e-6, periodic_bcs=True,\
-              maxiter=300, verbose=True, htp=1):
+              maxiter=300, verbose=True, htp=1, levels=0):
         """
         Solve the drift diffusion Poisson equation on a given discretized
         system out of equilibrium. If the equilibrium electrostatic potential is
@@ -135,6 +159,12 @@ class Solver():
             step if set to True (default).
         htp: integer
             Number of homotopic Newton loops to perform.
+        levels: integer
+            Number of coarsened meshes used to compute the starting point of
+            the solver when no guess is given (nested iterations). The problem
+            is solved on the coarsest mesh first, and each solution is
+            interpolated onto the next finer mesh. Default is 0 (no coarse
+            meshes).
 
         Returns
         -------
@@ -155,6 +185,14 @@ class Solver():
 
             if guess is None:
                 guess = self.make_guess(system)
+                if levels > 0:
+                    coarse = self._nested_guess(system, 'Poisson', tol,
+                                                periodic_bcs, maxiter, htp, levels)
+                    if coarse is not None:
+                        # keep the Dirichlet values of the contacts
+                        inner = np.ones((system.ny*system.nz, system.nx), dtype=bool)
+                        inner[:, [0, -1]] = False
+                        guess[inner.flatten()] = coarse['v'][inner.flatten()]
             else:
                 # testing of the data type of guess.
                 if type(guess) is dict:
@@ -177,7 +215,15 @@ class Solver():
         # Otherwise, keep going with the full problem
         if compute == 'all':
             # array to pass to Newton routine
-            x = np.zeros((3*system.nx*system.ny,), dtype=np.float64)
+            x = np.zeros((3*system.nx*system.ny*system.nz,), dtype=np.float64)
+            if guess is None and levels > 0:
+                guess = self._nested_guess(system, 'all', tol, periodic_bcs,
+                                           maxiter, htp, levels)
+                if guess is not None:
+                    # contacts at equilibrium
+                    s = np.zeros((system.ny*system.nz, system.nx), dtype=bool)
+                    s[:, [0, -1]] = True
+                    guess['v'][s.flatten()] = self.equilibrium[s.flatten()]
             if guess is None: # I will try with equilibrium
                 x[2::3] = np.copy(self.equilibrium)
             else:
@@ -195,6 +241,29 @@ class Solver():
                 return None
 
 
+    def _nested_guess(self, system, compute, tol, periodic_bcs, maxiter, htp,
+                      levels):
+        # Solve the problem on a coarsened mesh (recursively) and interpolate
+        # the solution onto the mesh of the system
+        coarse = mesh.coarsen(system)
+        if coarse is None:
+            return None
+        logging.info("Solving on a coarse mesh of {0} x {1} nodes"\
+                     .format(coarse.nx, coarse.ny))
+        solver = Solver(use_mumps=self.use_mumps)
+        if compute == 'all':
+            solver.solve(coarse, compute='Poisson', tol=tol,
+                         periodic_bcs=periodic_bcs, maxiter=maxiter,
+                         verbose=False, htp=htp, levels=levels-1)
+            if solver.equilibrium is None:
+                return None
+        result = solver.solve(coarse, compute=compute, tol=tol,
+                              periodic_bcs=periodic_bcs, maxiter=maxiter,
+                              verbose=False, htp=htp, levels=levels-1)
+        if result is None:
+            return None
+        return mesh.prolongate(coarse, result, system)
+
     def _damping(self, dx):
         # This damping procedure is inspired from Solid-State Electronics, vol. 19,
         # pp. 991-992 (1976).
@@ -203,18 +272,61 @@ class Solver():
         dx[b] = np.log(1+np.abs(dx[b])*1.72)*np.sign(dx[b])
 
 
-    def _sparse_solver(self, J, f):
+    def _sparse_solver(self, J, f, dimension=2):
+        if self.iterative:
+            return self._iterative_solver(J, f)
         spsolve = lg.spsolve
         if self.use_mumps and mumps_available: 
-            spsolve = mumps.spsolve
+            dx = mumps.spsolve(J, f, out_of_core=self.out_of_core)
+        elif dimension == 3:
+            # the minimum degree ordering of the (structurally symmetric)
+            # 7-point stencil reduces the fill-in of the factors
+            dx = spsolve(J.tocsc(), f, permc_spec='MMD_AT_PLUS_A')
         else:
             J = J.tocsr()
-        dx = spsolve(J, f)
+            dx = spsolve(J, f)
+        return dx
+
+    def _iterative_solver(self, J, f):
+        # GMRES preconditioned by an incomplete LU factorization. The rows are
+        # scaled first because the equations of the drift-diffusion model
+        # differ by orders of magnitude.
+        scale = 1. / abs(J).max(axis=1).toarray().flatten()
+        scale[~np.isfinite(scale)] = 1.
+        J = csr_matrix(J).multiply(scale[:, None]).tocsc()
+        f = f * scale
+        try:
+            ilu = lg.spilu(J, drop_tol=1e-6, fill_factor=10)
+        except RuntimeError:
+            logging.warning("The incomplete factorization failed, using a "
+                            "direct solver instead.")
+            return lg.spsolve(J, f)
+        M = lg.LinearOperator(J.shape, ilu.solve)
+        try:
+            dx, info = lg.gmres(J, f, M=M, rtol=1e-10, atol=0, restart=50,
+                                maxiter=20)
+        except TypeError:
+            # the relative tolerance is named tol before SciPy 1.12
+            dx, info = lg.gmres(J, f, M=M, tol=1e-10, atol=0, restart=50,
+                                maxiter=20)
+        if info != 0:
+            logging.warning("GMRES did not converge, using a direct solver "
+                            "instead.")
+            return lg.spsolve(J, f)
         return dx
 
 
     def _get_system(self, x, system, periodic_bcs):
         # Compute the right hand side of J * x = f
+        if system.dimension == 3:
+            # the Jacobian is assembled directly in a compressed format
+            if self.equilibrium is None:
+                f, J = getFandJ_eq3d(system, x)
+            else:
+                f = getF3d(system, x[2::3], x[0::3], x[1::3], self.equilibrium)
+                J = getJ3d(system, x[2::3], x[0::3], x[1::3])
+            return f, J
+
         if self.equilibrium is None:
             size = system.nx * system.ny
             f, rows, columns, data = getFandJ_eq(system, x)
@@ -262,7 +374,7 @@ class Solver():
                     f -= (1-gamma)*f0
 
                 try:
-                    dx = self._sparse_solver(J, -f)
+                    dx = self._sparse_solver(J, -f, system.dimension)
                     if dx is None:
                         raise SparseSolverError
                         break
@@ -298,7 +410,8 @@ class Solver():
             return None
 
     def IVcurve(self, system, voltages, file_name, guess=None, tol=1e-6, 
-                periodic_bcs=True, maxiter=300, verbose=True, htp=1, fmt='npz'):
+                periodic_bcs=True, maxiter=300, verbose=True, htp=1, fmt='npz',
+                writer=None, resume=False, checkpoint=False):
         """
         Solve the Drift Diffusion Poisson equations for the voltages provided. The
         results are stored in files with ``.npz`` format by default (See below for
@@ -333,7 +446,29 @@ class Solver():
             Number of homotopic Newton loops to perform.
         fmt: string
             Format string for the data files. Use ``mat`` to save the data in a
-            Matlab format (version 5 and above).
+            Matlab format (version 5 and above). Use ``sweep`` to save the
+            system once and all the solutions in the single file
+            ``file_name.sweep`` (see :class:`sesame.store.SweepStore`). Use
+            ``raw`` to save the system once in ``file_name.system`` and the
+            solutions uncompressed in ``file_name_{idx}.npz``, to be
+            memory-mapped by :func:`sesame.store.open_sim`.
+        writer: AsyncWriter (optional)
+            Writer of the data files, which are written in a background thread
+            while the next voltage is solved. By default, a writer is created
+            and closed at the end of the voltage loop. A writer given by the
+            caller is flushed instead, so that all files are on disk when this
+            function returns.
+        resume: boolean
+            If True, an interrupted computation of the same system and voltages
+            is resumed from the checkpoint ``file_name.ckpt``, starting from
+            the same point as the interrupted computation, and the checkpoint
+            is saved as with ``checkpoint=True``. Otherwise (default), the
+            computation starts from equilibrium.
+        checkpoint: boolean
+            If True, the state of the computation is saved in the checkpoint
+            ``file_name.ckpt`` after each converged voltage, so that it can be
+            resumed if it is interrupted. The checkpoint is removed once all
+            the voltages are computed. Default is False.
 
         Returns
         -------
@@ -348,9 +483,27 @@ class Solver():
         >>> efn = results['efn']
         >>> efp = results['efp']
         >>> v = results['v']
+
+        With ``fmt='sweep'``, the solution of the voltage of index ``idx`` is
+        loaded with
+
+        >>> sys, results = sesame.load_sim('file_name.sweep', index=idx)
         """
+        if resume or checkpoint:
+            checkpoint = Checkpoint(file_name + '.ckpt', system, voltages)
+        else:
+            checkpoint = None
+        state = checkpoint.load() if resume else None
+
         # create a dictionary 'result' with efn and efp
-        if guess is None:
+        if state is not None:
+            # last converged solution of the interrupted computation
+            self.equilibrium = state['equilibrium']
+            result = state['solution']
+            if verbose:
+                logging.info("Resuming after the applied voltage {0} V."\
+                             .format(voltages[state['index']]))
+        elif guess is None:
             result = self.solve(system, compute='Poisson', tol=tol,
                                 periodic_bcs=periodic_bcs, maxiter=maxiter, 
                                 verbose=verbose, htp=htp)
@@ -359,7 +512,7 @@ class Solver():
 
         # sites of the right contact
         nx = system.nx
-        s = [nx-1 + j*nx for j in range(system.ny)]
+        s = [nx-1 + j*nx for j in range(system.ny*system.nz)]
 
         # sign of the voltage to apply
         if system.rho[nx-1] < 0:
@@ -381,42 +534,101 @@ class Solver():
         # Array of the steady state current
         J = np.zeros((len(Vapp),))
         J[:] = np.nan
+        start = 0
+        if state is not None:
+            J[:] = state['J']
+            start = state['index'] + 1
+
+        # solutions stored for the system
+        database = self.database
+        if database is not None and database.enabled:
+            key = database.key(system)
+        else:
+            database = None
+
+        if fmt == 'sweep':
+            if state is None and os.path.exists(file_name + '.sweep'):
+                os.remove(file_name + '.sweep')
+            store = SweepStore(file_name + '.sweep', system)
+            # solutions appended after the checkpoint are already stored
+            stored = len(store)
+
+        own_writer = writer is None
+        if own_writer:
+            writer = AsyncWriter()
+
+        if fmt == 'raw':
+            system_file = file_name + '.system'
+            writer.save_system(system, system_file)
+
+        completed = False
+        try:
+            for idx, vapp in enumerate(Vapp[start:], start):
+
+                if verbose:
+                    logging.info("Applied voltage: {0} V".format(voltages[idx]))
+
+                # Apply the voltage on the right contact
+                result['v'][s] = self.equilibrium[s] + q*vapp
+
+                # Start from a stored solution closer than the previous voltage
+                if database is not None:
+                    previous = voltages[idx-1] if idx > 0 else 0
+                    within = abs(voltages[idx] - previous) / database.scales[0]
+                    cached = database.guess(system, voltages[idx], key, within)
+                    if cached is not None:
+                        result = cached
+
+                # Call the Drift Diffusion Poisson solver
+                result = self.solve(system, guess=result, tol=tol, periodic_bcs=periodic_bcs,\
+                                    maxiter=maxiter, verbose=verbose, htp=htp)
+
+                if result is not None:
+                    if database is not None:
+                        database.add(system, result, voltages[idx], key)
+
+                    # 1. Compute the steady state current
+                    try:
+                        az = Analyzer(system, result)
+                        J[idx] = az.full_current()
+                    except Exception:
+                       logging.info("Could not compute the current for the applied voltage"\
+                        + " {0} V (index {1}).".format(voltages[idx], idx))
+
+                    # 2. Save efn, efp, v
+                    name = file_name + "_{0}".format(idx)
+                    # add some system settings to the saved results
+
+                    if fmt == 'mat':
+                        writer.save_sim(system, result, name, fmt='mat')
+                    elif fmt == 'sweep' and idx >= stored:
+                        current = None if np.isnan(J[idx]) else J[idx]
+                        writer.append(store, result, voltage=voltages[idx], current=current)
+                    elif fmt == 'raw':
+                        writer.save_raw(result, name + '.npz', system_file)
+                    elif fmt != 'sweep':
+                        filename = "%s.gzip" % name
+                        writer.save_sim(system, result, filename)
+
+                    # 3. Save the state, written after the files
+                    if checkpoint is not None:
+                        writer.save_checkpoint(checkpoint, index=idx, J=J,
+                                    equilibrium=self.equilibrium, solution=result)
 
-        for idx, vapp in enumerate(Vapp):
-
-            if verbose:
-                logging.info("Applied voltage: {0} V".format(voltages[idx]))
-
-            # Apply the voltage on the right contact
-            result['v'][s] = self.equilibrium[s] + q*vapp
-
-            # Call the Drift Diffusion Poisson solver
-            result = self.solve(system, guess=result, tol=tol, periodic_bcs=periodic_bcs,\
-                                maxiter=maxiter, verbose=verbose, htp=htp)
-
-            if result is not None:
-                # 1. Save efn, efp, v
-                name = file_name + "_{0}".format(idx)
-                # add some system settings to the saved results
-
-                if fmt == 'mat':
-                    save_sim(system, result, name, fmt='mat')
                 else:
-                    filename = "%s.gzip" % name
-                    save_sim(system, result, filename)
-                # 2. Compute the steady state current
-                try:
-                    az = Analyzer(system, result)
-                    J[idx] = az.full_current()
-                except Exception:
-                   logging.info("Could not compute the current for the applied voltage"\
-                    + " {0} V (index {1}).".format(voltages[idx], idx))
-
+                    logging.info("The solver failed to converge for the applied voltage"\
+                          + " {0} V (index {1}).".format(voltages[idx], idx))
+                    break
+            else:
+                completed = True
+        finally:
+            # all the files are on disk when returning, even after an error
+            if own_writer:
+                writer.close()
             else:
-                logging.info("The solver failed to converge for the applied voltage"\
-                      + " {0} V (index {1}).".format(voltages[idx], idx))
-                return J
-                break
+                writer.flush()
+        if completed and checkpoint is not None:
+            checkpoint.remove()
         return J
 
 
@@ -0,0 +1,859 @@
+# Copyright 2017 University of Maryland.
+#
+# This file is part of Sesame. It is subject to the license terms in the file
+# LICENSE.rst found in the top-level directory of this distribution.
+
+import numpy as np
+import bz2
+import functools
+import gzip
+import hashlib
+import io
+import json
+import lzma
+import os
+import pickle
+import queue
+import struct
+import threading
+import types
+import weakref
+import zipfile
+from scipy.io import savemat
+
+import logging
+
+__all__ = ['SweepStore', 'AsyncWriter', 'SimFile', 'Checkpoint', 'open_sim',
+           'is_sweep', 'is_raw', 'signature', 'fingerprint']
+
+
+_codecs = {'none': zipfile.ZIP_STORED,
+           'deflate': zipfile.ZIP_DEFLATED,
+           'bzip2': zipfile.ZIP_BZIP2,
+           'lzma': zipfile.ZIP_LZMA}
+
+_keys = ('efn', 'efp', 'v')
+_system_member = 'system.pkl'
+
+
+###############################################################################
+#                 compressed pickles of (system, result)                      #
+###############################################################################
+# magic numbers of the compressed streams, used to read the files of any codec
+_magic = [(b'\x1f\x8b', gzip.GzipFile),
+          (b'BZh', bz2.BZ2File),
+          (b'\xfd7zXZ\x00', lzma.LZMAFile)]
+
+
+def _compressed(f, compression, level):
+    # file object compressing the data written to the binary file f
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=f, mode='wb',
+                             compresslevel=9 if level is None else level)
+    if compression == 'bzip2':
+        return bz2.BZ2File(f, 'wb', compresslevel=9 if level is None else level)
+    if compression == 'lzma':
+        return lzma.LZMAFile(f, 'wb', preset=level)
+    if compression == 'none':
+        return None
+    raise ValueError("Unknown compression {0}. Use one of gzip, bzip2, lzma, "\
+                     "none.".format(compression))
+
+
+def dump(data, filename, compression='gzip', level=None):
+    """
+    Write pickled bytes to a compressed file.
+
+    The data are written to a temporary file renamed once they are on disk,
+    so that a file found under ``filename`` is always complete.
+
+    Parameters
+    ----------
+    data: bytes
+        Pickled object.
+    filename: string
+        Name of the file.
+    compression: string
+        Codec: ``gzip`` (default), ``bzip2``, ``lzma`` or ``none``.
+    level: integer
+        Compression level, the default of the codec if None.
+    """
+    tmp = filename + '.part'
+    with open(tmp, 'wb') as f:
+        out = _compressed(f, compression, level)
+        if out is None:
+            f.write(data)
+        else:
+            with out:
+                out.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, filename)
+
+
+def load(filename):
+    """
+    Read a pickled object written by :func:`dump` with any codec.
+
+    Parameters
+    ----------
+    filename: string
+        Name of the file.
+    """
+    with open(filename, 'rb') as f:
+        head = f.read(6)
+    for magic, cls in _magic:
+        if head.startswith(magic):
+            with cls(filename, 'rb') as f:
+                return pickle.loads(f.read())
+    with open(filename, 'rb') as f:
+        return pickle.loads(f.read())
+
+
+###############################################################################
+#                  memory-mapped arrays and shared systems                    #
+###############################################################################
+# systems loaded by open_sim, shared by all the files of a sweep as long as
+# they are in use
+_systems = weakref.WeakValueDictionary()
+
+
+def _shared_system(key, read):
+    system = _systems.get(key)
+    if system is None:
+        system = read()
+        _systems[key] = system
+    return system
+
+
+@functools.lru_cache(maxsize=16)
+def _read_directory(path, mtime, size):
+    try:
+        with zipfile.ZipFile(path, 'r') as archive:
+            return {info.filename: info for info in archive.infolist()}
+    except zipfile.BadZipFile:
+        return None
+
+
+def _directory(filename):
+    # Members of a zip archive (None for other files), parsed once as long as
+    # the file is not modified. Archives of long sweeps have many members.
+    stat = os.stat(filename)
+    return _read_directory(os.path.realpath(filename), stat.st_mtime_ns,
+                           stat.st_size)
+
+
+def _read_members(filename, members):
+    # Arrays of the .npy members of a zip archive. Uncompressed members are
+    # memory-mapped copy-on-write: they are read from disk when accessed, and
+    # modifying them does not modify the file.
+    arrays = {}
+    directory = _directory(filename)
+    with open(filename, 'rb') as f:
+        for key, member in members.items():
+            info = directory[member]
+            if info.compress_type == zipfile.ZIP_STORED:
+                # data of the member after its local header
+                f.seek(info.header_offset + 26)
+                n, m = struct.unpack('<HH', f.read(4))
+                f.seek(info.header_offset + 30 + n + m)
+                version = np.lib.format.read_magic(f)
+                if version == (1, 0):
+                    header = np.lib.format.read_array_header_1_0(f)
+                elif version == (2, 0):
+                    header = np.lib.format.read_array_header_2_0(f)
+                else:
+                    header = None
+                if header is not None:
+                    shape, fortran, dtype = header
+                    if not dtype.hasobject and np.prod(shape) > 0:
+                        arrays[key] = np.memmap(filename, dtype, 'c', f.tell(),
+                                                shape, 'F' if fortran else 'C')
+                        continue
+            with zipfile.ZipFile(filename, 'r') as archive:
+                data = archive.read(member)
+            arrays[key] = np.lib.format.read_array(io.BytesIO(data),
+                                                   allow_pickle=False)
+    return arrays
+
+
+def is_sweep(filename):
+    """
+    Return True if the file is a sweep result store.
+
+    Parameters
+    ----------
+    filename: string
+        Name of the file.
+    """
+    try:
+        directory = _directory(filename)
+        return directory is not None and _system_member in directory
+    except (IOError, OSError):
+        return False
+
+
+def is_raw(filename):
+    """
+    Return True if the file is a solution written by :func:`save_raw`.
+
+    Parameters
+    ----------
+    filename: string
+        Name of the file.
+    """
+    try:
+        directory = _directory(filename)
+        return directory is not None and 'system.npy' in directory
+    except (IOError, OSError):
+        return False
+
+
+def signature(filename, index=None):
+    """
+    Identifier of the content of a saved solution, which changes when the
+    solution is written again.
+
+    Parameters
+    ----------
+    filename: string
+        Name of the file.
+    index: integer (optional)
+        Index of a solution of a sweep store. If None, the whole file.
+
+    Returns
+    -------
+    signature: tuple
+        Modification time and size of the file, or checksums of the arrays of
+        the solution of a sweep store (which do not change when solutions are
+        appended to the store).
+    """
+    if index is None:
+        stat = os.stat(filename)
+        return (stat.st_mtime_ns, stat.st_size)
+    directory = _directory(filename)
+    return tuple(directory['{0}_{1}.npy'.format(key, index)].CRC \
+                 for key in _keys)
+
+
+class SweepStore():
+    """
+    Single-file store for the solutions of a sweep (e.g. an IV curve).
+
+    The discretized system is written once, and every solution is appended as
+    a chunk made of the arrays of the electron and hole quasi-Fermi levels and
+    of the electrostatic potential, together with metadata such as the applied
+    voltage and the steady state current. The file is a zip archive where each
+    array is an uncompressed ``.npy`` member compressed by the archive, so that
+    solutions can be read back individually by index. With
+    ``compression='none'``, the arrays are memory-mapped when read.
+
+    Parameters
+    ----------
+    filename: string
+        Name of the file of the store. An existing store is opened for reading
+        and appending.
+    system: Builder (optional)
+        The discretized system, written when a new store is created.
+    compression: string
+        Codec of the archive: ``deflate`` (default), ``bzip2``, ``lzma`` or
+        ``none``.
+    level: integer
+        Compression level of the codec (``deflate`` and ``bzip2`` only). The
+        default favors writing speed, the solutions compressing poorly
+        anyway.
+
+    Examples
+    --------
+    >>> store = sesame.SweepStore('IV.sweep', sys)
+    >>> store.append(result, voltage=0.1, current=J)
+    >>> sys, result = sesame.load_sim('IV.sweep', index=-1)
+    """
+
+    def __init__(self, filename, system=None, compression='deflate', level=1):
+        if compression not in _codecs:
+            raise ValueError("Unknown compression {0}. Use one of {1}."\
+                             .format(compression, ', '.join(sorted(_codecs))))
+        self.filename = filename
+        self.compression = _codecs[compression]
+        self.level = level if compression in ('deflate', 'bzip2') else None
+        self._system = None
+        self._metadata = []
+
+        if is_sweep(filename):
+            # the metadata of the complete solutions are read when needed
+            names = _directory(filename)
+            while 'meta_{0}.json'.format(len(self._metadata)) in names:
+                self._metadata.append(None)
+        elif system is not None:
+            with self._open('w') as archive:
+                archive.writestr(_system_member, pickle.dumps(system, \
+                                 protocol=pickle.HIGHEST_PROTOCOL))
+            self._system = system
+        else:
+            raise IOError("{0} is not a sweep store, and no system was given "\
+                          "to create it.".format(filename))
+
+    def _open(self, mode):
+        if self.level is None:
+            return zipfile.ZipFile(self.filename, mode, self.compression)
+        return zipfile.ZipFile(self.filename, mode, self.compression,
+                               compresslevel=self.level)
+
+    def __len__(self):
+        return len(self._metadata)
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+
+    def _index(self, idx):
+        n = len(self)
+        if idx < 0:
+            idx += n
+        if not 0 <= idx < n:
+            raise IndexError("index {0} out of range for a store of {1} "\
+                             "solutions".format(idx, n))
+        return idx
+
+    @property
+    def system(self):
+        """The discretized system of the sweep, loaded on first access."""
+        if self._system is None:
+            with zipfile.ZipFile(self.filename, 'r') as archive:
+                self._system = pickle.loads(archive.read(_system_member))
+        return self._system
+
+    def append(self, result, **metadata):
+        """
+        Append a solution to the store.
+
+        The file is closed after each solution, so that all the solutions
+        appended are on disk even if the sweep is interrupted.
+
+        Parameters
+        ----------
+        result: dictionary
+            Dictionary containing 1D arrays of electron and hole quasi-Fermi
+            levels and the electrostatic potential across the system. Keys
+            are 'efn', 'efp', and 'v'.
+        metadata: keyword arguments
+            Values saved with the solution (e.g. ``voltage=0.1``). They must be
+            serializable in JSON, numpy scalars are converted.
+
+        Returns
+        -------
+        idx: integer
+            Index of the solution in the store.
+        """
+        idx = len(self)
+        meta = {key: (value.item() if isinstance(value, np.generic) else value)
+                for key, value in metadata.items()}
+        meta['index'] = idx
+
+        with self._open('a') as archive:
+            for key in _keys:
+                buf = io.BytesIO()
+                np.lib.format.write_array(buf, np.asarray(result[key]),
+                                          allow_pickle=False)
+                archive.writestr('{0}_{1}.npy'.format(key, idx), buf.getvalue())
+            # the metadata is written last and marks the solution as complete
+            archive.writestr('meta_{0}.json'.format(idx), json.dumps(meta))
+        self._metadata.append(meta)
+        return idx
+
+    def __getitem__(self, idx):
+        idx = self._index(idx)
+        return _read_members(self.filename, {key: '{0}_{1}.npy'.format(key, idx)
+                                             for key in _keys})
+
+    def metadata(self, idx):
+        """
+        Metadata of a solution.
+
+        Parameters
+        ----------
+        idx: integer
+            Index of the solution.
+
+        Returns
+        -------
+        metadata: dictionary
+            Values given when the solution was appended, and its index.
+        """
+        idx = self._index(idx)
+        if self._metadata[idx] is None:
+            with zipfile.ZipFile(self.filename, 'r') as archive:
+                data = archive.read('meta_{0}.json'.format(idx))
+            self._metadata[idx] = json.loads(data.decode('utf-8'))
+        return dict(self._metadata[idx])
+
+
+def save_raw(result, filename, system_file):
+    """
+    Write a solution uncompressed, with a reference to the file of its system.
+
+    The solution is saved in the ``.npz`` format of numpy without compression,
+    so that its arrays can be memory-mapped by :func:`open_sim`. The system is
+    saved once for all the solutions of a sweep (see :func:`dump`), and its
+    file name is stored relative to the directory of ``filename``.
+
+    Parameters
+    ----------
+    result: dictionary
+        Dictionary of solution, containing 'v', 'efn', 'efp'.
+    filename: string
+        Name of the file.
+    system_file: string
+        Name of the file of the pickled system.
+    """
+    system = os.path.relpath(os.path.abspath(system_file),
+                             os.path.dirname(os.path.abspath(filename)))
+    tmp = filename + '.part'
+    with open(tmp, 'wb') as f:
+        np.savez(f, system=np.array(system),
+                 **{key: np.asarray(result[key]) for key in _keys})
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, filename)
+
+
+class SimFile():
+    """
+    Simulation results opened lazily.
+
+    The arrays of the solution are memory-mapped for files written by
+    :func:`save_raw` and for sweep stores without compression, so that only the
+    parts of the arrays used are read from disk. The system is loaded when the
+    attribute ``system`` is first accessed. For these two formats, all the
+    files of a sweep share the same system object, loaded once. Files written
+    by :func:`sesame.utils.save_sim` are loaded entirely.
+
+    The arrays are copy-on-write: modifying them does not modify the file. The
+    shared system should not be modified.
+
+    Parameters
+    ----------
+    filename: string
+        Name of the file.
+    index: integer
+        Index of the solution to open from a sweep store, ignored otherwise.
+    shared: boolean
+        Whether to share the system with the other files of the sweep (default),
+        or to load a copy of it.
+
+    Attributes
+    ----------
+    result: dictionary
+        Dictionary of the solution, containing 'v', 'efn', 'efp'.
+    system: Builder
+        The discretized system.
+    """
+
+    def __init__(self, filename, index=0, shared=True):
+        self.filename = filename
+        self._system = None
+        share = _shared_system if shared else lambda key, read: read()
+
+        if is_sweep(filename):
+            store = SweepStore(filename)
+            self.result = store[index]
+            info = _directory(filename)[_system_member]
+            key = (os.path.realpath(filename), info.header_offset, info.CRC)
+            self._read = lambda: share(key, lambda: store.system)
+        elif _directory(filename) is not None:
+            arrays = _read_members(filename, {key: key + '.npy'
+                                              for key in _keys + ('system',)})
+            system_file = os.path.join(os.path.dirname(filename),
+                                       str(arrays.pop('system')))
+            self.result = arrays
+            stat = os.stat(system_file)
+            key = (os.path.realpath(system_file), stat.st_mtime_ns, stat.st_size)
+            self._read = lambda: share(key, lambda: load(system_file))
+        else:
+            self._system, self.result = load(filename)
+
+    @property
+    def system(self):
+        if self._system is None:
+            self._system = self._read()
+        return self._system
+
+
+def open_sim(filename, index=0):
+    """
+    Open simulation results lazily.
+
+    Parameters
+    ----------
+    filename: string
+        Name of the file, written by :func:`sesame.utils.save_sim`,
+        :func:`save_raw` or a :class:`SweepStore`.
+    index: integer
+        Index of the solution to open from a sweep store, ignored otherwise.
+
+    Returns
+    -------
+    sim: SimFile
+        The results, with attributes ``system`` and ``result``.
+
+    Examples
+    --------
+    Plot the electrostatic potential along a line for all the voltages of a
+    sweep, loading the system once:
+
+    >>> for name in files:
+    ...     sim = sesame.open_sim(name)
+    ...     plt.plot(sim.result['v'][sites])
+    """
+    return SimFile(filename, index)
+
+
+def _digest(h, value, seen):
+    # Update a digest with a value. Values that cannot be pickled (such as the
+    # lambda functions of a continuum of defect states) are digested by their
+    # content: items of containers, code and enclosed values of functions.
+    # Objects already digested (e.g. a system enclosed by its own functions)
+    # are not digested again.
+    if isinstance(value, np.ndarray) and not value.dtype.hasobject:
+        h.update(str(value.dtype).encode('utf-8'))
+        h.update(np.ascontiguousarray(value).tobytes())
+        return
+    try:
+        h.update(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        return
+    except (pickle.PicklingError, AttributeError, TypeError):
+        pass
+    h.update(type(value).__qualname__.encode('utf-8'))
+    if id(value) in seen:
+        return
+    seen = seen | set([id(value)])
+    if isinstance(value, (list, tuple)):
+        for item in value:
+            _digest(h, item, seen)
+    elif isinstance(value, dict):
+        for key in sorted(value, key=repr):
+            h.update(repr(key).encode('utf-8'))
+            _digest(h, value[key], seen)
+    elif isinstance(value, types.FunctionType):
+        h.update(value.__qualname__.encode('utf-8'))
+        _digest_code(h, value.__code__)
+        for cell in value.__closure__ or ():
+            _digest(h, cell.cell_contents, seen)
+    elif hasattr(value, '__dict__'):
+        _digest(h, {k: v for k, v in vars(value).items() \
+                    if not k.startswith('_')}, seen)
+    else:
+        h.update(repr(value).encode('utf-8'))
+
+
+def _digest_code(h, code):
+    h.update(code.co_code)
+    h.update(repr(code.co_names).encode('utf-8'))
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            _digest_code(h, const)
+        else:
+            h.update(repr(const).encode('utf-8'))
+
+
+def fingerprint(system, *values, exclude=()):
+    """
+    Digest of a system and of the values of a computation.
+
+    Two systems with the same parameters on the same mesh have the same
+    fingerprint. Functions that cannot be pickled, such as a continuum of
+    defect states, are compared by their code and the values they enclose.
+
+    Parameters
+    ----------
+    system: Builder
+        The discretized system.
+    values: array-like
+        Values of the computation, such as the voltages of an IV curve.
+    exclude: sequence of strings
+        Attributes of the system left out of the digest.
+
+    Returns
+    -------
+    key: string
+        Hexadecimal digest.
+    """
+    h = hashlib.sha1()
+    seen = frozenset([id(system)])
+    for name in sorted(vars(system)):
+        if name.startswith('_') or name in exclude:
+            continue
+        h.update(name.encode('utf-8'))
+        _digest(h, vars(system)[name], seen)
+    for value in values:
+        h.update(np.asarray(value, dtype=np.float64).tobytes())
+    return h.hexdigest()
+
+
+class Checkpoint():
+    """
+    State of a sweep saved to continue it after an interruption.
+
+    The state is a dictionary saved with the fingerprint of the system and of
+    the values of the sweep, so that it is only used to resume the same
+    computation. The arrays are saved exactly: a sweep resumed from a
+    checkpoint starts from the same point as the interrupted one.
+
+    Parameters
+    ----------
+    filename: string
+        Name of the file of the checkpoint.
+    system: Builder
+        The discretized system, before the sweep starts.
+    values: array-like
+        Values of the sweep (voltages, generation parameters).
+    """
+
+    def __init__(self, filename, system, values):
+        self.filename = filename
+        self.key = fingerprint(system, values)
+
+    def data(self, **state):
+        """Pickled state, to be written with :meth:`write`."""
+        state['key'] = self.key
+        return pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def write(self, data):
+        """Write a state returned by :meth:`data`."""
+        dump(data, self.filename, 'none')
+        return self.filename
+
+    def save(self, **state):
+        """
+        Save a state, replacing the previous one.
+
+        Parameters
+        ----------
+        state: keyword arguments
+            Values of the state (arrays, dictionaries of arrays, numbers).
+        """
+        self.write(self.data(**state))
+
+    def load(self):
+        """
+        Load the last state saved.
+
+        Returns
+        -------
+        state: dictionary
+            The state, or None if there is no checkpoint or if it was saved for
+            another computation.
+        """
+        if not os.path.exists(self.filename):
+            logging.info("No checkpoint found in {0}.".format(self.filename))
+            return None
+        state = load(self.filename)
+        if state.pop('key', None) != self.key:
+            logging.warning("The checkpoint {0} was saved for another system "
+                            "or sweep and is ignored.".format(self.filename))
+            return None
+        return state
+
+    def remove(self):
+        """Remove the checkpoint, once the sweep is complete."""
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+
+
+class AsyncWriter():
+    """
+    Write simulation results in a background thread.
+
+    Results are snapshot when they are submitted, so that the caller can
+    modify the system and the solution right away (e.g. to solve the next
+    point of a sweep), while serialization, compression and writing happen in
+    a separate thread. At most ``maxsize`` results wait in the queue: further
+    submissions block until a slot is free, which bounds the memory used when
+    the disk is slower than the solver. The codecs release the GIL while
+    compressing.
+
+    Errors raised in the writing thread are raised again by the next call to
+    :meth:`save_sim`, :meth:`save_system`, :meth:`save_raw`, :meth:`append`,
+    :meth:`save_checkpoint`, :meth:`flush` or :meth:`close`.
+
+    Parameters
+    ----------
+    maxsize: integer
+        Maximum number of results waiting to be written.
+    compression: string
+        Codec of the files written by :meth:`save_sim`: ``gzip`` (default),
+        ``bzip2``, ``lzma`` or ``none``. All are read by
+        :func:`sesame.utils.load_sim`.
+    level: integer
+        Compression level of the codec, the default of the codec if None (9
+        for gzip). A low level (e.g. 1) favors writing speed over file size.
+    on_written: callable (optional)
+        Function called in the writing thread with the name of each file once
+        it is on disk.
+
+    Examples
+    --------
+    >>> with sesame.AsyncWriter() as writer:
+    ...     for idx, result in enumerate(results):
+    ...         writer.save_sim(sys, result, 'sim_{0}.gzip'.format(idx))
+    """
+
+    def __init__(self, maxsize=2, compression='gzip', level=None, on_written=None):
+        _compressed(io.BytesIO(), compression, level) # check the codec early
+        self.compression = compression
+        self.level = level
+        self.on_written = on_written
+
+        self._queue = queue.Queue(maxsize)
+        self._error = None
+        self._thread = threading.Thread(target=self._work, daemon=True)
+        self._thread.start()
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                if self._error is None:
+                    name = job[0](*job[1:])
+                    if self.on_written is not None:
+                        self.on_written(name)
+            except Exception as e:
+                logging.error("Could not write simulation results: {0}"\
+                              .format(e))
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+    def _raise(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _submit(self, *job):
+        self._raise()
+        if not self._thread.is_alive():
+            raise RuntimeError("The writer is closed.")
+        self._queue.put(job)
+
+    def _write_sim(self, data, filename):
+        dump(data, filename, self.compression, self.level)
+        return filename
+
+    def _write_mat(self, data, filename):
+        savemat(filename, data, do_compression=True)
+        return filename
+
+    def _write_raw(self, result, filename, system_file):
+        save_raw(result, filename, system_file)
+        return filename
+
+    def _write_store(self, store, result, metadata):
+        store.append(result, **metadata)
+        return store.filename
+
+    def save_sim(self, sys, result, filename, fmt='npz'):
+        """
+        Queue a system and a solution for writing, as
+        :func:`sesame.utils.save_sim` does.
+
+        Parameters
+        ----------
+        sys: Builder
+            The discretized system.
+        result: dictionary
+            Dictionary of solution, containing 'v', 'efn', 'efp'.
+        filename: string
+            Name of the output file.
+        fmt: string
+            Format of the output file, set to 'mat' for matlab files.
+        """
+        if fmt == 'mat':
+            # only the arrays of the Matlab file are copied
+            from .utils import mat_data
+            self._submit(self._write_mat, mat_data(sys, result), filename)
+            return
+        data = pickle.dumps((sys, result), protocol=pickle.HIGHEST_PROTOCOL)
+        self._submit(self._write_sim, data, filename)
+
+    def save_checkpoint(self, checkpoint, **state):
+        """
+        Queue the state of a sweep for writing, as
+        :meth:`Checkpoint.save` does. The checkpoint is written after all
+        the results queued before it.
+
+        Parameters
+        ----------
+        checkpoint: Checkpoint
+            The checkpoint of the sweep.
+        state: keyword arguments
+            Values of the state.
+        """
+        self._submit(checkpoint.write, checkpoint.data(**state))
+
+    def save_system(self, sys, filename):
+        """
+        Queue a system for writing, as the file of the system of
+        :meth:`save_raw`.
+
+        Parameters
+        ----------
+        sys: Builder
+            The discretized system.
+        filename: string
+            Name of the output file.
+        """
+        data = pickle.dumps(sys, protocol=pickle.HIGHEST_PROTOCOL)
+        self._submit(self._write_sim, data, filename)
+
+    def save_raw(self, result, filename, system_file):
+        """
+        Queue a solution for writing, as :func:`save_raw` does.
+
+        Parameters
+        ----------
+        result: dictionary
+            Dictionary of solution, containing 'v', 'efn', 'efp'.
+        filename: string
+            Name of the output file.
+        system_file: string
+            Name of the file of the pickled system.
+        """
+        result = {key: np.array(result[key]) for key in _keys}
+        self._submit(self._write_raw, result, filename, system_file)
+
+    def append(self, store, result, **metadata):
+        """
+        Queue a solution to append to a sweep store.
+
+        Parameters
+        ----------
+        store: SweepStore
+            The store of the sweep.
+        result: dictionary
+            Dictionary of solution, containing 'v', 'efn', 'efp'.
+        metadata: keyword arguments
+            Values saved with the solution.
+        """
+        result = {key: np.array(result[key]) for key in _keys}
+        self._submit(self._write_store, store, result, metadata)
+
+    def flush(self):
+        """Wait until all the queued results are on disk."""
+        self._queue.join()
+        self._raise()
+
+    def close(self):
+        """Write the queued results and stop the writing thread."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._raise()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,386 @@
+# Copyright 2017 University of Maryland.
+#
+# This file is part of Sesame. It is subject to the license terms in the file
+# LICENSE.rst found in the top-level directory of this distribution.
+
+import numpy as np
+from scipy.linalg import qr, svd, solve as dense_solve
+
+from .getF import getF
+from .solvers import Solver
+from .utils import get_lattice
+
+import logging
+logging.basicConfig(level=logging.DEBUG, format='%(levelname)s: %(message)s')
+
+__all__ = ['Surrogate']
+
+
+def _contact_sites(sys):
+    nx, ny = sys.nx, sys.ny
+    left = np.arange(ny, dtype=int) * nx
+    return left, left + nx - 1
+
+
+def _contact_potentials(sys, voltage):
+    # Equilibrium potentials of the contacts (identical to those used by the
+    # solver to compute the equilibrium) and the potential applied on the
+    # right contact, as done in Solver.IVcurve
+    veq = Solver().make_guess(sys)
+    left, right = _contact_sites(sys)
+    q = 1 if sys.rho[sys.nx-1] < 0 else -1
+    target = np.concatenate((veq[left], veq[right] + q * voltage /
+                             sys.scaling.energy))
+    return veq, target
+
+
+def _row_scales(sys, n, p, sites, kind, lattice):
+    # Characteristic magnitude of the rows of the residual (diagonal of the
+    # Jacobian of the transport terms), so that the scaled residual is
+    # comparable to a Newton step in units of kT/q. kind is 0, 1, 2 for the
+    # rows of efn, efp, v; contact rows are handled with the sites.
+    Nx, Ny = sys.nx, sys.ny
+    i = sites % Nx
+    j = sites // Nx
+    inner = (i > 0) & (i < Nx-1)
+    scale = np.ones(sites.shape)
+
+    k = j[inner] * (Nx-2) + i[inner] - 1
+    dx, dxm1, dy, dym1, dxbar, dybar = lattice
+    c = (1 / dxm1[k] + 1 / dx[k]) / dxbar[k]
+    if Ny > 1:
+        c = c + (1 / dym1[k] + 1 / dy[k]) / dybar[k]
+    s = sites[inner]
+    kd = kind[inner]
+    scale[inner] = np.where(kd == 0, sys.mu_e[s] * n[s] * c,
+                   np.where(kd == 1, sys.mu_h[s] * p[s] * c,
+                            sys.epsilon[s] * c + n[s] + p[s]))
+
+    # contacts: currents and recombination velocities
+    for side, edge in ((i == 0, 0), (i == Nx-1, 1)):
+        s = sites[side]
+        kd = kind[side]
+        dl = sys.dx[0] if edge == 0 else sys.dx[-1]
+        scale[side] = np.where(kd == 0, n[s] * (sys.mu_e[s] / dl + sys.Scn[edge]),
+                      np.where(kd == 1, p[s] * (sys.mu_h[s] / dl + sys.Scp[edge]),
+                               1))
+    return scale
+
+
+def _residual(sys, x, veq, target, lattice):
+    # Scaled residual of the full system. The rows of the potential at the
+    # contacts hold the difference with the applied potentials.
+    N = sys.nx * sys.ny
+    efn, efp, v = x[0::3], x[1::3], x[2::3]
+    f = getF(sys, v, efn, efp, veq)
+
+    left, right = _contact_sites(sys)
+    contacts = np.concatenate((left, right))
+    f[3*contacts+2] = v[contacts] - target
+
+    n = sys.Nc * np.exp(+sys.bl + efn + v)
+    p = sys.Nv * np.exp(-sys.Eg - sys.bl - efp - v)
+    rows = np.arange(3*N, dtype=int)
+    return f / _row_scales(sys, n, p, rows // 3, rows % 3, lattice)
+
+
+class _SampledResidual():
+    # Evaluation of the scaled residual on a few rows only, with getF
+    # restricted to the sites of these rows. Only the unknowns of the sampled
+    # sites and of their neighbors are needed.
+
+    def __init__(self, sys, rows):
+        Nx, Ny = sys.nx, sys.ny
+        N = Nx * Ny
+        self.rows = rows
+        self.sites = rows // 3
+        self.kind = rows % 3
+        self.computed = np.unique(self.sites)
+
+        i = self.sites % Nx
+        inner = self.sites[(i > 0) & (i < Nx-1)]
+        self.contacts = (self.kind == 2) & ((i == 0) | (i == Nx-1))
+
+        # sites whose unknowns enter the sampled rows
+        stencil = np.concatenate((self.sites, inner - 1, inner + 1,
+                                  (inner - Nx) % N, (inner + Nx) % N,
+                                  self.sites[i == 0] + 1,
+                                  self.sites[i == Nx-1] - 1))
+        self.stencil = np.unique(stencil)
+        self.stencil_rows = np.sort(np.concatenate((3*self.stencil,
+                                    3*self.stencil+1, 3*self.stencil+2)))
+
+    def prepare(self, sys, veq, target):
+        # quantities that depend on the system but not on the unknowns
+        Nx, Ny = sys.nx, sys.ny
+        self.lattice = get_lattice(sys)
+        self.veq = veq
+        left, right = _contact_sites(sys)
+        self.target = np.zeros((Nx*Ny,))
+        self.target[left] = target[:Ny]
+        self.target[right] = target[Ny:]
+        self.defects = []
+        for d in sys.defects_list:
+            mask = np.isin(d.sites, self.computed)
+            if np.any(mask):
+                # parameters given site by site are restricted as well
+                params = {name: getattr(d, name)[mask] for name in \
+                          ('dos', 'energy', 'sigma_e', 'sigma_h') \
+                          if isinstance(getattr(d, name), np.ndarray)}
+                self.defects.append(d._replace(sites=np.asarray(d.sites)[mask],
+                                    perp_dl=np.asarray(d.perp_dl)[mask],
+                                    **params))
+
+    def __call__(self, sys, efn, efp, v):
+        # efn, efp, v are arrays of the size of the system, only their values
+        # on the stencil are used
+        f = getF(sys, v, efn, efp, self.veq, sites=self.computed,
+                 defects=self.defects, lattice=self.lattice)[self.rows]
+        s = self.sites
+        f[self.contacts] = v[s[self.contacts]] - self.target[s[self.contacts]]
+
+        n = np.zeros(v.shape)
+        p = np.zeros(v.shape)
+        n[s] = sys.Nc[s] * np.exp(+sys.bl[s] + efn[s] + v[s])
+        p[s] = sys.Nv[s] * np.exp(-sys.Eg[s] - sys.bl[s] - efp[s] - v[s])
+        return f / _row_scales(sys, n, p, s, self.kind, self.lattice)
+
+
+class Surrogate():
+    """
+    Reduced-order model of a device, built from steady states computed for
+    various values of the parameters of the system (material parameters,
+    defects, generation rate, applied voltage) on the same grid.
+
+    The unknowns are searched in the space spanned by the main modes of the
+    steady states (proper orthogonal decomposition). The residual of the
+    drift-diffusion-Poisson equations is interpolated from a small number of
+    its components (discrete empirical interpolation), so that a Newton step in
+    the reduced space costs a few evaluations of the residual on these
+    components only. Each reduced solution is certified by one evaluation of
+    the full residual.
+
+    Parameters
+    ----------
+    tol: float
+        Relative energy of the steady states and residuals neglected by the
+        truncation of their modes.
+
+    Attributes
+    ----------
+    modes: integer
+        Number of modes of the steady states.
+    samples: integer
+        Number of components of the residual used for the interpolation.
+    residual: float
+        Largest scaled component of the full residual for the last reduced
+        solution.
+
+    Examples
+    --------
+    Build a surrogate from a parameter sweep and use it for new parameters:
+
+    >>> rom = sesame.Surrogate()
+    >>> for tau in [1e-9, 1e-8, 1e-7]:
+    ...     sys = make_system(tau)
+    ...     rom.add(sys, sesame.solve(sys))
+    >>> rom.build()
+    >>> solution = rom.solve(make_system(5e-8))
+    """
+
+    def __init__(self, tol=1e-10):
+        self.tol = tol
+        self.snapshots = []
+        self.residuals = []
+        self._last = None
+        self.basis = None
+        self.modes = 0
+        self.samples = 0
+        self.residual = None
+
+    def add(self, sys, solution, voltage=0):
+        """
+        Add a steady state to the snapshots of the surrogate.
+
+        Parameters
+        ----------
+        sys: Builder
+            The discretized system (one- or two-dimensional) for which the
+            steady state was computed.
+        solution: dictionary of numpy arrays of floats
+            Steady state of the system. Keys must be 'efn', 'efp' and 'v'.
+        voltage: float
+            Voltage applied on the right contact [V].
+        """
+        if sys.dimension == 3:
+            raise ValueError("Surrogate is not implemented for "
+                             "three-dimensional systems.")
+
+        N = sys.nx * sys.ny
+        x = np.zeros((3*N,))
+        x[0::3], x[1::3], x[2::3] = solution['efn'], solution['efp'], solution['v']
+        if len(self.snapshots) > 0 and x.shape != self.snapshots[0].shape:
+            raise ValueError("All the snapshots must be computed on the same grid.")
+        self.snapshots.append(x)
+
+        # residuals of the neighboring snapshots with the parameters of the
+        # other one: they sample the variations of the residual seen during
+        # the reduced Newton iterations
+        veq, target = _contact_potentials(sys, voltage)
+        lattice = get_lattice(sys)
+        if self._last is not None:
+            sys0, x0, veq0, target0, lattice0 = self._last
+            self.residuals.append(_residual(sys, x0, veq, target, lattice))
+            self.residuals.append(_residual(sys0, x, veq0, target0, lattice0))
+            self.residuals.append(_residual(sys, (x + x0) / 2, veq, target,
+                                            lattice))
+        self._last = (sys, x, veq, target, lattice)
+        self.basis = None
+
+    def _truncation(self, s):
+        # number of singular values to keep
+        energy = np.cumsum(s**2)
+        if energy[-1] == 0:
+            return 0
+        return int(np.searchsorted(energy, (1 - self.tol) * energy[-1]) + 1)
+
+    def build(self, modes=None):
+        """
+        Compute the modes of the snapshots and the components of the residual
+        used for the interpolation.
+
+        Parameters
+        ----------
+        modes: integer
+            Number of modes of the steady states. By default it is set by the
+            truncation tolerance of the surrogate.
+        """
+        if len(self.snapshots) < 2:
+            raise ValueError("At least two snapshots are needed to build a "
+                             "surrogate.")
+
+        X = np.array(self.snapshots).T
+        self.mean = X.mean(axis=1)
+        V, s, _ = svd(X - self.mean[:, None], full_matrices=False)
+        k = self._truncation(s) if modes is None else min(modes, len(s))
+        k = max(k, 1)
+        self.basis = V[:, :k]
+        self.modes = k
+        self.coefficients = self.basis.T.dot(X - self.mean[:, None])
+
+        # modes of the residual and interpolation points (pivoted QR)
+        R = np.array(self.residuals).T
+        U, s, _ = svd(R, full_matrices=False)
+        m = max(self._truncation(s), 2*k)
+        m = min(m, U.shape[1])
+        U = U[:, :m]
+        _, _, piv = qr(U.T, pivoting=True, mode='economic')
+        rows = np.sort(piv[:m])
+        self.samples = m
+
+        # Galerkin projection of the interpolated residual
+        self._projection = self.basis.T.dot(U).dot(np.linalg.inv(U[rows]))
+        self._rows = rows
+        self._contacts = [x[2::3] for x in self.snapshots]
+        logging.info("Surrogate built with {0} modes and {1} samples of the "
+                     "residual.".format(k, m))
+
+    def solve(self, sys, voltage=0, tol=1e-8, maxiter=50, certify=1e-3,
+              refine=True, solver=None):
+        """
+        Compute the steady state of a system with the surrogate.
+
+        Parameters
+        ----------
+        sys: Builder
+            The discretized system, on the grid of the snapshots.
+        voltage: float
+            Voltage applied on the right contact [V].
+        tol: float
+            Accepted error made by the reduced Newton-Raphson scheme.
+        maxiter: integer
+            Maximum number of steps taken by the reduced Newton-Raphson
+            scheme.
+        certify: float
+            Largest accepted scaled component of the full residual. The scaled
+            residual is comparable to a Newton step of the full system.
+        refine: boolean
+            If the reduced solution is not certified, use it as a starting point
+            for the full solver (default). Otherwise None is returned.
+        solver: Solver
+            Solver used to refine the solution. A new instance is created if
+            not given.
+
+        Returns
+        -------
+        solution: dictionary with numpy arrays of floats
+            Dictionary containing the one-dimensional arrays of the solution.
+            None is returned if no solution could be found.
+        """
+        if self.basis is None:
+            self.build()
+
+        V = self.basis
+        veq, target = _contact_potentials(sys, voltage)
+        sampled = _SampledResidual(sys, self._rows)
+        sampled.prepare(sys, veq, target)
+        rows = sampled.stencil_rows
+        Vs, xs = V[rows], self.mean[rows]
+
+        def G(a):
+            x = np.zeros(self.mean.shape)
+            x[rows] = xs + Vs.dot(a)
+            f = sampled(sys, x[0::3], x[1::3], x[2::3])
+            return self._projection.dot(f)
+
+        # start from the snapshot with the closest contact potentials
+        left, right = _contact_sites(sys)
+        contacts = np.concatenate((left, right))
+        start = np.argmin([np.abs(c[contacts] - target).sum()
+                           for c in self._contacts])
+        a = np.copy(self.coefficients[:, start])
+
+        # Newton-Raphson in the reduced space with a finite difference
+        # Jacobian
+        converged = False
+        h = 1e-7
+        for it in range(maxiter):
+            g = G(a)
+            J = np.zeros((len(a), len(a)))
+            for c in range(len(a)):
+                da = np.zeros(a.shape)
+                da[c] = h * max(1, abs(a[c]))
+                J[:, c] = (G(a + da) - g) / da[c]
+            try:
+                step = dense_solve(J, -g)
+            except (np.linalg.LinAlgError, ValueError):
+                break
+            dx = np.abs(Vs.dot(step)).max()
+            if not np.isfinite(dx):
+                break
+            # damping of the large steps
+            if dx > 1:
+                step *= np.log(1 + dx * 1.72) / dx
+            a += step
+            if dx < tol:
+                converged = True
+                break
+
+        x = self.mean + V.dot(a)
+        solution = {'efn': x[0::3], 'efp': x[1::3], 'v': x[2::3]}
+
+        # certification with the full residual
+        self.residual = np.abs(_residual(sys, x, veq, target, get_lattice(sys))).max()
+        if converged and self.residual <= certify:
+            return solution
+
+        logging.info("The reduced solution is not certified (residual {0:.2e})."\
+                     .format(self.residual))
+        if not refine:
+            return None
+        if solver is None:
+            solver = Solver()
+        if solver.equilibrium is None:
+            solver.solve(sys, compute='Poisson', verbose=False)
+        solution['v'][contacts] = target
+        return solver.solve(sys, guess=solution, verbose=False)
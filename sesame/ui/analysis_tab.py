@@ -19,6 +19,8 @@ from .common import parseSettings, slotError
 from ..analyzer import Analyzer
 from ..plotter import plot
 from .. utils import check_equal_sim_settings
+from ..store import open_sim
+from ..batch import analyze
 
 
 class Analysis(QWidget):
@@ -172,7 +174,7 @@ class Analysis(QWidget):
     def browse(self):
         dialog = QFileDialog()
         wd = self.table.simulation.workDirName.text()
-        paths = dialog.getOpenFileNames(self, "Upload files", wd, "(*.gzip)")[0]
+        paths = dialog.getOpenFileNames(self, "Upload files", wd, "(*.gzip *.npz)")[0]
         for path in paths:
             self.filesList.append(path)
             path = os.path.basename(path)
@@ -253,7 +255,8 @@ class Analysis(QWidget):
             return
         else:
             fileName = files[0]
-            system, data = sesame.load_sim(fileName)
+            sim = open_sim(fileName)
+            system, data = sim.system, sim.result
 
             # check to see if data file sim settings are the same as gui sim settings!
             are_equal = check_equal_sim_settings(system, gui_system)
@@ -393,18 +396,58 @@ class Analysis(QWidget):
         J  = gui_system.scaling.current
         x0 = gui_system.scaling.length
 
-        # Ydata is a list for the quantities looped over
-        Ydata = []
+        # scalar quantities of all the files, read from the index of the
+        # directory of the files once computed. The quantities are computed in
+        # this process, the application cannot start worker processes.
+        scalars = {"Full steady state current": 'full_current',
+                   "Integrated total recombination": 'integrated_total_recombination',
+                   "Integrated defects recombination": 'integrated_defects_recombination'}
 
         are_all_equal = True
+        if txt in scalars:
+            X = Xdata
+            Ydata = analyze(files, [scalars[txt]], processes=1)[scalars[txt]]
+            # the system of the first file gives the dimension of the data
+            system = open_sim(files[0]).system
+            are_all_equal = check_equal_sim_settings(system, gui_system)
+            if txt == "Integrated defects recombination":
+                if system.dimension == 1:
+                    Ydata = G * x0 * Ydata
+                    YLabel = r'[$\mathregular{G_{pl. defect}\ cm^{-2}\cdot s^{-1}}$]'
+                if system.dimension == 2:
+                    Ydata = G * x0**2 * Ydata
+                    YLabel = r'[$\mathregular{G_{pl. defect}\ cm^{-1}\cdot s^{-1}}$]'
+            if txt == "Integrated total recombination":
+                if system.dimension == 1:
+                    Ydata = G * x0 * Ydata
+                    YLabel = r'[$G_{tot}\ \mathregular{cm^{-2}\cdot s^{-1}}$]'
+                if system.dimension == 2:
+                    Ydata = G * x0**2 * Ydata
+                    YLabel = r'[$G_{tot}\ \mathregular{cm^{-1}\cdot s^{-1}}$]'
+            if txt == "Full steady state current":
+                if system.ypts.size == 1:
+                    Ydata = J * Ydata * 1e3
+                    YLabel = r'J [$\mathregular{mA\cdot cm^{-2}}$]'
+                if system.ypts.size > 1:
+                    Ydata = J * Ydata * 1e3 * x0
+                    YLabel = r'J [$\mathregular{mA\cdot cm^{-1}}$]'
+            # no file to loop over
+            files = []
+
+        # systems already compared to the gui system; the files of a sweep
+        # share the same system
+        checked = set()
         # loop over the files and plot
         for fdx, fileName in enumerate(files):
-            system, data = sesame.load_sim(fileName)
+            sim = open_sim(fileName)
+            system, data = sim.system, sim.result
 
             # check to see if data file sim settings are the same as gui sim settings!
-            are_equal = check_equal_sim_settings(system, gui_system)
-            if are_equal == False:
-                are_all_equal = False
+            if id(system) not in checked:
+                checked.add(id(system))
+                are_equal = check_equal_sim_settings(system, gui_system)
+                if are_equal == False:
+                    are_all_equal = False
 
 
             #data = np.load(fileName)
@@ -461,52 +504,18 @@ class Analysis(QWidget):
             if txt == "Hole current along y":
                 Ydata = J * az.hole_current(component='y')[sites] * 1e3
                 YLabel = r'$\mathregular{J_{p,y}\ [mA\cdot cm^{-2}]}$'
-            if txt == "Integrated planar defects recombination":
-                if system.dimension == 1:
-                    Ydata.append(G * x0 * sum(az.integrated_defect_recombination(d)\
-                                for d in system.defects_list))
-                    YLabel = r'[$\mathregular{G_{pl. defect}\ cm^{-2}\cdot s^{-1}}$]'
-                if system.dimension == 2:
-                    Ydata.append(G * x0**2 * sum(az.integrated_defect_recombination(d)\
-                                for d in system.defects_list))
-                    YLabel = r'[$\mathregular{G_{pl. defect}\ cm^{-1}\cdot s^{-1}}$]'
-            if txt == "Integrated total recombination":
-                j_srh = az.integrated_bulk_srh_recombination()
-                j_rad = az.integrated_radiative_recombination()
-                j_aug = az.integrated_auger_recombination()
-                j_def = sum(az.integrated_defect_recombination(d)\
-                                for d in system.defects_list)
-                if system.dimension == 1:
-                    Ydata.append(G * x0 * (j_srh + j_rad + j_aug + j_def))
-                    YLabel = r'[$G_{tot}\ \mathregular{cm^{-2}\cdot s^{-1}}$]'
-                if system.dimension == 2:
-                    Ydata.append(G * x0**2 * (j_srh + j_rad + j_aug + j_def))
-                    YLabel = r'[$G_{tot}\ \mathregular{cm^{-1}\cdot s^{-1}}$]'
-            if txt == "Full steady state current":
-                if system.ypts.size == 1:
-                    Ydata.append(J * az.full_current() * 1e3)
-                    YLabel = r'J [$\mathregular{mA\cdot cm^{-2}}$]'
-                if system.ypts.size > 1:
-                    Ydata.append(J * az.full_current() * 1e3 * x0)
-                    YLabel = r'J [$\mathregular{mA\cdot cm^{-1}}$]'
-
             # plot
-            if txt not in ["Full steady state current",\
-                           "Integrated total recombination",\
-                           "Integrated defects recombination"]:
-                if txt != "Band diagram":
-                    ax = self.linearFig.figure.add_subplot(111)
-                    X = X * 1e4  # set length in um
-                    ax.plot(X, Ydata)
-                    ax.set_ylabel(YLabel)
-                    ax.set_xlabel(r'Position [$\mathregular{\mu m}$]')
-                else:
-                    az.band_diagram((Xdata[0], Xdata[1]), fig=self.linearFig.figure)
+            if txt != "Band diagram":
+                ax = self.linearFig.figure.add_subplot(111)
+                X = X * 1e4  # set length in um
+                ax.plot(X, Ydata)
+                ax.set_ylabel(YLabel)
+                ax.set_xlabel(r'Position [$\mathregular{\mu m}$]')
+            else:
+                az.band_diagram((Xdata[0], Xdata[1]), fig=self.linearFig.figure)
 
         # For quantities looped over
-        if txt in ["Full steady state current",\
-                   "Integrated total recombination",\
-                   "Integrated defects recombination"]:
+        if txt in scalars:
             try:
                 c = next(self.iterColors)
             except StopIteration:
@@ -254,10 +254,8 @@ class Window(QMainWindow):
         self.table.simulation.loopValues.setText(loopValues)
         self.table.simulation.workDirName.setText(workDir)
         self.table.simulation.fileName.setText(fileName)
-        if ext == '.npz':
-            self.table.simulation.fbox.setCurrentIndex(0)
-        elif ext == '.mat':
-            self.table.simulation.fbox.setCurrentIndex(1)
+        self.table.simulation.fbox.setCurrentIndex(\
+                max(self.table.simulation.fbox.findText(ext), 0))
         if BCs:
             self.table.simulation.periodic.setChecked(True)
         else:
@@ -7,10 +7,11 @@ import numpy as np
 from PyQt5.QtCore import *
 from PyQt5 import QtCore
 import logging
+import os
 
 import sesame
 from ..solvers import Solver
-from .. utils import save_sim
+from ..store import AsyncWriter, Checkpoint
 from scipy.io import savemat
 
 logging.basicConfig(level=logging.ERROR, format='%(levelname)s: %(message)s')
@@ -21,7 +22,8 @@ class SimulationWorker(QObject):
     newFile = pyqtSignal(str)
 
     def __init__(self, loop, system, solverSettings,\
-                       use_manual_g, generation, paramName, parent=None):
+                       use_manual_g, generation, paramName, parent=None,\
+                       resume=False):
         super(SimulationWorker, self).__init__()
 
         self.parent = parent
@@ -32,6 +34,7 @@ class SimulationWorker(QObject):
         self.generation = generation
         self.paramName = paramName
         self.use_manual_g = use_manual_g
+        self.resume = resume
 
         self.logger = logging.getLogger(__name__)
         self.abort = False
@@ -40,8 +43,28 @@ class SimulationWorker(QObject):
     def abortSim(self):
         self.abort = True
 
+    def _written(self, name):
+        # called by the writer thread once a file is on disk
+        if name.endswith('.gzip') or name.endswith('.npz'):
+            # signal a new file has been created to the main thread
+            self.newFile.emit(name)
+
     @pyqtSlot()
     def run(self):
+        # The results are written in the background while the next point is
+        # solved. Pending files are written on completion and on abort before
+        # telling the main thread to quit this thread.
+        writer = AsyncWriter(on_written=self._written)
+        try:
+            self._run(writer)
+        finally:
+            try:
+                writer.close()
+            except Exception:
+                self.logger.error("**  The results could not be saved  **")
+            self.simuDone.emit()
+
+    def _run(self, writer):
         loop = self.loop
         system = self.system
         solverSettings = self.solverSettings
@@ -61,29 +84,51 @@ class SimulationWorker(QObject):
         # Create a Solver instance, I don't use the one already present
         solver = Solver(use_mumps=useMumps)
 
+        # The state of the loop is saved after each converged solution:
+        # index of the last point computed and number of ramp stages done for
+        # the next one
+        checkpoint = Checkpoint(simName + '.ckpt', system, loopValues)
+        state = checkpoint.load() if self.resume else None
+        def save_state(index, stage):
+            writer.save_checkpoint(checkpoint, index=index, ramp=stage,
+                                   equilibrium=solver.equilibrium,
+                                   solution=solution)
+
         #===========================================================
         # Equilibrium potential
         #===========================================================
         nx = system.nx
 
-        # Equilibrium guess
-        guess = solver.make_guess(system)
-        # Solve Poisson equation
-        solver.solve(system, 'Poisson', guess, tol, BCs, maxiter, True, htpy)
-
-        if solver.equilibrium is not None:
-            self.logger.info("Equilibrium electrostatic potential obtained")
-            # Construct the solution dictionnary
-            efn = np.zeros_like(solver.equilibrium)
-            efp = np.zeros_like(solver.equilibrium)
-            v = np.copy(solver.equilibrium)
-            solution = {'efn': efn, 'efp': efp, 'v': v}
+        if state is not None:
+            self.logger.info("Resuming the interrupted calculation")
+            solver.equilibrium = state['equilibrium']
+            solution = state['solution']
+            # files of the points already computed
+            for idx in range(state['index'] + 1):
+                for ext in ('.gzip', '.npz'):
+                    name = simName + "_{0}".format(idx) + ext
+                    if os.path.exists(name):
+                        self._written(name)
+            done, stages = state['index'], state['ramp']
         else:
-            self.logger.info("The solver failed to converge for the electrostatic potential")
-            return
+            # Equilibrium guess
+            guess = solver.make_guess(system)
+            # Solve Poisson equation
+            solver.solve(system, 'Poisson', guess, tol, BCs, maxiter, True, htpy)
+
+            if solver.equilibrium is not None:
+                self.logger.info("Equilibrium electrostatic potential obtained")
+                # Construct the solution dictionnary
+                efn = np.zeros_like(solver.equilibrium)
+                efp = np.zeros_like(solver.equilibrium)
+                v = np.copy(solver.equilibrium)
+                solution = {'efn': efn, 'efp': efp, 'v': v}
+            else:
+                self.logger.info("The solver failed to converge for the electrostatic potential")
+                return
+            done, stages = -1, 0
 
         if self.abort:
-            self.simuDone.emit()
             return
 
         #===========================================================
@@ -105,7 +150,6 @@ class SimulationWorker(QObject):
                 except Exception:
                     msg = "**  The generation rate could not be interpreted  **"
                     self.logger.error(msg)
-                    self.simuDone.emit()
                     return
 
             if self.use_manual_g is False and system.g.any():
@@ -119,6 +163,10 @@ class SimulationWorker(QObject):
                     self.logger.info("A generation rate is used with a non-zero ramp.")
                 system.g /= 10**ramp
                 for a in range(ramp):
+                    if done >= 0 or a < stages:
+                        # stage done before the interruption
+                        system.g *= 10
+                        continue
                     self.logger.info("Amplitude divided by {0}"\
                                                 .format(10**(ramp-a)))
                     solution = solver.solve(system, 'all', solution,\
@@ -128,10 +176,9 @@ class SimulationWorker(QObject):
                     if solution is None:
                         msg = "**  The calculations failed  **"
                         self.logger.error(msg)
-                        self.simuDone.emit()
                         return
+                    save_state(-1, a + 1)
                     if self.abort:
-                        self.simuDone.emit()
                         return
             
             # Loop over voltages
@@ -147,8 +194,12 @@ class SimulationWorker(QObject):
 
             # Loop over the applied potentials made dimensionless
             self.logger.info("Voltage loop starts now")
+            if fmt == '.npz':
+                # the system is saved once for all the files of the loop
+                system_file = simName + '.system'
+                writer.save_system(system, system_file)
             Vapp = [i / system.scaling.energy for i in loopValues]
-            for idx, vapp in enumerate(Vapp):
+            for idx, vapp in enumerate(Vapp[done+1:], done+1):
                 logging.info("Applied voltage: {0} V".format(loopValues[idx]))
 
                 # Apply the voltage on the right contact
@@ -158,36 +209,37 @@ class SimulationWorker(QObject):
                 solution = solver.solve(system, 'all',solution,\
                                         tol, BCs, maxiter, True, htpy)
                 if self.abort:
-                    self.simuDone.emit()
                     return
 
                 if solution is not None:
                     name = simName + "_{0}".format(idx)
 
                     if fmt == '.mat':
-                        save_sim(system, solution, name, fmt='mat')
+                        writer.save_sim(system, solution, name, fmt='mat')
+                    elif fmt == '.npz':
+                        writer.save_raw(solution, name + '.npz', system_file)
                     else:
                         filename = "%s.gzip" % name
-                        save_sim(system, solution, filename)
-                        # signal a new file has been created to the main thread
-                        self.newFile.emit(name + '.gzip')
+                        writer.save_sim(system, solution, filename)
+                    save_state(idx, 0)
                 else:
                     logging.info("The solver failed to converge for the applied voltage"\
                           + " {0} V (index {1}).".format(loopValues[idx], idx))
                     self.logger.info("Aborting now.")
-                    self.simuDone.emit()
                     return
 
             if solution is not None:
                 msg = "** Calculations completed successfully **"
                 self.logger.info(msg)
+                writer.flush()
+                checkpoint.remove()
 
         #===========================================================
         # Loop over generation rates
         #===========================================================
         if loop == 'generation':
             self.logger.info("Generation rate loop starting now")
-            for idx, p in enumerate(loopValues):
+            for idx, p in enumerate(loopValues[done+1:], done+1):
                 # give the named parameter its value
                 self.logger.info("Parameter value: {0} = {1}".format(paramName, p))
                 # create callable 
@@ -201,11 +253,14 @@ class SimulationWorker(QObject):
                 except Exception:
                     msg = "**  The generation rate could not be interpreted  **"
                     self.logger.error(msg)
-                    self.simuDone.emit()
                     return
 
                 system.g /= 10**ramp
                 for a in range(ramp+1):
+                    if a < stages:
+                        # stage done before the interruption
+                        system.g *= 10
+                        continue
                     self.logger.info("Amplitude divided by {0}"\
                                                 .format(10**(ramp-a)))
                     solution = solver.solve(system, 'all', solution, tol, BCs,
@@ -214,11 +269,12 @@ class SimulationWorker(QObject):
                     if solution is None:
                         msg = "**  The calculations failed  **"
                         self.logger.error(msg)
-                        self.simuDone.emit()
                         return
+                    if a < ramp:
+                        save_state(idx - 1, a + 1)
                     if self.abort:
-                        self.simuDone.emit()
                         return
+                stages = 0
  
                 if solution is not None:
                     name = simName + "_{0}".format(idx)
@@ -231,21 +287,22 @@ class SimulationWorker(QObject):
                     if self.abort:
                         return
                     if fmt == '.mat':
-                        save_sim(system, solution, name, fmt='mat')
+                        writer.save_sim(system, solution, name, fmt='mat')
+                    elif fmt == '.npz':
+                        # the generation rate differs for each file
+                        writer.save_system(system, name + '.system')
+                        writer.save_raw(solution, name + '.npz', name + '.system')
                     else:
                         filename = "%s.gzip" % name
-                        save_sim(system, solution, filename)
-                        # signal a new file has been created to the main thread
-                        self.newFile.emit(name + '.gzip')
+                        writer.save_sim(system, solution, filename)
+                    save_state(idx, 0)
                 else:
                     self.logger.info("The solver failed to converge for the parameter value"\
                           + " {0} (index {1}).".format(p, idx))
                     self.logger.info("Aborting now.")
-                    self.simuDone.emit()
                     return
             if solution is not None:
                 msg = "** Calculations completed successfully **"
                 self.logger.info(msg)
-
-        # tell main thread to quit this thread
-        self.simuDone.emit()
+                writer.flush()
+                checkpoint.remove()
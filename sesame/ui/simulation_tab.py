@@ -92,7 +92,7 @@ class Simulation(QWidget):
         self.fileLayout = QHBoxLayout()
         self.fileName = QLineEdit()
         self.fbox = QComboBox()
-        self.fbox.addItems([".gzip", ".mat"])
+        self.fbox.addItems([".gzip", ".mat", ".npz"])
         self.fileLayout.addWidget(self.fileName)
         self.fileLayout.addWidget(self.fbox)
 
@@ -100,6 +100,10 @@ class Simulation(QWidget):
         self.form1.addRow("Working directory", self.workDir)
         self.form1.addRow("Output file name", self.fileLayout)
 
+        # continue an interrupted simulation from its checkpoint
+        self.resume = QCheckBox("Resume from the last converged point", self)
+        self.form1.addRow("Interrupted simulation", self.resume)
+
         self.outputBox.setLayout(self.form1)
         self.vlayout.addWidget(self.outputBox)
 
@@ -409,7 +413,8 @@ class Simulation(QWidget):
 
             # add worker to thread and run simulation
             self.simulation = SimulationWorker(loop, system, solverSettings,\
-                                                use_manual_g, generation, paramName)
+                                                use_manual_g, generation, paramName,\
+                                                resume=self.resume.isChecked())
             self.simulation.moveToThread(self.thread)
             self.simulation.simuDone.connect(self.thread_cleanup)
             self.simulation.newFile.connect(self.updateDataList)
@@ -4,10 +4,11 @@
 # LICENSE.rst found in the top-level directory of this distribution.
 
 import numpy as np
-import gzip
 import pickle
 from scipy.io import savemat
 
+from .store import SimFile, dump
+
 def get_indices(sys, p, site=False):
     # Return the indices of continous coordinates on the discrete lattice
     # If site is True, return the site number instead
@@ -18,12 +19,12 @@ def get_indices(sys, p, site=False):
     x, y, z = p
     xpts, ypts = sys.xpts, sys.ypts
     nx = len(xpts)
-    x = nx-len(xpts[xpts >= x])
+    # number of nodes strictly before the coordinate
+    x = int(np.searchsorted(xpts, x))
     s = x
 
     if ypts is not None:
-        ny = len(ypts)
-        y = ny-len(ypts[ypts >= y])
+        y = int(np.searchsorted(ypts, y))
         s += nx*y
 
     if site:
@@ -33,9 +34,10 @@ def get_indices(sys, p, site=False):
 
 def get_xyz_from_s(sys, site):
     nx, ny = sys.nx, sys.ny
-    j = (site - nx*ny) // nx * (ny > 1)
-    i = site - j*nx
-    return i, j
+    k = site // (nx*ny)
+    j = (site - k*nx*ny) // nx
+    i = site - j*nx - k*nx*ny
+    return i, j, k
 
 def get_dl(sys, sites):
     sa, sb = sites
@@ -51,6 +53,86 @@ def get_dl(sys, sites):
     return s, np.asarray(X), np.asarray(xcoord), np.asarray(ycoord)
 
 
+def get_cached(sys, key, compute):
+    # Quantities that depend only on the mesh (lattice distances, neighbor
+    # tables) are computed once and stored on the system. The arrays are
+    # read-only, and shared by the systems derived from it (see
+    # Builder.derive).
+    cache = sys.__dict__.setdefault('_cache', {})
+    if key not in cache:
+        values = compute(sys)
+        for a in values:
+            if isinstance(a, np.ndarray):
+                a.flags.writeable = False
+        cache[key] = values
+    return cache[key]
+
+
+def get_lattice(sys):
+    # Lattice distances of the 5-point stencil for the sites inside a one- or
+    # two-dimensional system (0 < i < nx-1): dx, dxm1, dy, dym1, dxbar, dybar.
+    return get_cached(sys, 'lattice', _lattice)
+
+
+def _lattice(sys):
+    Nx, Ny = sys.nx, sys.ny
+    dx = np.tile(sys.dx[1:], Ny)
+    dxm1 = np.tile(sys.dx[:-1], Ny)
+    dy = np.repeat(sys.dy, Nx-2)
+    dym1 = np.repeat(np.roll(sys.dy, 1), Nx-2)
+    dxbar = (dxm1 + dx) / 2.
+    dybar = (dym1 + dy) / 2.
+    infind = np.where(np.isinf(dybar))
+    for i in infind[0]:
+        if np.isinf(dy[i]):
+            dybar[i] = dy[i-Nx] / 2.
+        else:
+            dybar[i] = dy[i] / 2.
+    return dx, dxm1, dy, dym1, dxbar, dybar
+
+
+def get_neighbors(sys, axis):
+    # Neighbor table of the 7-point stencil in the direction axis (0, 1, 2 for
+    # x, y, z) for the sites inside a three-dimensional system (0 < i < nx-1).
+    # Returns the sites, their neighbors (sm, sp) before and after them, the
+    # lattice distances to the neighbors (dm, dp) and the average distance
+    # dbar. The y and z directions wrap around: the lattice distance across
+    # the edges is infinite for abrupt boundary conditions (no flux).
+    return get_cached(sys, ('neighbors', axis),
+                      lambda sys: _neighbors(sys, axis))
+
+
+def _neighbors(sys, axis):
+    nx, ny, nz = sys.nx, sys.ny, sys.nz
+    i = np.arange(1, nx-1)[None, None, :]
+    j = np.arange(ny)[None, :, None]
+    k = np.arange(nz)[:, None, None]
+    sites = i + j*nx + k*nx*ny
+
+    if axis == 0:
+        sm, sp = sites - 1, sites + 1
+        dm, dp = sys.dx[i-1], sys.dx[i]
+    elif axis == 1:
+        sm = i + ((j-1) % ny)*nx + k*nx*ny
+        sp = i + ((j+1) % ny)*nx + k*nx*ny
+        dm, dp = sys.dy[(j-1) % ny], sys.dy[j]
+    else:
+        sm = i + j*nx + ((k-1) % nz)*nx*ny
+        sp = i + j*nx + ((k+1) % nz)*nx*ny
+        dm, dp = sys.dz[(k-1) % nz], sys.dz[k]
+
+    shape = sites.shape
+    sites, sm, sp = sites.flatten(), sm.flatten(), sp.flatten()
+    dm = np.broadcast_to(dm, shape).flatten()
+    dp = np.broadcast_to(dp, shape).flatten()
+
+    # abrupt boundary conditions: half a cell on the edges
+    dbar = (dm + dp) / 2.
+    dbar[np.isinf(dm)] = dp[np.isinf(dm)] / 2.
+    dbar[np.isinf(dp)] = dm[np.isinf(dp)] / 2.
+    return sites, sm, sp, dm, dp, dbar
+
+
 def isfloat(value):
     try:
         float(value)
@@ -61,128 +143,298 @@ def isfloat(value):
 
 def Bresenham(system, p1, p2):
     # Compute a digital line contained in the plane (x,y) and passing by the
-    # points p1 and p2.
-    i1, j1 = get_indices(system, p1)
-    i2, j2 = get_indices(system, p2)
-
-    Dx = abs(i2 - i1)    # distance to travel in X
-    Dy = abs(j2 - j1)    # distance to travel in Y
-
-    incx = 0
-    if i1 < i2:
-        incx = 1           # x will increase at each step
-    elif i1 > i2:
-        incx = -1          # x will decrease at each step
-
-    incy = 0
-    if j1 < j2:
-        incy = 1           # y will increase at each step
-    elif j1 > j2:
-        incy = -1          # y will decrease at each step
-
-    # take the numerator of the distance of a point to the line
-    error = lambda x, y: abs((p2[1]-p1[1])*x - (p2[0]-p1[0])*y + p2[0]*p1[1] - p2[1]*p1[0])
-
-    i, j = i1, j1
-    sites = [i + j*system.nx]
-    X = [0]
-    icoord = [i]
-    jcoord = [j]
-
-
-    for _ in range(Dx + Dy):
-        e1 = error(system.xpts[i], system.ypts[j+incy])
-        e2 = error(system.xpts[i+incx], system.ypts[j])
-        if incx == 0:
-            condition = e1 <= e2 # for lines x = constant
-        else:
-            condition = e1 < e2
-        if condition:
-            # if j went over the edge, break
-            if j == system.ny - 1:
-                break
-            X.append(X[-1] + system.dy[j])
-            j += incy
-        else:
-            # if i went over the edge, break
-            if i == system.nx - 1:
-                break
-            X.append(X[-1] + system.dx[i])
-            i += incx
-        sites.append(i + j*system.nx)
-        icoord.append(i)
-        jcoord.append(j)
+    # points p1 and p2. Returns the sites, the distance X along the path, and
+    # the indices of the sites in the x and y directions.
+    path = _line_paths(system, [(p1[:2], p2[:2])])[0]
+    i, j, step_y = path
 
+    # the walk stops at the edges of the system
+    edge = np.where(step_y, j[:-1] == system.ny - 1, i[:-1] == system.nx - 1)
+    if edge.any():
+        n = np.argmax(edge)
+        i, j, step_y = i[:n+1], j[:n+1], step_y[:n]
 
-    sites = np.asarray(sites)
-    X = np.asarray(X)
-    return sites, X, icoord, jcoord
+    dl = np.where(step_y, system.dy[j[:-1]], system.dx[np.minimum(i[:-1], \
+                                                    system.nx - 2)])
+    X = np.concatenate(([0], np.cumsum(dl)))
+    sites = i + j*system.nx
+    return sites, X, i, j
 
 
 def get_point_defects_sites(system, location):
     # find the site closest to a given point
     xa = location
-    ia, _, _ = get_indices(system, (xa, 0, 0))
+    ia, _ = get_indices(system, (xa, 0, 0))
     sites = ia
     perp_dl = system.dx[ia]
     return sites, perp_dl
 
 
-
 def get_line_defects_sites(system, location):
     # find the sites closest to the straight line defined by
-    # (xa,ya,za) and (xb,yb,zb) 
-
-    xa, ya = location[0]
-    xb, yb = location[1]
-    ia, ja = get_indices(system, (xa, ya, 0))
-    ib, jb = get_indices(system, (xb, yb, 0))
-
-    Dx = abs(ib - ia)    # distance to travel in X
-    Dy = abs(jb - ja)    # distance to travel in Y
-    if ia < ib:
-        incx = 1           # x will increase at each step
-    elif ia > ib:
-        incx = -1          # x will decrease at each step
-    else:
-        incx = 0
-    if ja < jb:
-        incy = 1           # y will increase at each step
-    elif ja > jb:
-        incy = -1          # y will decrease at each step
-    else:
-        incy = 0
+    # (xa,ya,za) and (xb,yb,zb), or to the polyline defined by more points
+    return get_lines_defects_sites(system, [location])[0]
+
+
+def get_lines_defects_sites(system, locations):
+    # Sites and perpendicular lattice distances of many line defects at once.
+    # Each location is a list of two or more points (x, y): a straight line or
+    # a polyline. The vertices shared by consecutive segments are counted once,
+    # as well as the sites visited twice around the sharp corners of a
+    # polyline.
+    sites, perp_dl, owner = _rasterize(system, locations)
+    polyline = np.array([len(points) > 2 for points in locations], dtype=bool)
+    _, first = np.unique(owner * system.nx * system.ny + sites,
+                         return_index=True)
+    keep = ~polyline[owner]
+    keep[first] = True
+    sites, perp_dl, owner = sites[keep], perp_dl[keep], owner[keep]
+    bounds = np.cumsum(np.bincount(owner, minlength=len(locations)))[:-1]
+    return list(zip(np.split(sites, bounds), np.split(perp_dl, bounds)))
+
+
+def get_boundaries_sites(system, boundaries):
+    # Sites of a set of polylines (grain boundaries) merged in a single list:
+    # the sites shared by several polylines are counted once, with the
+    # perpendicular lattice distance of the first of them. Returns the sites,
+    # the perpendicular lattice distances and the index of the polyline of
+    # each site.
+    sites, perp_dl, owner = _rasterize(system, boundaries)
+    _, first = np.unique(sites, return_index=True)
+    first = np.sort(first)
+    return sites[first], perp_dl[first], owner[first]
+
+
+def get_plane_defects_sites(system, location):
+    # find the sites closest to the plane parallel to the z-axis and containing
+    # the straight line defined by (xa,ya) and (xb,yb)
+    sites, perp_dl = get_line_defects_sites(system, location)
+    return extrude_sites(system, sites, perp_dl)
+
+
+def extrude_sites(system, sites, perp_dl):
+    # sites of all the layers of a three-dimensional system above the sites of
+    # the plane (x, y)
+    layers = system.nx * system.ny * np.arange(system.nz)
+    sites = (np.asarray(sites)[None, :] + layers[:, None]).flatten()
+    perp_dl = np.tile(perp_dl, system.nz)
+    return sites, perp_dl
 
-    # take the numerator of the distance of a point to the line
-    error = lambda x, y: abs((yb-ya)*x - (xb-xa)*y + xb*ya - yb*xa)
 
-    i, j = ia, ja
-    perp_dl = []
-    sites = [i + j*system.nx]
-    for _ in range(Dx + Dy):
-        e1 = error(system.xpts[i], system.ypts[j+incy])
-        e2 = error(system.xpts[i+incx], system.ypts[j])
+def get_defect_segments(location):
+    # Segments ((xa, ya), (xb, yb)) of the location of a defect: a line, a
+    # polyline or a list of polylines. Point defects have no segment.
+    if isinstance(location, float):
+        return []
+    polylines = [location] if np.isscalar(location[0][0]) else location
+    return [(pa, pb) for points in polylines \
+                     for pa, pb in zip(points[:-1], points[1:])]
+
+
+def voronoi_boundaries(system, voronoi):
+    # Edges of a two-dimensional Voronoi tessellation (scipy.spatial.Voronoi)
+    # clipped to the system. The unbounded edges are extended beyond the
+    # system as in scipy.spatial.voronoi_plot_2d.
+    vertices = voronoi.vertices
+    ridges = np.asarray(voronoi.ridge_vertices)
+    points = np.asarray(voronoi.ridge_points)
+    xmin, xmax = system.xpts[0], system.xpts[-1]
+    ymin, ymax = system.ypts[0], system.ypts[-1]
+    far = 2 * max(xmax - xmin, ymax - ymin, np.ptp(voronoi.points, axis=0).max())
+
+    finite = np.all(ridges >= 0, axis=1)
+    pa = vertices[ridges[:, 0]].copy()
+    pb = vertices[ridges[:, 1]].copy()
+
+    # unbounded edges: from the finite vertex, away from the center
+    t = voronoi.points[points[:, 1]] - voronoi.points[points[:, 0]]
+    normal = np.column_stack((-t[:, 1], t[:, 0]))
+    normal /= np.linalg.norm(normal, axis=1)[:, None]
+    middle = voronoi.points[points].mean(axis=1)
+    center = voronoi.points.mean(axis=0)
+    direction = np.sign(np.sum((middle - center) * normal, axis=1))[:, None] \
+                * normal
+    vertex = vertices[np.max(ridges, axis=1)]
+    pa[~finite] = vertex[~finite]
+    pb[~finite] = vertex[~finite] + far * direction[~finite]
+
+    # Liang-Barsky clipping of all the edges
+    d = pb - pa
+    t0, t1 = np.zeros(len(d)), np.ones(len(d))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for p, q in ((-d[:, 0], pa[:, 0] - xmin), (d[:, 0], xmax - pa[:, 0]),
+                     (-d[:, 1], pa[:, 1] - ymin), (d[:, 1], ymax - pa[:, 1])):
+            r = q / p
+            t0 = np.where(p < 0, np.maximum(t0, r), t0)
+            t1 = np.where(p > 0, np.minimum(t1, r), t1)
+            t1 = np.where((p == 0) & (q < 0), -1, t1)
+    inside = t0 < t1
+    start = pa + t0[:, None] * d
+    end = pa + t1[:, None] * d
+    return [[tuple(a), tuple(b)] for a, b in zip(start[inside], end[inside])]
+
+
+def _rasterize(system, locations):
+    # Sites, perpendicular lattice distances and index of the location for the
+    # sites of all the segments of the polylines in locations. The first site
+    # of a segment is dropped when it is the last site of the previous segment
+    # of the same polyline.
+    segments, owner, first = [], [], []
+    for idx, points in enumerate(locations):
+        for k, (pa, pb) in enumerate(zip(points[:-1], points[1:])):
+            segments.append((pa, pb))
+            owner.append(idx)
+            first.append(k == 0)
+    paths = _line_paths(system, segments)
+    if len(paths) == 0:
+        empty = np.zeros((0,), dtype=int)
+        return empty, np.zeros((0,)), empty
+
+    nx = system.nx
+    i = np.concatenate([p[0] for p in paths])
+    j = np.concatenate([p[1] for p in paths])
+    step_y = np.concatenate([p[2] for p in paths])
+    count = np.array([len(p[2]) for p in paths])
+    start = np.cumsum(count + 1) - count - 1
+    end = start + count
+
+    # perpendicular distances of the steps, given to the site before the step
+    # y steps: average of the lattice distances around the column
+    # x steps: we've assumed abrupt boundary conditions along y-direction!
+    after = np.ones(len(i), dtype=bool)
+    after[start] = False
+    ia, ja = i[after], j[after]
+    perp_dl = np.empty((len(i),))
+    perp_dl[np.flatnonzero(after) - 1] = np.where(step_y, \
+            (system.dx[np.minimum(ia, nx-2)] + system.dx[ia - 1]) / 2.,
+            system.dy[ja - 1])
+    # last site: same as the one before, unless the segment is a point
+    perp_dl[end] = np.where(count > 0, perp_dl[end - 1], system.dy[j[end] - 1])
+
+    keep = np.ones(len(i), dtype=bool)
+    keep[start[~np.array(first, dtype=bool)]] = False
+    owner = np.repeat(owner, count + 1)
+    return (i + j*nx)[keep], perp_dl[keep], owner[keep]
+
+
+def _line_paths(system, lines):
+    # Digital lines of the segments ((xa, ya), (xb, yb)): for each segment, the
+    # indices (i, j) of the sites of the path, and whether each step is made
+    # in the y-direction (True) or in the x-direction (False).
+    #
+    # Starting from the site of the first point, each step goes to the
+    # neighbor (in the direction of the second point) closest to the line. The
+    # distance to the line is a sum A_i + B_j of monotonous terms, so that a
+    # step in y is made when the middle of the next y-edge is closer than the
+    # middle of the next x-edge, measured along the line. The path is thus the
+    # merge of the sorted x-edges and y-edges of all segments, computed with
+    # a single sort. The choices are checked against the original step by
+    # step criterion, which is used instead for the segments where rounding
+    # errors make a difference.
+    xpts, ypts = system.xpts, system.ypts
+    nx, ny = len(xpts), len(ypts)
+    lines = np.asarray(lines, dtype=float).reshape(-1, 2, 2)
+    m = len(lines)
+    xa, ya = lines[:, 0, 0], lines[:, 0, 1]
+    xb, yb = lines[:, 1, 0], lines[:, 1, 1]
+    ia = np.searchsorted(xpts, xa)
+    ja = np.searchsorted(ypts, ya)
+    ib = np.searchsorted(xpts, xb)
+    jb = np.searchsorted(ypts, yb)
+    incx, incy = np.sign(ib - ia), np.sign(jb - ja)
+    nsteps = np.abs(ib - ia) + np.abs(jb - ja)
+
+    # orientation of the distance to the line, so that it increases with
+    # the steps in x and decreases with the steps in y
+    a, b, c = yb - ya, xb - xa, xb*ya - yb*xa
+    orient = np.sign(a * incx)
+
+    def edges(start, inc, n, pts):
+        # edges available from start in the direction inc (at most nsteps)
+        count = np.where(inc > 0, n - 1 - start, np.where(inc < 0, start, 0))
+        count = np.minimum(count, nsteps)
+        line = np.repeat(np.arange(m), count)
+        k = np.arange(len(line)) - np.repeat(np.cumsum(count) - count, count)
+        first = start[line] + inc[line] * k
+        return line, k, (pts[first] + pts[first + inc[line]]) / 2.
+
+    lx, kx, mx = edges(ia, incx, nx, xpts)
+    ly, ky, my = edges(ja, incy, ny, ypts)
+    keys = np.concatenate((orient[lx] * (a[lx] * mx + c[lx]),
+                           orient[ly] * b[ly] * my))
+    line = np.concatenate((lx, ly))
+    step_y = np.concatenate((np.zeros(len(lx), dtype=bool),
+                             np.ones(len(ly), dtype=bool)))
+    k = np.concatenate((kx, ky))
+
+    # merge per segment (x first for equal keys), and keep nsteps steps
+    order = np.lexsort((k, step_y, keys, line))
+    line, step_y = line[order], step_y[order]
+    count = np.bincount(line, minlength=m)
+    rank = np.arange(len(line)) - np.repeat(np.cumsum(count) - count, count)
+    keep = rank < nsteps[line]
+    line, step_y = line[keep], step_y[keep]
+    count = np.bincount(line, minlength=m)
+
+    # indices of the sites before each step
+    di = np.where(step_y, 0, incx[line])
+    dj = np.where(step_y, incy[line], 0)
+    offset = np.repeat(np.cumsum(count) - count, count)
+    i = ia[line] + np.cumsum(di) - di - (np.cumsum(di) - di)[offset]
+    j = ja[line] + np.cumsum(dj) - dj - (np.cumsum(dj) - dj)[offset]
+
+    # step by step criterion, where both neighbors exist
+    valid = (j + incy[line] >= 0) & (j + incy[line] < ny) & \
+            (i + incx[line] >= 0) & (i + incx[line] < nx)
+    iv, jv, lv = i[valid], j[valid], line[valid]
+    e1 = _distance(lines[lv].transpose(1, 2, 0), xpts[iv], ypts[jv + incy[lv]])
+    e2 = _distance(lines[lv].transpose(1, 2, 0), xpts[iv + incx[lv]], ypts[jv])
+    condition = np.where(incx[lv] == 0, e1 <= e2, e1 < e2)
+    wrong = set(lv[condition != step_y[valid]])
+
+    bounds = np.cumsum(count)[:-1]
+    paths = []
+    for idx, (sy, si, sj) in enumerate(zip(np.split(step_y, bounds),
+                                           np.split(di, bounds),
+                                           np.split(dj, bounds))):
+        if idx in wrong:
+            paths.append(_walk_line(system, lines[idx], ia[idx], ja[idx],
+                                    nsteps[idx], incx[idx], incy[idx]))
+            continue
+        i = np.concatenate(([ia[idx]], ia[idx] + np.cumsum(si)))
+        j = np.concatenate(([ja[idx]], ja[idx] + np.cumsum(sj)))
+        paths.append((i, j, sy))
+    return paths
+
+
+def _distance(line, x, y):
+    # numerator of the distance of a point to the line
+    (xa, ya), (xb, yb) = line
+    return abs((yb-ya)*x - (xb-xa)*y + xb*ya - yb*xa)
+
+
+def _walk_line(system, line, i, j, nsteps, incx, incy):
+    # Path of a digital line computed step by step
+    xpts, ypts = system.xpts, system.ypts
+    icoord, jcoord, step_y = [i], [j], []
+    for _ in range(nsteps):
+        e1 = _distance(line, xpts[i], ypts[j+incy])
+        e2 = _distance(line, xpts[i+incx], ypts[j])
         if incx == 0:
             condition = e1 <= e2 # for lines x = constant
         else:
             condition = e1 < e2
         if condition:
             j += incy
-            perp_dl.append((system.dx[i] + system.dx[i-1])/2.)  
         else:
             i += incx
-            if (len(system.dy) < j):
-                perp_dl.append((system.dy[j] + system.dy[j - 1]) / 2.)
-            else:
-                # we've assumed abrupt boundary conditions along y-direction!
-                perp_dl.append(system.dy[j - 1])
-        sites.append(i + j*system.nx)
-    perp_dl.append(perp_dl[-1])
-    perp_dl = np.asarray(perp_dl)
-    return sites, perp_dl
+        icoord.append(i)
+        jcoord.append(j)
+        step_y.append(condition)
+    return np.array(icoord), np.array(jcoord), np.array(step_y, dtype=bool)
 
 
-def save_sim(sys, result, filename, fmt='npy'):
+def save_sim(sys, result, filename, fmt='npy', compression='gzip', level=None):
     """
     Utility function that saves a system together with simulation results.
 
@@ -197,44 +449,74 @@ def save_sim(sys, result, filename, fmt='npy'):
     fmt: string
         Format of output file, set to 'mat' for matlab files. With the default
         numpy format, the Builder object is saved directly.
+    compression: string
+        Codec of the file with the default format: ``gzip`` (default),
+        ``bzip2``, ``lzma`` or ``none``.
+    level: integer
+        Compression level, the default of the codec if None.
     """
 
     if fmt=='mat':
-        if sys.dimension == 1:
-            system = {'xpts': sys.xpts, 'Eg': sys.Eg, 'Nc': sys.Nc, 'Nv': sys.Nv, \
-                  'affinity': sys.bl, 'epsilon': sys.epsilon, 'g': sys.g, 'mu_e': sys.mu_e, 'mu_h': sys.mu_h, \
-                  'm_e': sys.mass_e, 'm_h': sys.mass_h, 'tau_e': sys.tau_e, 'tau_h': sys.tau_h, \
-                  'B': sys.B, 'Cn': sys.Cn, 'Cp': sys.Cp, 'n1': sys.n1, 'p1': sys.p1, 'ni': sys.ni, 'rho': sys.rho}
-        if sys.dimension==2:
-            system = {'xpts': sys.xpts, 'ypts': sys.ypts}
-            result['v'] = np.reshape(result['v'], (sys.ny, sys.nx))
-            result['efn'] = np.reshape(result['efn'], (sys.ny, sys.nx))
-            result['efp'] = np.reshape(result['efp'], (sys.ny, sys.nx))
-            for attr in dir(sys):
-                tfield = getattr(sys, attr)
-                # determine if element is an array of proper size
-                if type(tfield) is np.ndarray:
-                    if(np.size(tfield) == sys.nx*sys.ny):
-                        tdata = np.reshape(tfield, (sys.ny, sys.nx))
-                        system.update({attr: tdata})
-        if sys.dimension==3:
-            system = {'xpts': sys.xpts, 'ypts': sys.ypts, 'zpts': sys.zpts}
-
-
-        savemat(filename, {'sys': system, 'results': result}, do_compression=True)
+        savemat(filename, mat_data(sys, result), do_compression=True)
     else:
-        file = gzip.GzipFile(filename, 'wb')
-        file.write(pickle.dumps((sys, result)))
-        file.close()
+        dump(pickle.dumps((sys, result)), filename, compression, level)
+
+def mat_data(sys, result):
+    """
+    Arrays of a system and of a solution saved by :func:`save_sim` in Matlab
+    files.
+
+    Parameters
+    ----------
+    sys: Builder
+        The discretized system.
+    result: dictionary
+        Dictionary of solution, containing 'v', 'efn', 'efp'
+
+    Returns
+    -------
+    data: dictionary
+        Dictionary with keys 'sys' and 'results' of dictionaries of arrays,
+        copied from the system and the solution. Two-dimensional arrays are
+        reshaped as (ny, nx).
+    """
 
-def load_sim(filename):
+    result = {key: np.array(value) for key, value in result.items()}
+    if sys.dimension == 1:
+        system = {'xpts': sys.xpts, 'Eg': sys.Eg, 'Nc': sys.Nc, 'Nv': sys.Nv, \
+              'affinity': sys.bl, 'epsilon': sys.epsilon, 'g': sys.g, 'mu_e': sys.mu_e, 'mu_h': sys.mu_h, \
+              'm_e': sys.mass_e, 'm_h': sys.mass_h, 'tau_e': sys.tau_e, 'tau_h': sys.tau_h, \
+              'B': sys.B, 'Cn': sys.Cn, 'Cp': sys.Cp, 'n1': sys.n1, 'p1': sys.p1, 'ni': sys.ni, 'rho': sys.rho}
+    if sys.dimension==2:
+        system = {'xpts': sys.xpts, 'ypts': sys.ypts}
+        result['v'] = np.reshape(result['v'], (sys.ny, sys.nx))
+        result['efn'] = np.reshape(result['efn'], (sys.ny, sys.nx))
+        result['efp'] = np.reshape(result['efp'], (sys.ny, sys.nx))
+        for attr in dir(sys):
+            tfield = getattr(sys, attr)
+            # determine if element is an array of proper size
+            if type(tfield) is np.ndarray:
+                if(np.size(tfield) == sys.nx*sys.ny):
+                    tdata = np.reshape(tfield, (sys.ny, sys.nx))
+                    system.update({attr: tdata})
+    if sys.dimension==3:
+        system = {'xpts': sys.xpts, 'ypts': sys.ypts, 'zpts': sys.zpts}
+    system = {key: np.array(value) for key, value in system.items()}
+
+    return {'sys': system, 'results': result}
+
+def load_sim(filename, index=0):
     """
     Utility function that loads a system together with simulation results.
 
     Parameters
     ----------
     filename: string
-        Name of inputfile
+        Name of inputfile, saved by :func:`save_sim`,
+        :func:`sesame.store.save_raw` or a sweep store (see
+        :class:`sesame.store.SweepStore`).
+    index: integer
+        Index of the solution to load from a sweep store, ignored otherwise.
 
     Returns
     -------
@@ -246,10 +528,8 @@ def load_sim(filename):
         'efp', and/or 'v'.
     """
 
-    f = gzip.GzipFile(filename, 'rb')
-    data = f.read()
-    sys, result = pickle.loads(data)
-    return sys, result
+    sim = SimFile(filename, index, shared=False)
+    return sim.system, sim.result
 
 
 def check_equal_sim_settings(system1, system2):
@@ -0,0 +1,259 @@
+# Copyright 2017 University of Maryland.
+#
+# This file is part of Sesame. It is subject to the license terms in the file
+# LICENSE.rst found in the top-level directory of this distribution.
+
+import numpy as np
+import json
+import os
+import time
+import uuid
+import scipy.constants as cts
+
+from .store import fingerprint
+
+import logging
+
+__all__ = ['SolutionDatabase']
+
+
+def _operating_point(system, voltage):
+    # descriptors of the operating point: applied voltage [V], decades of the
+    # maximum generation rate [cm^-3 s^-1], temperature [K]
+    g = np.max(system.g) * system.scaling.generation if np.size(system.g) else 0
+    T = system.scaling.energy * cts.e / cts.k
+    return [float(voltage), float(np.log10(1 + max(g, 0))), float(T)]
+
+
+def _right_contact(system):
+    # sites of the right contact and sign of the applied voltage, as in
+    # Solver.IVcurve
+    nx = system.nx
+    sites = np.arange(system.ny * system.nz, dtype=int) * nx + nx - 1
+    q = 1 if system.rho[nx-1] < 0 else -1
+    return sites, q
+
+
+class SolutionDatabase():
+    """
+    Persistent database of converged solutions used as starting points of the
+    solver.
+
+    Solutions are stored with the fingerprint of the system (see
+    :func:`~sesame.store.fingerprint`, the generation rate excluded) and the
+    descriptors of their operating point: applied voltage, generation rate and
+    temperature. For a new operating point of the same system, the database
+    returns the nearest stored solution, or the linear interpolation of the two
+    nearest solutions when the operating point lies between them (e.g. a
+    voltage between two stored voltages). The potential of the right contact
+    is set to the applied voltage requested.
+
+    The distance between operating points is measured in units of
+    ``scales``: 0.1 V for the voltage, one decade of the maximum generation
+    rate, and 10 K for the temperature. Note that the dimensionless
+    parameters of a system depend on the temperature, so that systems built at
+    different temperatures have different fingerprints: give the same ``key``
+    to share their solutions.
+
+    When the size of the solutions exceeds ``max_size``, the least recently
+    used solutions are removed.
+
+    Parameters
+    ----------
+    path: string
+        Directory of the database, created if needed.
+    max_size: integer
+        Maximum size of the stored solutions [bytes].
+    enabled: boolean
+        Set to False to disable the database: no solution is stored nor
+        returned. The attribute ``enabled`` can be changed at any time.
+
+    Examples
+    --------
+    >>> db = sesame.SolutionDatabase('~/.sesame/solutions')
+    >>> solver = sesame.solvers.Solver(database=db)
+    >>> solver.solve(sys, 'Poisson')
+    >>> J = solver.IVcurve(sys, voltages, 'IV')  # stores the solutions
+    >>> guess = db.guess(sys, voltage=0.35)
+    >>> result = solver.solve(sys, guess=guess)
+    """
+
+    scales = (0.1, 1., 10.)
+
+    def __init__(self, path, max_size=256*2**20, enabled=True):
+        self.path = os.path.expanduser(path)
+        self.max_size = max_size
+        self.enabled = enabled
+        os.makedirs(self.path, exist_ok=True)
+        self._index = os.path.join(self.path, 'index.json')
+        self._entries = []
+        self._mtime = None
+
+    def _read_index(self):
+        # entries of the database, read again if modified by another instance
+        try:
+            mtime = os.stat(self._index).st_mtime_ns
+        except OSError:
+            self._entries, self._mtime = [], None
+            return self._entries
+        if mtime != self._mtime:
+            with open(self._index, 'r') as f:
+                self._entries = json.load(f)
+            self._mtime = mtime
+        return self._entries
+
+    def _write_index(self, entries):
+        tmp = self._index + '.part'
+        with open(tmp, 'w') as f:
+            json.dump(entries, f)
+        os.replace(tmp, self._index)
+        self._entries = entries
+        self._mtime = os.stat(self._index).st_mtime_ns
+
+    def _remove(self, entry):
+        try:
+            os.remove(os.path.join(self.path, entry['file']))
+        except OSError:
+            pass
+
+    def __len__(self):
+        return len(self._read_index())
+
+    def key(self, system):
+        """
+        Fingerprint of a system, independent of its generation rate.
+
+        Parameters
+        ----------
+        system: Builder
+            The discretized system.
+        """
+        return fingerprint(system, exclude=('g', 'gtot'))
+
+    def add(self, system, solution, voltage=0, key=None):
+        """
+        Store a converged solution.
+
+        A solution already stored for the same system and operating point is
+        replaced.
+
+        Parameters
+        ----------
+        system: Builder
+            The discretized system.
+        solution: dictionary
+            Dictionary of the solution, containing 'v', 'efn', 'efp'.
+        voltage: float
+            Voltage applied on the right contact [V].
+        key: string
+            Identifier of the system, its fingerprint by default.
+        """
+        if not self.enabled:
+            return
+        if key is None:
+            key = self.key(system)
+        point = _operating_point(system, voltage)
+
+        name = uuid.uuid4().hex + '.npz'
+        filename = os.path.join(self.path, name)
+        with open(filename + '.part', 'wb') as f:
+            np.savez(f, **{k: np.asarray(solution[k]) for k in ('efn', 'efp', 'v')})
+        os.replace(filename + '.part', filename)
+
+        entries = []
+        for entry in self._read_index():
+            if entry['key'] == key and entry['point'] == point:
+                self._remove(entry)
+            else:
+                entries.append(entry)
+        entries.append({'key': key, 'point': point, 'file': name,
+                        'sites': int(np.size(solution['v'])),
+                        'size': os.path.getsize(filename), 'used': time.time()})
+
+        # remove the least recently used solutions
+        entries.sort(key=lambda entry: entry['used'])
+        size = sum(entry['size'] for entry in entries)
+        while entries and size > self.max_size:
+            entry = entries.pop(0)
+            size -= entry['size']
+            self._remove(entry)
+        self._write_index(entries)
+
+    def guess(self, system, voltage=0, key=None, within=np.inf):
+        """
+        Starting point of the solver for an operating point.
+
+        Parameters
+        ----------
+        system: Builder
+            The discretized system, with the generation rate of the operating
+            point.
+        voltage: float
+            Voltage applied on the right contact [V].
+        key: string
+            Identifier of the system, its fingerprint by default.
+        within: float
+            Maximum distance between the operating point and the nearest
+            stored solution, in units of ``scales``. An interpolation between
+            two solutions is always accepted.
+
+        Returns
+        -------
+        guess: dictionary
+            Dictionary containing the arrays 'efn', 'efp', 'v', or None if no
+            solution of the system is stored within the given distance.
+        """
+        if not self.enabled:
+            return None
+        if key is None:
+            key = self.key(system)
+        N = system.nx * system.ny * system.nz
+        entries = [entry for entry in self._read_index()
+                   if entry['key'] == key and entry['sites'] == N]
+        if len(entries) == 0:
+            return None
+
+        point = np.array(_operating_point(system, voltage))
+        P = np.array([entry['point'] for entry in entries])
+        dist = np.linalg.norm((P - point) / self.scales, axis=1)
+        order = np.argsort(dist, kind='stable')
+        used = [entries[order[0]]]
+        weights = [1.]
+
+        # interpolation if the operating point lies between the two nearest
+        # solutions
+        if len(entries) > 1 and dist[order[0]] > 0:
+            u = (P[order[1]] - P[order[0]]) / self.scales
+            w = (point - P[order[0]]) / self.scales
+            t = w.dot(u) / u.dot(u)
+            if 0 < t < 1 and np.linalg.norm(w - t * u) <= 1e-6 * np.linalg.norm(u):
+                used.append(entries[order[1]])
+                weights = [1 - t, t]
+        if len(used) == 1 and dist[order[0]] > within:
+            return None
+
+        guess = {k: np.zeros((N,)) for k in ('efn', 'efp', 'v')}
+        stored_voltage = 0
+        for entry, weight in zip(used, weights):
+            try:
+                with np.load(os.path.join(self.path, entry['file'])) as data:
+                    for k in guess:
+                        guess[k] += weight * data[k]
+            except (IOError, OSError, KeyError):
+                logging.warning("The stored solution {0} could not be read."\
+                                .format(entry['file']))
+                return None
+            stored_voltage += weight * entry['point'][0]
+            entry['used'] = time.time()
+        self._write_index(self._entries)
+
+        # voltage applied on the right contact
+        sites, q = _right_contact(system)
+        guess['v'][sites] += q * (voltage - stored_voltage) / system.scaling.energy
+        return guess
+
+    def clear(self):
+        """Remove all the stored solutions."""
+        for entry in self._read_index():
+            self._remove(entry)
+        self._write_index([])
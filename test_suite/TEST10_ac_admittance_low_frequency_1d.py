@@ -0,0 +1,67 @@
+import sesame
+import numpy as np
+
+def runTest10():
+
+    L = 3e-4 # length of the system in the x-direction [cm]
+
+    # Mesh
+    x = np.concatenate((np.linspace(0,1.2e-4, 100, endpoint=False),
+                        np.linspace(1.2e-4, L, 50)))
+
+    # Create a system
+    sys = sesame.Builder(x)
+
+    # Dictionary with the material parameters
+    material = {'Nc':8e17, 'Nv':1.8e19, 'Eg':1.5, 'affinity':3.9, 'epsilon':9.4,
+            'mu_e':100, 'mu_h':100, 'tau_e':10e-9, 'tau_h':10e-9, 'Et':0}
+    sys.add_material(material)
+
+    junction = 50e-7 # extent of the junction from the left contact [cm]
+    sys.add_donor(1e17, lambda x: x < junction)
+    sys.add_acceptor(1e15, lambda x: x >= junction)
+
+    sys.contact_type('Ohmic', 'Ohmic')
+    sys.contact_S(1e7, 0, 0, 1e7)
+
+    phi = 1e17         # photon flux [1/(cm^2 s)]
+    alpha = 2.3e4      # absorption coefficient [1/cm]
+    sys.generation(lambda x, y: phi * alpha * np.exp(-alpha * x))
+
+    solver = sesame.solvers.Solver()
+    solution = solver.solve(sys, compute='Poisson', verbose=False)
+    veq = np.copy(solution['v'])
+
+    # sign of the voltage to apply on the right contact
+    nx = sys.nx
+    q = 1 if sys.rho[nx-1] < 0 else -1
+
+    def steady_state(voltage, guess):
+        guess = {key: np.copy(value) for key, value in guess.items()}
+        guess['v'][nx-1] = veq[nx-1] + q * voltage / sys.scaling.energy
+        return solver.solve(sys, guess=guess, tol=1e-10, verbose=False)
+
+    def current(solution):
+        return sesame.Analyzer(sys, solution).full_current() * sys.scaling.current
+
+    # steady state in forward bias
+    for voltage in np.linspace(0.1, 0.6, 6):
+        solution = steady_state(voltage, solution)
+
+    # derivative of the current with respect to the forward voltage, counted
+    # negative by full_current for this system
+    h = 1e-3
+    dJdV = (current(steady_state(0.6 + h, solution))
+            - current(steady_state(0.6 - h, solution))) / (2 * h)
+
+    # the admittance at low frequencies reduces to the differential
+    # conductance
+    result = sesame.ac_analysis(sys, solution, [0, 1e3])
+    Y = result['admittance']
+    errors = [np.abs(Y[0] + dJdV) / np.abs(dJdV),
+              np.abs(Y[1].real + dJdV) / np.abs(dJdV)]
+    if not result['capacitance'][1] > 0:
+        errors.append(1.)
+
+    error = max(errors)
+    print("error = {0}".format(error))
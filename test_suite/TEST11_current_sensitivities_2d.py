@@ -0,0 +1,63 @@
+import sesame
+import numpy as np
+
+def system(tau=1e-8, dos=1e11, sigma=1e-15):
+    L = 3e-4 # length of the system in the x-direction [cm]
+    Ly = 3e-4 # length of the system in the y-direction [cm]
+
+    # Mesh
+    x = np.concatenate((np.linspace(0,1.2e-4, 60, endpoint=False),
+                        np.linspace(1.2e-4, L, 30)))
+    y = np.linspace(0, Ly, 10)
+
+    # Create a system
+    sys = sesame.Builder(x, y)
+
+    # Dictionary with the material parameters
+    material = {'Nc':8e17, 'Nv':1.8e19, 'Eg':1.5, 'affinity':3.9, 'epsilon':9.4,
+            'mu_e':100, 'mu_h':100, 'tau_e':tau, 'tau_h':tau, 'Et':0}
+    sys.add_material(material)
+
+    junction = 50e-7 # extent of the junction from the left contact [cm]
+    sys.add_donor(1e17, lambda pos: pos[0] < junction)
+    sys.add_acceptor(1e15, lambda pos: pos[0] >= junction)
+
+    sys.contact_type('Ohmic', 'Ohmic')
+    sys.contact_S(1e7, 0, 0, 1e7)
+
+    # grain boundary along the x-direction
+    sys.add_defects([(20e-7, Ly/2), (L, Ly/2)], dos, sigma, E=0.1)
+
+    phi = 1e17         # photon flux [1/(cm^2 s)]
+    alpha = 2.3e4      # absorption coefficient [1/cm]
+    sys.generation(lambda x, y: phi * alpha * np.exp(-alpha * x))
+
+    return sys
+
+def runTest11():
+
+    sys = system()
+    solver = sesame.solvers.Solver()
+    solution = solver.solve(sys, compute='Poisson', verbose=False)
+    solution = solver.solve(sys, guess=solution, tol=1e-10, verbose=False)
+
+    result = sesame.current_sensitivities(sys, solution)
+
+    def current(**params):
+        perturbed = system(**params)
+        x = solver.solve(perturbed, guess=solution, tol=1e-10, verbose=False)
+        return sesame.Analyzer(perturbed, x).full_current()
+
+    # centered finite differences for a uniform change of the lifetimes, and
+    # changes of the density of states and of both cross sections of the
+    # grain boundary
+    h = 1e-4
+    fd = [(current(tau=1e-8*(1+h)) - current(tau=1e-8*(1-h))) / (2*h*1e-8),
+          (current(dos=1e11*(1+h)) - current(dos=1e11*(1-h))) / (2*h*1e11),
+          (current(sigma=1e-15*(1+h)) - current(sigma=1e-15*(1-h))) / (2*h*1e-15)]
+    defect = result['defects'][0]
+    adjoint = [np.sum(result['tau_e']) + np.sum(result['tau_h']),
+               defect['dos'], defect['sigma_e'] + defect['sigma_h']]
+
+    error = np.max(np.abs((np.array(adjoint) - fd) / np.array(fd)))
+    print("error = {0}".format(error))
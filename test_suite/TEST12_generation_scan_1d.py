@@ -0,0 +1,63 @@
+import sesame
+import numpy as np
+
+def runTest12():
+
+    L = 3e-4 # length of the system in the x-direction [cm]
+
+    # Mesh
+    x = np.concatenate((np.linspace(0,1.2e-4, 100, endpoint=False),
+                        np.linspace(1.2e-4, L, 50)))
+
+    # Create a system
+    sys = sesame.Builder(x)
+
+    # Dictionary with the material parameters
+    material = {'Nc':8e17, 'Nv':1.8e19, 'Eg':1.5, 'affinity':3.9, 'epsilon':9.4,
+            'mu_e':100, 'mu_h':100, 'tau_e':10e-9, 'tau_h':10e-9, 'Et':0}
+    sys.add_material(material)
+
+    junction = 50e-7 # extent of the junction from the left contact [cm]
+    sys.add_donor(1e17, lambda x: x < junction)
+    sys.add_acceptor(1e15, lambda x: x >= junction)
+
+    sys.contact_type('Ohmic', 'Ohmic')
+    sys.contact_S(1e7, 0, 0, 1e7)
+
+    # dark steady state
+    solver = sesame.solvers.Solver()
+    solution = solver.solve(sys, compute='Poisson', verbose=False)
+    solution = solver.solve(sys, guess=solution, tol=1e-10, verbose=False)
+    I0 = sesame.Analyzer(sys, solution).full_current()
+
+    # gaussian beams across the system, in the low injection regime
+    width = 0.1e-4
+    centers = np.linspace(0.2e-4, 2.8e-4, 5)
+    profiles = [lambda x, y, c=c: 1e19 * np.exp(-(x-c)**2 / (2*width**2)) \
+                for c in centers]
+
+    result = sesame.generation_scan(sys, profiles, solution=solution, check=0,
+                                    tol=1e-10, solver=solver)
+
+    # the generation of the system is kept, even when a profile fails
+    errors = []
+    g = np.copy(sys.g)
+    def failing(x, y):
+        raise ValueError("profile")
+    try:
+        sesame.generation_scan(sys, profiles[:2] + [failing], solution=solution,
+                               check=0, solver=solver)
+        errors.append(1.)
+    except ValueError:
+        pass
+    errors.append(np.max(np.abs(sys.g - g)))
+
+    # nonlinear solutions for all the beams
+    for idx, f in enumerate(profiles):
+        sys.generation(f)
+        x = solver.solve(sys, guess=solution, tol=1e-10, verbose=False)
+        I = sesame.Analyzer(sys, x).full_current()
+        errors.append(np.abs(result['current'][idx] - I) / np.abs(I - I0))
+
+    error = max(errors)
+    print("error = {0}".format(error))
@@ -0,0 +1,57 @@
+import sesame
+import numpy as np
+
+def runTest13():
+
+    L = 3e-4 # length of the system in the x-direction [cm]
+
+    # Mesh
+    x = np.concatenate((np.linspace(0,1.2e-4, 100, endpoint=False),
+                        np.linspace(1.2e-4, L, 50)))
+
+    # Create a system
+    sys = sesame.Builder(x)
+
+    # Dictionary with the material parameters
+    material = {'Nc':8e17, 'Nv':1.8e19, 'Eg':1.5, 'affinity':3.9, 'epsilon':9.4,
+            'mu_e':100, 'mu_h':100, 'tau_e':10e-9, 'tau_h':10e-9, 'Et':0}
+    sys.add_material(material)
+
+    junction = 50e-7 # extent of the junction from the left contact [cm]
+    sys.add_donor(1e17, lambda x: x < junction)
+    sys.add_acceptor(1e15, lambda x: x >= junction)
+
+    sys.contact_type('Ohmic', 'Ohmic')
+    sys.contact_S(1e7, 0, 0, 1e7)
+
+    # bias light
+    phi = 1e17         # photon flux [1/(cm^2 s)]
+    alpha = 2.3e4      # absorption coefficient [1/cm]
+    sys.generation(lambda x, y: phi * alpha * np.exp(-alpha * x))
+    g = np.copy(sys.g)
+
+    solver = sesame.solvers.Solver()
+    solution = solver.solve(sys, compute='Poisson', verbose=False)
+    solution = solver.solve(sys, guess=solution, tol=1e-10, verbose=False)
+    I0 = sesame.Analyzer(sys, solution).full_current()
+
+    # monochromatic probes
+    wavelengths = np.array([400., 600., 800.])
+    alphas = np.array([1e5, 2e4, 3e3])
+    flux = 1e15
+    result = sesame.eqe(sys, wavelengths, alphas, flux=flux, solution=solution,
+                        tol=1e-10, solver=solver)
+
+    # nonlinear solutions with the probes added to the bias light
+    errors = []
+    for idx, a in enumerate(alphas):
+        sys.g = g + a * flux * np.exp(-a * (sys.xpts - sys.xpts[0])) \
+                  / sys.scaling.generation
+        x = solver.solve(sys, guess=solution, tol=1e-10, verbose=False)
+        dI = np.abs(sesame.Analyzer(sys, x).full_current() - I0)
+        errors.append(np.abs(result['current'][idx] - dI) / dI)
+    if not np.all(result['eqe'] > 0):
+        errors.append(1.)
+
+    error = max(errors)
+    print("error = {0}".format(error))
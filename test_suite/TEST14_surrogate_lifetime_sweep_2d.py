@@ -0,0 +1,62 @@
+import sesame
+import numpy as np
+
+def system(tau):
+    L = 3e-4 # length of the system in the x-direction [cm]
+    Ly = 3e-4 # length of the system in the y-direction [cm]
+
+    # Mesh
+    x = np.concatenate((np.linspace(0,1.2e-4, 60, endpoint=False),
+                        np.linspace(1.2e-4, L, 30)))
+    y = np.linspace(0, Ly, 10)
+
+    # Create a system
+    sys = sesame.Builder(x, y)
+
+    # Dictionary with the material parameters
+    material = {'Nc':8e17, 'Nv':1.8e19, 'Eg':1.5, 'affinity':3.9, 'epsilon':9.4,
+            'mu_e':100, 'mu_h':100, 'tau_e':tau, 'tau_h':tau, 'Et':0}
+    sys.add_material(material)
+
+    junction = 50e-7 # extent of the junction from the left contact [cm]
+    sys.add_donor(1e17, lambda pos: pos[0] < junction)
+    sys.add_acceptor(1e15, lambda pos: pos[0] >= junction)
+
+    sys.contact_type('Ohmic', 'Ohmic')
+    sys.contact_S(1e7, 0, 0, 1e7)
+
+    # grain boundary along the x-direction
+    sys.add_defects([(20e-7, Ly/2), (L, Ly/2)], 1e11, 1e-15, E=0.1)
+
+    phi = 1e17         # photon flux [1/(cm^2 s)]
+    alpha = 2.3e4      # absorption coefficient [1/cm]
+    sys.generation(lambda x, y: phi * alpha * np.exp(-alpha * x))
+
+    return sys
+
+def runTest14():
+
+    solver = sesame.solvers.Solver()
+
+    def solve(sys):
+        solution = solver.solve(sys, compute='Poisson', verbose=False)
+        return solver.solve(sys, guess=solution, tol=1e-10, verbose=False)
+
+    # snapshots of a sweep of the bulk lifetime
+    rom = sesame.Surrogate()
+    for tau in [1e-9, 3e-9, 1e-8, 3e-8, 1e-7]:
+        sys = system(tau)
+        rom.add(sys, solve(sys))
+    rom.build()
+
+    # new lifetime solved with the surrogate only, and with the full solver
+    sys = system(5e-8)
+    solution = rom.solve(sys, refine=False)
+    reference = solve(sys)
+
+    if solution is None:
+        error = 1.
+    else:
+        error = max(np.max(np.abs(solution[key] - reference[key])) \
+                    for key in ('efn', 'efp', 'v'))
+    print("error = {0}".format(error))
@@ -0,0 +1,69 @@
+import sesame
+import numpy as np
+
+def system(nz=None):
+    L = 3e-4 # length of the system in the x-direction [cm]
+    Ly = 1e-4 # length of the system in the y-direction [cm]
+    Lz = 1e-4 # length of the system in the z-direction [cm]
+
+    # Mesh
+    x = np.concatenate((np.linspace(0,1.2e-4, 60, endpoint=False),
+                        np.linspace(1.2e-4, L, 30)))
+    y = np.linspace(0, Ly, 5)
+
+    # Create a 2D system, or a 3D system repeating it along z
+    if nz is None:
+        sys = sesame.Builder(x, y)
+    else:
+        sys = sesame.Builder(x, y, np.linspace(0, Lz, nz))
+
+    # Dictionary with the material parameters
+    material = {'Nc':8e17, 'Nv':1.8e19, 'Eg':1.5, 'affinity':3.9, 'epsilon':9.4,
+            'mu_e':100, 'mu_h':100, 'tau_e':10e-9, 'tau_h':10e-9, 'Et':0}
+    sys.add_material(material)
+
+    junction = 50e-7 # extent of the junction from the left contact [cm]
+    sys.add_donor(1e17, lambda pos: pos[0] < junction)
+    sys.add_acceptor(1e15, lambda pos: pos[0] >= junction)
+
+    sys.contact_type('Ohmic', 'Ohmic')
+    sys.contact_S(1e7, 0, 0, 1e7)
+
+    # grain boundary along the x-direction, a plane parallel to z in 3D
+    sys.add_defects([(20e-7, Ly/2), (L, Ly/2)], 1e11, 1e-15, E=0.1)
+
+    phi = 1e17         # photon flux [1/(cm^2 s)]
+    alpha = 2.3e4      # absorption coefficient [1/cm]
+    if nz is None:
+        sys.generation(lambda x, y: phi * alpha * np.exp(-alpha * x))
+    else:
+        sys.generation(lambda x, y, z: phi * alpha * np.exp(-alpha * x))
+
+    return sys
+
+def runTest15():
+
+    results = []
+    for nz in (None, 3):
+        sys = system(nz)
+        solver = sesame.solvers.Solver()
+        solution = solver.solve(sys, compute='Poisson', verbose=False)
+        solution = solver.solve(sys, guess=solution, tol=1e-10, verbose=False)
+        results.append((sys, solution))
+    (sys2, result2), (sys3, result3) = results
+
+    # every plane of the 3D solution is the 2D solution
+    errors = []
+    for key in ('efn', 'efp', 'v'):
+        planes = result3[key].reshape(sys3.nz, sys3.ny, sys3.nx)
+        errors.append(np.max(np.abs(planes - result2[key].reshape(sys2.ny, sys2.nx))))
+
+    # the 3D current is the 2D current (per unit length) times the extent of
+    # the system along z
+    J2 = sesame.Analyzer(sys2, result2).full_current()
+    J3 = sesame.Analyzer(sys3, result3).full_current()
+    J3 = J3 / (1e-4 / sys3.scaling.length)
+    errors.append(np.abs((J3 - J2) / J2))
+
+    error = max(errors)
+    print("error = {0}".format(error))
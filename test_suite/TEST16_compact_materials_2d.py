@@ -0,0 +1,65 @@
+import sesame
+import numpy as np
+
+def system(compact):
+    L = 3e-4 # length of the system in the x-direction [cm]
+    Ly = 3e-4 # length of the system in the y-direction [cm]
+
+    # Mesh
+    x = np.concatenate((np.linspace(0,1.2e-4, 60, endpoint=False),
+                        np.linspace(1.2e-4, L, 30)))
+    y = np.linspace(0, Ly, 10)
+
+    # Create a system
+    sys = sesame.Builder(x, y, compact=compact)
+
+    junction = 50e-7 # extent of the junction from the left contact [cm]
+    n_region = lambda pos: pos[0] < junction
+    p_region = lambda pos: pos[0] >= junction
+
+    # window layer and absorber, the absorber with a lifetime varying with
+    # the position
+    window = {'Nc':8e17, 'Nv':1.8e19, 'Eg':1.7, 'affinity':3.8, 'epsilon':9.4,
+            'mu_e':50, 'mu_h':50, 'tau_e':1e-9, 'tau_h':1e-9, 'Et':0}
+    absorber = {'Nc':8e17, 'Nv':1.8e19, 'Eg':1.5, 'affinity':3.9, 'epsilon':9.4,
+            'mu_e':100, 'mu_h':100, 'tau_h':10e-9, 'Et':0,
+            'tau_e':lambda pos: 1e-8 * (1 + pos[1] / Ly)}
+    sys.add_material(window, n_region)
+    sys.add_material(absorber, p_region)
+
+    sys.add_donor(1e17, n_region)
+    sys.add_acceptor(1e15, p_region)
+
+    sys.contact_type('Ohmic', 'Ohmic')
+    sys.contact_S(1e7, 0, 0, 1e7)
+
+    # grain boundary along the x-direction
+    sys.add_defects([(20e-7, Ly/2), (L, Ly/2)], 1e11, 1e-15, E=0.1)
+
+    phi = 1e17         # photon flux [1/(cm^2 s)]
+    alpha = 2.3e4      # absorption coefficient [1/cm]
+    sys.generation(lambda x, y: phi * alpha * np.exp(-alpha * x))
+
+    return sys
+
+def runTest16():
+
+    plain, compact = system(False), system(True)
+
+    # material parameters of the sites
+    errors = []
+    for name in sesame.builder.material_fields + ['rho', 'g']:
+        a, b = getattr(plain, name), getattr(compact, name)
+        errors.append(np.max(np.abs(a - b)) / np.max(np.abs(a) + 1e-300))
+
+    # steady states and currents
+    currents = []
+    for sys in (plain, compact):
+        solver = sesame.solvers.Solver()
+        solution = solver.solve(sys, compute='Poisson', verbose=False)
+        solution = solver.solve(sys, guess=solution, tol=1e-10, verbose=False)
+        currents.append(sesame.Analyzer(sys, solution).full_current())
+    errors.append(np.abs((currents[1] - currents[0]) / currents[0]))
+
+    error = max(errors)
+    print("error = {0}".format(error))
@@ -0,0 +1,71 @@
+import sesame
+import numpy as np
+
+def system(tau=1e-8, dos=1e11, phi=1e17, compact=False):
+    L = 3e-4 # length of the system in the x-direction [cm]
+    Ly = 3e-4 # length of the system in the y-direction [cm]
+
+    # Mesh
+    x = np.concatenate((np.linspace(0,1.2e-4, 60, endpoint=False),
+                        np.linspace(1.2e-4, L, 30)))
+    y = np.linspace(0, Ly, 10)
+
+    # Create a system
+    sys = sesame.Builder(x, y, compact=compact)
+
+    # Dictionary with the material parameters
+    material = {'Nc':8e17, 'Nv':1.8e19, 'Eg':1.5, 'affinity':3.9, 'epsilon':9.4,
+            'mu_e':100, 'mu_h':100, 'tau_e':tau, 'tau_h':tau, 'Et':0}
+    sys.add_material(material)
+
+    junction = 50e-7 # extent of the junction from the left contact [cm]
+    sys.add_donor(1e17, lambda pos: pos[0] < junction)
+    sys.add_acceptor(1e15, lambda pos: pos[0] >= junction)
+
+    sys.contact_type('Ohmic', 'Ohmic')
+    sys.contact_S(1e7, 0, 0, 1e7)
+
+    # grain boundary along the x-direction
+    sys.add_defects([(20e-7, Ly/2), (L, Ly/2)], dos, 1e-15, E=0.1)
+
+    alpha = 2.3e4      # absorption coefficient [1/cm]
+    sys.generation(lambda x, y: phi * alpha * np.exp(-alpha * x))
+
+    return sys
+
+def difference(sys1, sys2):
+    # largest relative difference of the arrays of two systems
+    names = sesame.builder.material_fields + ['rho', 'g']
+    errors = [np.max(np.abs(getattr(sys1, name) - getattr(sys2, name))) \
+              / np.max(np.abs(getattr(sys1, name)) + 1e-300) for name in names]
+    for d1, d2 in zip(sys1.defects_list, sys2.defects_list):
+        errors.append(np.abs(d1.dos - d2.dos) / np.abs(d1.dos))
+    return max(errors)
+
+def runTest17():
+
+    errors = []
+    for compact in (False, True):
+        sys = system(compact=compact)
+
+        # derived system with other lifetimes, defect density and
+        # illumination
+        derived = sys.derive(tau_e=1e-9, tau_h=1e-9, defects={0: {'N': 1e12}})
+        derived.generation(lambda x, y: 1e16 * 2.3e4 * np.exp(-2.3e4 * x))
+        reference = system(tau=1e-9, dos=1e12, phi=1e16, compact=compact)
+        errors.append(difference(derived, reference))
+
+        # the original system is not modified
+        errors.append(difference(sys, system(compact=compact)))
+
+        # steady states and currents
+        currents = []
+        for s in (derived, reference):
+            solver = sesame.solvers.Solver()
+            solution = solver.solve(s, compute='Poisson', verbose=False)
+            solution = solver.solve(s, guess=solution, tol=1e-10, verbose=False)
+            currents.append(sesame.Analyzer(s, solution).full_current())
+        errors.append(np.abs((currents[0] - currents[1]) / currents[1]))
+
+    error = max(errors)
+    print("error = {0}".format(error))
@@ -0,0 +1,78 @@
+import sesame
+import numpy as np
+from sesame.utils import Bresenham, get_line_defects_sites
+
+def indices(system, p):
+    # indices of the first nodes at or after the coordinates of a point
+    xpts, ypts = system.xpts, system.ypts
+    i = len(xpts) - len(xpts[xpts >= p[0]])
+    j = len(ypts) - len(ypts[ypts >= p[1]])
+    return i, j
+
+def walk(system, p1, p2):
+    # Digital line between two points, computed step by step: sites, distance
+    # along the path and perpendicular lattice distances of the sites
+    i1, j1 = indices(system, p1)
+    i2, j2 = indices(system, p2)
+
+    incx = int(np.sign(i2 - i1))
+    incy = int(np.sign(j2 - j1))
+
+    # numerator of the distance of a point to the line
+    error = lambda x, y: abs((p2[1]-p1[1])*x - (p2[0]-p1[0])*y \
+                             + p2[0]*p1[1] - p2[1]*p1[0])
+
+    i, j = i1, j1
+    sites, X, perp_dl = [i + j*system.nx], [0], []
+    for _ in range(abs(i2 - i1) + abs(j2 - j1)):
+        e1 = error(system.xpts[i], system.ypts[j+incy])
+        e2 = error(system.xpts[i+incx], system.ypts[j])
+        if incx == 0:
+            condition = e1 <= e2 # for lines x = constant
+        else:
+            condition = e1 < e2
+        if condition:
+            X.append(X[-1] + system.dy[j])
+            j += incy
+            perp_dl.append((system.dx[i] + system.dx[i-1]) / 2.)
+        else:
+            X.append(X[-1] + system.dx[i])
+            i += incx
+            perp_dl.append(system.dy[j - 1])
+        sites.append(i + j*system.nx)
+    perp_dl.append(perp_dl[-1])
+    return np.array(sites), np.array(X), np.array(perp_dl)
+
+def runTest18():
+
+    # nonuniform mesh
+    x = np.concatenate((np.linspace(0, 0.2e-4, 30, endpoint=False),
+                        np.linspace(0.2e-4, 2.7e-4, 80, endpoint=False),
+                        np.linspace(2.7e-4, 3e-4, 20)))
+    y = np.concatenate((np.linspace(0, 1.25e-4, 40, endpoint=False),
+                        np.linspace(1.25e-4, 1.75e-4, 30, endpoint=False),
+                        np.linspace(1.75e-4, 3e-4, 40)))
+    sys = sesame.Builder(x, y)
+
+    # random lines inside the system, and lines along the mesh directions
+    rng = np.random.RandomState(0)
+    points = rng.uniform(0.05e-4, 2.95e-4, size=(300, 2, 2))
+    points[:20, 1, 0] = points[:20, 0, 0]
+    points[20:40, 1, 1] = points[20:40, 0, 1]
+
+    errors = []
+    for p1, p2 in points:
+        if indices(sys, p1) == indices(sys, p2):
+            continue
+        sites, X, perp_dl = walk(sys, p1, p2)
+
+        s, dl = get_line_defects_sites(sys, (p1, p2))
+        errors.append(0. if np.array_equal(s, sites) else 1.)
+        errors.append(np.max(np.abs(dl - perp_dl)) / np.max(perp_dl))
+
+        s, Xb, _, _ = Bresenham(sys, p1, p2)
+        errors.append(0. if np.array_equal(s, sites) else 1.)
+        errors.append(np.max(np.abs(Xb - X)) / X[-1])
+
+    error = max(errors)
+    print("error = {0}".format(error))
@@ -0,0 +1,73 @@
+import sesame
+import numpy as np
+import os
+import tempfile
+from sesame.store import fingerprint
+
+def runTest19():
+
+    L = 3e-4 # length of the system in the x-direction [cm]
+
+    # Mesh
+    x = np.concatenate((np.linspace(0,1.2e-4, 100, endpoint=False),
+                        np.linspace(1.2e-4, L, 50)))
+
+    # Create a system
+    sys = sesame.Builder(x)
+
+    # Dictionary with the material parameters
+    material = {'Nc':8e17, 'Nv':1.8e19, 'Eg':1.5, 'affinity':3.9, 'epsilon':9.4,
+            'mu_e':100, 'mu_h':100, 'tau_e':10e-9, 'tau_h':10e-9, 'Et':0}
+    sys.add_material(material)
+
+    junction = 50e-7 # extent of the junction from the left contact [cm]
+    sys.add_donor(1e17, lambda x: x < junction)
+    sys.add_acceptor(1e15, lambda x: x >= junction)
+
+    sys.contact_type('Ohmic', 'Ohmic')
+    sys.contact_S(1e7, 0, 0, 1e7)
+
+    phi = 1e17         # photon flux [1/(cm^2 s)]
+    alpha = 2.3e4      # absorption coefficient [1/cm]
+    sys.generation(lambda x, y: phi * alpha * np.exp(-alpha * x))
+
+    voltages = np.linspace(0, 0.4, 5)
+
+    errors = []
+    with tempfile.TemporaryDirectory() as folder:
+        # the same IV curve saved in gzip files and in a sweep store
+        name = os.path.join(folder, 'IV')
+        J = sesame.IVcurve(sys, voltages, name, verbose=False)
+        Js = sesame.IVcurve(sys, voltages, name, verbose=False, fmt='sweep')
+        errors.append(np.max(np.abs(Js - J)))
+
+        store = sesame.SweepStore(name + '.sweep')
+        if len(store) != len(voltages):
+            errors.append(1.)
+        if fingerprint(store.system) != fingerprint(sys):
+            errors.append(1.)
+
+        solutions = []
+        for idx in range(len(voltages)):
+            _, result = sesame.load_sim('{0}_{1}.gzip'.format(name, idx))
+            solutions.append(result)
+            _, stored = sesame.load_sim(name + '.sweep', idx)
+            errors.extend(np.max(np.abs(stored[key] - result[key])) \
+                          for key in ('efn', 'efp', 'v'))
+            meta = store.metadata(idx)
+            errors.append(np.abs(meta['voltage'] - voltages[idx]))
+            errors.append(np.abs(meta['current'] - J[idx]))
+
+        # the solutions are read back exactly with all the codecs
+        for compression in ('deflate', 'bzip2', 'lzma', 'none'):
+            filename = os.path.join(folder, compression + '.sweep')
+            store = sesame.SweepStore(filename, sys, compression=compression)
+            for idx, result in enumerate(solutions):
+                store.append(result, voltage=voltages[idx])
+            store = sesame.SweepStore(filename)
+            for idx, result in enumerate(store):
+                errors.extend(np.max(np.abs(result[key] - solutions[idx][key])) \
+                              for key in ('efn', 'efp', 'v'))
+
+    error = max(errors)
+    print("error = {0}".format(error))
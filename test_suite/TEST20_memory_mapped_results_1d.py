@@ -0,0 +1,75 @@
+import sesame
+import numpy as np
+import os
+import tempfile
+
+def runTest20():
+
+    L = 3e-4 # length of the system in the x-direction [cm]
+
+    # Mesh
+    x = np.concatenate((np.linspace(0,1.2e-4, 100, endpoint=False),
+                        np.linspace(1.2e-4, L, 50)))
+
+    # Create a system
+    sys = sesame.Builder(x)
+
+    # Dictionary with the material parameters
+    material = {'Nc':8e17, 'Nv':1.8e19, 'Eg':1.5, 'affinity':3.9, 'epsilon':9.4,
+            'mu_e':100, 'mu_h':100, 'tau_e':10e-9, 'tau_h':10e-9, 'Et':0}
+    sys.add_material(material)
+
+    junction = 50e-7 # extent of the junction from the left contact [cm]
+    sys.add_donor(1e17, lambda x: x < junction)
+    sys.add_acceptor(1e15, lambda x: x >= junction)
+
+    sys.contact_type('Ohmic', 'Ohmic')
+    sys.contact_S(1e7, 0, 0, 1e7)
+
+    phi = 1e17         # photon flux [1/(cm^2 s)]
+    alpha = 2.3e4      # absorption coefficient [1/cm]
+    sys.generation(lambda x, y: phi * alpha * np.exp(-alpha * x))
+
+    voltages = np.linspace(0, 0.4, 5)
+
+    errors = []
+    with tempfile.TemporaryDirectory() as folder:
+        # the same IV curve saved in gzip files and in raw files
+        name = os.path.join(folder, 'IV')
+        J = sesame.IVcurve(sys, voltages, name, verbose=False)
+        sesame.IVcurve(sys, voltages, name, verbose=False, fmt='raw')
+
+        sims = [sesame.open_sim('{0}_{1}.npz'.format(name, idx)) \
+                for idx in range(len(voltages))]
+        for idx, sim in enumerate(sims):
+            _, result = sesame.load_sim('{0}_{1}.gzip'.format(name, idx))
+            for key in ('efn', 'efp', 'v'):
+                if not isinstance(sim.result[key], np.memmap):
+                    errors.append(1.)
+                errors.append(np.max(np.abs(sim.result[key] - result[key])))
+            # the files of the sweep share their system
+            if sim.system is not sims[0].system:
+                errors.append(1.)
+            J_raw = sesame.Analyzer(sim.system, sim.result).full_current()
+            errors.append(np.abs(J_raw - J[idx]))
+
+        # modifying the arrays does not modify the files
+        v = np.copy(sims[-1].result['v'])
+        sims[-1].result['v'][:] = 0
+        sim = sesame.open_sim('{0}_{1}.npz'.format(name, len(voltages)-1))
+        errors.append(np.max(np.abs(sim.result['v'] - v)))
+
+        # sweep stores without compression are memory-mapped as well
+        store = sesame.SweepStore(os.path.join(folder, 'IV.sweep'), sys,
+                                  compression='none')
+        store.append(sim.result, voltage=voltages[-1])
+        stored = sesame.open_sim(os.path.join(folder, 'IV.sweep'), 0)
+        if not isinstance(stored.result['v'], np.memmap):
+            errors.append(1.)
+        errors.append(np.max(np.abs(stored.result['v'] - v)))
+
+        # the memory maps are closed before the files are removed
+        del sims, sim, stored
+
+    error = max(errors)
+    print("error = {0}".format(error))
@@ -0,0 +1,87 @@
+import sesame
+import numpy as np
+import os
+import tempfile
+
+class Interrupted(Exception):
+    pass
+
+class InterruptedSolver(sesame.solvers.Solver):
+    # solver stopping the computation after a number of nonlinear solutions
+    def __init__(self, solves):
+        super().__init__()
+        self.solves = solves
+
+    def solve(self, system, compute='all', *args, **kwargs):
+        if compute == 'all':
+            if self.solves == 0:
+                raise Interrupted()
+            self.solves -= 1
+        return super().solve(system, compute, *args, **kwargs)
+
+def runTest21():
+
+    L = 3e-4 # length of the system in the x-direction [cm]
+
+    # Mesh
+    x = np.concatenate((np.linspace(0,1.2e-4, 100, endpoint=False),
+                        np.linspace(1.2e-4, L, 50)))
+
+    # Create a system
+    sys = sesame.Builder(x)
+
+    # Dictionary with the material parameters
+    material = {'Nc':8e17, 'Nv':1.8e19, 'Eg':1.5, 'affinity':3.9, 'epsilon':9.4,
+            'mu_e':100, 'mu_h':100, 'tau_e':10e-9, 'tau_h':10e-9, 'Et':0}
+    sys.add_material(material)
+
+    junction = 50e-7 # extent of the junction from the left contact [cm]
+    sys.add_donor(1e17, lambda x: x < junction)
+    sys.add_acceptor(1e15, lambda x: x >= junction)
+
+    sys.contact_type('Ohmic', 'Ohmic')
+    sys.contact_S(1e7, 0, 0, 1e7)
+
+    phi = 1e17         # photon flux [1/(cm^2 s)]
+    alpha = 2.3e4      # absorption coefficient [1/cm]
+    sys.generation(lambda x, y: phi * alpha * np.exp(-alpha * x))
+
+    voltages = np.linspace(0, 0.8, 9)
+
+    errors = []
+    with tempfile.TemporaryDirectory() as folder:
+        # uninterrupted IV curve
+        jref = sesame.solvers.Solver().IVcurve(sys, voltages,
+                        os.path.join(folder, 'ref'), verbose=False, fmt='sweep')
+
+        # IV curve interrupted after 4 voltages and resumed from its
+        # checkpoint by another solver
+        name = os.path.join(folder, 'IV')
+        try:
+            InterruptedSolver(4).IVcurve(sys, voltages, name, verbose=False,
+                                         fmt='sweep', resume=True)
+            errors.append(1.)
+        except Interrupted:
+            pass
+        if not os.path.exists(name + '.ckpt'):
+            errors.append(1.)
+        if len(sesame.SweepStore(name + '.sweep')) != 4:
+            errors.append(1.)
+
+        j = sesame.solvers.Solver().IVcurve(sys, voltages, name, verbose=False,
+                                            fmt='sweep', resume=True)
+        if os.path.exists(name + '.ckpt'):
+            errors.append(1.)
+
+        # the resumed curve is the uninterrupted one
+        errors.append(np.max(np.abs(j - jref)))
+        store = sesame.SweepStore(name + '.sweep')
+        if len(store) != len(voltages):
+            errors.append(1.)
+        for idx, result in enumerate(sesame.SweepStore(os.path.join(folder, 'ref.sweep'))):
+            errors.extend(np.max(np.abs(store[idx][key] - result[key])) \
+                          for key in ('efn', 'efp', 'v'))
+            errors.append(np.abs(store.metadata(idx)['current'] - jref[idx]))
+
+    error = max(errors)
+    print("error = {0}".format(error))
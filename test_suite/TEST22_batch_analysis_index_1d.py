@@ -0,0 +1,84 @@
+import sesame
+import sesame.batch
+import numpy as np
+import os
+import tempfile
+
+def runTest22():
+
+    L = 3e-4 # length of the system in the x-direction [cm]
+
+    # Mesh
+    x = np.concatenate((np.linspace(0,1.2e-4, 100, endpoint=False),
+                        np.linspace(1.2e-4, L, 50)))
+
+    # Create a system
+    sys = sesame.Builder(x)
+
+    # Dictionary with the material parameters
+    material = {'Nc':8e17, 'Nv':1.8e19, 'Eg':1.5, 'affinity':3.9, 'epsilon':9.4,
+            'mu_e':100, 'mu_h':100, 'tau_e':10e-9, 'tau_h':10e-9, 'Et':0}
+    sys.add_material(material)
+
+    junction = 50e-7 # extent of the junction from the left contact [cm]
+    sys.add_donor(1e17, lambda x: x < junction)
+    sys.add_acceptor(1e15, lambda x: x >= junction)
+
+    sys.contact_type('Ohmic', 'Ohmic')
+    sys.contact_S(1e7, 0, 0, 1e7)
+
+    phi = 1e17         # photon flux [1/(cm^2 s)]
+    alpha = 2.3e4      # absorption coefficient [1/cm]
+    sys.generation(lambda x, y: phi * alpha * np.exp(-alpha * x))
+
+    voltages = np.linspace(0, 0.4, 5)
+
+    # solutions opened by the analysis
+    opened = []
+    open_sim = sesame.batch.open_sim
+    def counting_open_sim(filename, index=0):
+        opened.append((filename, index))
+        return open_sim(filename, index)
+
+    errors = []
+    with tempfile.TemporaryDirectory() as folder:
+        name = os.path.join(folder, 'IV')
+        J = sesame.IVcurve(sys, voltages, name, verbose=False, fmt='sweep')
+        store = name + '.sweep'
+
+        sesame.batch.open_sim = counting_open_sim
+        try:
+            # first analysis: every solution is opened once
+            data = sesame.analyze(store, ['full_current'], processes=1)
+            errors.append(np.max(np.abs(data['full_current'] - J)))
+            if len(opened) != len(voltages) or not os.path.exists(store + '.index'):
+                errors.append(1.)
+
+            # second analysis: the values are read from the index
+            del opened[:]
+            data = sesame.analyze(store, ['full_current'], processes=1)
+            errors.append(np.max(np.abs(data['full_current'] - J)))
+            if len(opened) != 0:
+                errors.append(1.)
+
+            # a new quantity opens every solution again, once
+            data = sesame.analyze(store, ['full_current', 'continuity_error'],
+                                  processes=1)
+            if len(opened) != len(voltages):
+                errors.append(1.)
+            errors.append(np.max(data['continuity_error']))
+
+            # a solution appended to the store is the only one analyzed
+            del opened[:]
+            _, result = sesame.load_sim(store, index=-1)
+            sesame.SweepStore(store).append(result, voltage=voltages[-1])
+            data = sesame.analyze(store, ['full_current', 'continuity_error'],
+                                  processes=1)
+            if opened != [(store, len(voltages))]:
+                errors.append(1.)
+            errors.append(np.abs(data['full_current'][-1] - J[-1]))
+        finally:
+            sesame.batch.open_sim = open_sim
+
+    error = max(errors)
+    print("error = {0}".format(error))
@@ -0,0 +1,64 @@
+import sesame
+import numpy as np
+import os
+import tempfile
+from scipy.interpolate import CubicSpline
+
+def runTest23():
+
+    L = 3e-4 # length of the system in the x-direction [cm]
+
+    # Mesh
+    x = np.concatenate((np.linspace(0,1.2e-4, 100, endpoint=False),
+                        np.linspace(1.2e-4, L, 50)))
+
+    # Create a system
+    sys = sesame.Builder(x)
+
+    # Dictionary with the material parameters
+    material = {'Nc':8e17, 'Nv':1.8e19, 'Eg':1.5, 'affinity':3.9, 'epsilon':9.4,
+            'mu_e':100, 'mu_h':100, 'tau_e':10e-9, 'tau_h':10e-9, 'Et':0}
+    sys.add_material(material)
+
+    junction = 50e-7 # extent of the junction from the left contact [cm]
+    sys.add_donor(1e17, lambda x: x < junction)
+    sys.add_acceptor(1e15, lambda x: x >= junction)
+
+    sys.contact_type('Ohmic', 'Ohmic')
+    sys.contact_S(1e7, 0, 0, 1e7)
+
+    phi = 1e17         # photon flux [1/(cm^2 s)]
+    alpha = 2.3e4      # absorption coefficient [1/cm]
+    sys.generation(lambda x, y: phi * alpha * np.exp(-alpha * x))
+
+    fom = sesame.figures_of_merit(sys, solver=sesame.solvers.Solver())
+
+    # dense IV curve, with the current counted positive at short circuit
+    voltages = np.linspace(0, 0.95, 96)
+    with tempfile.TemporaryDirectory() as folder:
+        J = sesame.solvers.Solver().IVcurve(sys, voltages,
+                        os.path.join(folder, 'IV'), verbose=False, fmt='sweep')
+    sign = np.sign(J[0])
+    j = sign * J
+
+    # open-circuit voltage and maximum power of the interpolated curve
+    curve = CubicSpline(voltages, j)
+    k = np.nonzero(j <= 0)[0][0]
+    roots = [r for r in curve.roots() if voltages[k-1] <= r <= voltages[k]]
+    voc = roots[0]
+    v = np.linspace(0, voc, 100001)
+    power = v * curve(v)
+    pmax = np.max(power)
+    ff = pmax / (voc * j[0])
+
+    errors = [np.abs((fom['Jsc'] - J[0]) / J[0]),
+              np.abs(fom['Voc'] - voc) / voc,
+              np.abs(fom['Pmax'] - pmax) / pmax,
+              np.abs(fom['FF'] - ff) / ff,
+              np.abs(fom['Vmp'] - v[np.argmax(power)]) / fom['Vmp']]
+    # far fewer solves than the dense curve
+    if fom['solves'] > 20:
+        errors.append(1.)
+
+    error = max(errors)
+    print("error = {0}".format(error))
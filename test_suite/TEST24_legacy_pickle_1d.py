@@ -0,0 +1,87 @@
+import sesame
+import numpy as np
+import os
+import tempfile
+
+def legacy(sys):
+    # remove the attributes added to the Builder after the first saved files
+    # (three-dimensional and compact systems)
+    for name in ('nz', 'zpts', 'dz', 'compact'):
+        del sys.__dict__[name]
+    return sys
+
+def runTest24():
+
+    L = 3e-4 # length of the system in the x-direction [cm]
+
+    # Mesh
+    x = np.concatenate((np.linspace(0,1.2e-4, 100, endpoint=False),
+                        np.linspace(1.2e-4, L, 50)))
+
+    # Create a system
+    sys = sesame.Builder(x)
+
+    # Dictionary with the material parameters
+    material = {'Nc':8e17, 'Nv':1.8e19, 'Eg':1.5, 'affinity':3.9, 'epsilon':9.4,
+            'mu_e':100, 'mu_h':100, 'tau_e':10e-9, 'tau_h':10e-9, 'Et':0}
+    sys.add_material(material)
+
+    junction = 50e-7 # extent of the junction from the left contact [cm]
+    sys.add_donor(1e17, lambda x: x < junction)
+    sys.add_acceptor(1e15, lambda x: x >= junction)
+
+    sys.contact_type('Ohmic', 'Ohmic')
+    sys.contact_S(1e7, 0, 0, 1e7)
+
+    phi = 1e17         # photon flux [1/(cm^2 s)]
+    alpha = 2.3e4      # absorption coefficient [1/cm]
+    sys.generation(lambda x, y: phi * alpha * np.exp(-alpha * x))
+
+    solver = sesame.solvers.Solver()
+    eq = solver.solve(sys, compute='Poisson')
+    result = solver.solve(sys, guess=eq, tol=1e-10)
+
+    az = sesame.Analyzer(sys, result)
+    J = az.full_current()
+    R = az.integrated_bulk_srh_recombination()
+
+    # two-dimensional system at equilibrium
+    y = np.linspace(0, 1e-4, 20)
+    sys2 = sesame.Builder(x, y)
+    sys2.add_material(material)
+    sys2.add_donor(1e17, lambda pos: pos[0] < junction)
+    sys2.add_acceptor(1e15, lambda pos: pos[0] >= junction)
+    sys2.contact_type('Ohmic', 'Ohmic')
+    eq2 = sesame.solvers.Solver().solve(sys2, compute='Poisson')
+    n2 = sesame.Analyzer(sys2, eq2).electron_density()
+    R2 = sesame.Analyzer(sys2, eq2).integrated_bulk_srh_recombination()
+
+    errors = []
+    with tempfile.TemporaryDirectory() as folder:
+        # files written with the layout of the systems of earlier versions
+        name = os.path.join(folder, 'legacy_1d.gzip')
+        sesame.save_sim(legacy(sys), result, name)
+        name2 = os.path.join(folder, 'legacy_2d.gzip')
+        sesame.save_sim(legacy(sys2), eq2, name2)
+
+        # the systems read back are usable as new systems
+        old, res = sesame.load_sim(name)
+        if old.nz != 1 or old.dz.size != 0 or old.compact:
+            errors.append(1.)
+        az = sesame.Analyzer(old, res)
+        errors.append(np.abs((az.full_current() - J) / J))
+        errors.append(np.abs((az.integrated_bulk_srh_recombination() - R) / R))
+
+        old, res = sesame.load_sim(name2)
+        if old.dimension != 2 or old.nz != 1:
+            errors.append(1.)
+        az = sesame.Analyzer(old, res)
+        errors.append(np.max(np.abs(az.electron_density() - n2) / n2))
+        errors.append(np.abs((az.integrated_bulk_srh_recombination() - R2) / R2))
+
+        # and can be solved again
+        new = sesame.solvers.Solver().solve(old, compute='Poisson')
+        errors.append(np.max(np.abs(new['v'] - eq2['v'])))
+
+    error = max(errors)
+    print("error = {0}".format(error))
@@ -0,0 +1,87 @@
+import sesame
+import numpy as np
+import os
+import tempfile
+from sesame.store import fingerprint, Checkpoint
+
+def build(dos):
+
+    L = 3e-4 # length of the system in the x-direction [cm]
+
+    # Mesh
+    x = np.concatenate((np.linspace(0,1.2e-4, 100, endpoint=False),
+                        np.linspace(1.2e-4, L, 50)))
+
+    # Create a system
+    sys = sesame.Builder(x)
+
+    # Dictionary with the material parameters
+    material = {'Nc':8e17, 'Nv':1.8e19, 'Eg':1.5, 'affinity':3.9, 'epsilon':9.4,
+            'mu_e':100, 'mu_h':100, 'tau_e':10e-9, 'tau_h':10e-9, 'Et':0}
+    sys.add_material(material)
+
+    junction = 50e-7 # extent of the junction from the left contact [cm]
+    sys.add_donor(1e17, lambda x: x < junction)
+    sys.add_acceptor(1e15, lambda x: x >= junction)
+
+    sys.contact_type('Ohmic', 'Ohmic')
+    sys.contact_S(1e7, 0, 0, 1e7)
+
+    phi = 1e17         # photon flux [1/(cm^2 s)]
+    alpha = 2.3e4      # absorption coefficient [1/cm]
+    sys.generation(lambda x, y: phi * alpha * np.exp(-alpha * x))
+
+    # point defect with a continuum of states
+    if dos is not None:
+        sys.add_defects(1e-4, dos, 1e-15)
+    return sys
+
+def gaussian(N, E0):
+    return lambda E: N * np.exp(-(E - E0)**2 / 0.01)
+
+def runTest25():
+
+    errors = []
+
+    # systems with a continuum of defect states have a fingerprint, the same
+    # for the same density of states
+    keys = [fingerprint(build(gaussian(N, 0.)), [0, 0.1]) \
+            for N in (1e12, 1e12, 2e12)]
+    if keys[0] != keys[1] or keys[0] == keys[2]:
+        errors.append(1.)
+    if fingerprint(build(gaussian(1e12, 0.1)), [0, 0.1]) == keys[0]:
+        errors.append(1.)
+
+    # and their checkpoints are saved and loaded
+    sys = build(gaussian(1e12, 0.))
+    with tempfile.TemporaryDirectory() as folder:
+        name = os.path.join(folder, 'state.ckpt')
+        Checkpoint(name, sys, [0, 0.1]).save(index=0, J=np.ones(2))
+        state = Checkpoint(name, build(gaussian(1e12, 0.)), [0, 0.1]).load()
+        if state is None or state['index'] != 0:
+            errors.append(1.)
+        if Checkpoint(name, build(gaussian(2e12, 0.)), [0, 0.1]).load() \
+           is not None:
+            errors.append(1.)
+
+    # no checkpoint is written unless it is asked for
+    sys = build(None)
+    voltages = np.linspace(0, 0.4, 5)
+    with tempfile.TemporaryDirectory() as folder:
+        name = os.path.join(folder, 'IV')
+        jref = sesame.IVcurve(sys, voltages, name, verbose=False)
+        for options in ({}, {'checkpoint': True}, {'resume': True}):
+            written = []
+            writer = sesame.AsyncWriter(on_written=written.append)
+            j = sesame.solvers.Solver().IVcurve(sys, voltages, name, verbose=False,
+                                                writer=writer, **options)
+            writer.close()
+            checkpoints = [f for f in written if f.endswith('.ckpt')]
+            if len(checkpoints) != (len(voltages) if options else 0):
+                errors.append(1.)
+            if os.path.exists(name + '.ckpt'):
+                errors.append(1.)
+            errors.append(np.max(np.abs((j - jref) / jref)))
+
+    error = max(errors)
+    print("error = {0}".format(error))
@@ -0,0 +1,103 @@
+import sesame
+import numpy as np
+import os
+import tempfile
+from scipy.io import loadmat
+
+def runTest26():
+
+    L = 3e-4 # length of the system in the x-direction [cm]
+
+    # Mesh
+    x = np.concatenate((np.linspace(0,1.2e-4, 60, endpoint=False),
+                        np.linspace(1.2e-4, L, 30)))
+    y = np.linspace(0, 1e-4, 8)
+
+    # Create a system
+    sys = sesame.Builder(x, y)
+
+    # Dictionary with the material parameters
+    material = {'Nc':8e17, 'Nv':1.8e19, 'Eg':1.5, 'affinity':3.9, 'epsilon':9.4,
+            'mu_e':100, 'mu_h':100, 'tau_e':10e-9, 'tau_h':10e-9, 'Et':0}
+    sys.add_material(material)
+
+    junction = 50e-7 # extent of the junction from the left contact [cm]
+    sys.add_donor(1e17, lambda pos: pos[0] < junction)
+    sys.add_acceptor(1e15, lambda pos: pos[0] >= junction)
+
+    sys.contact_type('Ohmic', 'Ohmic')
+    sys.contact_S(1e7, 0, 0, 1e7)
+
+    phi = 1e17         # photon flux [1/(cm^2 s)]
+    alpha = 2.3e4      # absorption coefficient [1/cm]
+    sys.generation(lambda x, y: phi * alpha * np.exp(-alpha * x))
+
+    voltages = np.linspace(0, 0.1, 5)
+
+    errors = []
+    with tempfile.TemporaryDirectory() as folder:
+        # gzip files are written with the default level of save_sim (9), and
+        # with the fastest level on request (the extra flags of the gzip
+        # header are 2 and 4 respectively)
+        name = os.path.join(folder, 'IV')
+        J = sesame.IVcurve(sys, voltages, name, verbose=False)
+        _, result = sesame.load_sim(name + '_0.gzip')
+        with sesame.AsyncWriter(level=1) as writer:
+            writer.save_sim(sys, result, os.path.join(folder, 'fast.gzip'))
+        for filename, flags in ((name + '_0.gzip', 2), ('fast.gzip', 4)):
+            with open(os.path.join(folder, filename), 'rb') as f:
+                if f.read(9)[8] != flags:
+                    errors.append(1.)
+
+        # files are written in order, from snapshots of the solutions
+        written = []
+        writer = sesame.AsyncWriter(on_written=written.append)
+        names = [os.path.join(folder, 'sim_{0}.gzip'.format(idx)) \
+                 for idx in range(len(voltages))]
+        solution = {key: np.copy(result[key]) for key in result}
+        for idx, filename in enumerate(names):
+            solution['v'][:] = idx
+            writer.save_sim(sys, solution, filename)
+        writer.flush()
+        if written != names:
+            errors.append(1.)
+        for idx, filename in enumerate(names):
+            _, stored = sesame.load_sim(filename)
+            errors.append(np.max(np.abs(stored['v'] - idx)))
+
+        # an error of the writing thread is raised by the next call, and the
+        # writer can be used afterwards
+        writer.save_sim(sys, result, os.path.join(folder, 'missing', 'sim.gzip'))
+        try:
+            writer.flush()
+            errors.append(1.)
+        except (IOError, OSError):
+            pass
+        writer.save_sim(sys, result, os.path.join(folder, 'last.gzip'))
+        writer.close()
+        if written[-1] != os.path.join(folder, 'last.gzip'):
+            errors.append(1.)
+        try:
+            writer.save_sim(sys, result, os.path.join(folder, 'closed.gzip'))
+            errors.append(1.)
+        except RuntimeError:
+            pass
+
+        # Matlab files of a system with a continuum of defect states, which
+        # cannot be pickled
+        sys.add_defects([(2e-4, 0), (2e-4, 1e-4)],
+                        lambda E: 1e11 * np.exp(-E**2 / 0.01), 1e-15)
+        name = os.path.join(folder, 'mat')
+        J = sesame.IVcurve(sys, voltages, name, verbose=False, fmt='mat')
+        if np.any(np.isnan(J)):
+            errors.append(1.)
+        for idx in range(len(voltages)):
+            data = loadmat(name + '_{0}'.format(idx))
+            v = data['results']['v'][0, 0]
+            if v.shape != (sys.ny, sys.nx):
+                errors.append(1.)
+            Nc = data['sys']['Nc'][0, 0]
+            errors.append(np.max(np.abs(Nc - sys.Nc.reshape(sys.ny, sys.nx))))
+
+    error = max(errors)
+    print("error = {0}".format(error))
@@ -0,0 +1,75 @@
+import sesame
+import sesame.mesh
+import numpy as np
+
+def runTest27():
+
+    L = 3e-4 # length of the system in the x-direction [cm]
+    Ly = 3e-4 # length of the system in the y-direction [cm]
+
+    # Mesh
+    x = np.concatenate((np.linspace(0,1.2e-4, 60, endpoint=False),
+                        np.linspace(1.2e-4, L, 30)))
+    y = np.linspace(0, Ly, 21)
+
+    # Create a system
+    sys = sesame.Builder(x, y)
+
+    # Dictionary with the material parameters
+    material = {'Nc':8e17, 'Nv':1.8e19, 'Eg':1.5, 'affinity':3.9, 'epsilon':9.4,
+            'mu_e':100, 'mu_h':100, 'tau_e':10e-9, 'tau_h':10e-9, 'Et':0}
+    sys.add_material(material)
+
+    junction = 50e-7 # extent of the junction from the left contact [cm]
+    sys.add_donor(1e17, lambda pos: pos[0] < junction)
+    sys.add_acceptor(1e15, lambda pos: pos[0] >= junction)
+
+    sys.contact_type('Ohmic', 'Ohmic')
+    sys.contact_S(1e7, 0, 0, 1e7)
+
+    # grain boundary along the x-direction
+    sys.add_defects([(20e-7, Ly/2), (L, Ly/2)], 1e11, 1e-15, E=0.1)
+
+    phi = 1e17         # photon flux [1/(cm^2 s)]
+    alpha = 2.3e4      # absorption coefficient [1/cm]
+    sys.generation(lambda x, y: phi * alpha * np.exp(-alpha * x))
+
+    errors = []
+
+    # the coarse mesh keeps the nodes on both sides of the junction and the
+    # line of the grain boundary
+    coarse = sesame.mesh.coarsen(sys)
+    if coarse.nx >= sys.nx or coarse.ny >= sys.ny:
+        errors.append(1.)
+    i = np.searchsorted(x, junction)
+    if not (x[i-1] in coarse.xpts and x[i] in coarse.xpts):
+        errors.append(1.)
+    if Ly/2 not in coarse.ypts:
+        errors.append(1.)
+    errors.append(np.max(np.abs(coarse.xpts - x[coarse.ix])))
+    if len(coarse.defects_list[0].sites) >= len(sys.defects_list[0].sites):
+        errors.append(1.)
+
+    # bilinear functions are interpolated exactly onto the fine mesh
+    f = lambda X, Y: 1 + 2e4*X - 3e4*Y + 5e7*X*Y
+    X, Y = np.meshgrid(coarse.xpts, coarse.ypts)
+    fine = sesame.mesh.prolongate(coarse, {'v': f(X, Y).flatten()}, sys)
+    X, Y = np.meshgrid(x, y)
+    errors.append(np.max(np.abs(fine['v'] - f(X, Y).flatten())))
+
+    # nested iterations converge to the solution computed without coarse
+    # meshes
+    solver = sesame.solvers.Solver()
+    eq = solver.solve(sys, compute='Poisson', verbose=False)
+    reference = solver.solve(sys, guess=eq, tol=1e-10, verbose=False)
+    for levels in (1, 2):
+        solver = sesame.solvers.Solver()
+        eq_nested = solver.solve(sys, compute='Poisson', verbose=False,
+                                 levels=levels)
+        errors.append(np.max(np.abs(eq_nested['v'] - eq['v'])))
+        solution = solver.solve(sys, tol=1e-10, verbose=False, levels=levels)
+        errors.extend(np.max(np.abs(solution[key] - reference[key])) \
+                      for key in ('efn', 'efp', 'v'))
+
+    error = max(errors)
+    print("error = {0}".format(error))
@@ -0,0 +1,65 @@
+import sesame
+import sesame.mesh
+import numpy as np
+
+def build(x):
+
+    # Create a system
+    sys = sesame.Builder(x)
+
+    # Dictionary with the material parameters
+    material = {'Nc':8e17, 'Nv':1.8e19, 'Eg':1.5, 'affinity':3.9, 'epsilon':9.4,
+            'mu_e':100, 'mu_h':100, 'tau_e':10e-9, 'tau_h':10e-9, 'Et':0}
+    sys.add_material(material)
+
+    junction = 50e-7 # extent of the junction from the left contact [cm]
+    sys.add_donor(1e17, lambda x: x < junction)
+    sys.add_acceptor(1e15, lambda x: x >= junction)
+
+    sys.contact_type('Ohmic', 'Ohmic')
+    sys.contact_S(1e7, 0, 0, 1e7)
+
+    phi = 1e17         # photon flux [1/(cm^2 s)]
+    alpha = 2.3e4      # absorption coefficient [1/cm]
+    sys.generation(lambda x, y: phi * alpha * np.exp(-alpha * x))
+
+    return sys
+
+def runTest28():
+
+    L = 3e-4 # length of the system in the x-direction [cm]
+
+    # refinement of a uniform coarse mesh
+    x0 = np.linspace(0, L, 16)
+    voltages = np.array([0, 0.4, 0.8])
+    sys, solutions, J = sesame.mesh.adapt(build, x0, voltages=voltages,
+                                          tol=1e-3, verbose=False)
+
+    errors = []
+    # the mesh is refined, mostly where the generation and the junction are
+    if sys.nx <= len(x0) or not np.all(np.isin(x0, sys.xpts)):
+        errors.append(1.)
+    if np.sum(sys.xpts < L/10) <= np.sum(sys.xpts > L - L/10):
+        errors.append(1.)
+
+    # the solutions returned are those of the currents
+    for idx, solution in enumerate(solutions):
+        errors.append(np.abs(sesame.Analyzer(sys, solution).full_current() - J[idx]) \
+                      / np.abs(J[idx]))
+
+    # currents of a much finer mesh
+    x = np.concatenate((np.linspace(0, 1e-5, 1000, endpoint=False),
+                        np.linspace(1e-5, L, 3000)))
+    fine = build(x)
+    solver = sesame.solvers.Solver()
+    result = solver.solve(fine, compute='Poisson', verbose=False)
+    nx = fine.nx
+    for idx, vapp in enumerate(np.linspace(0, 0.8, 9)):
+        result['v'][nx-1] = solver.equilibrium[nx-1] + vapp / fine.scaling.energy
+        result = solver.solve(fine, guess=result, tol=1e-8, verbose=False)
+        if vapp in voltages:
+            Jf = sesame.Analyzer(fine, result).full_current()
+            errors.append(np.abs(J[voltages == vapp][0] - Jf) / np.abs(Jf))
+
+    error = max(errors)
+    print("error = {0}".format(error))
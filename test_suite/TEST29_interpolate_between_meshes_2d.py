@@ -0,0 +1,82 @@
+import sesame
+import numpy as np
+
+def system(x, y, input_length='cm', T=300):
+    # the same device in the given length unit
+    unit = 1e-2 if input_length == 'm' else 1.
+    sys = sesame.Builder(x * unit, y * unit, input_length=input_length, T=T)
+
+    # Dictionary with the material parameters
+    material = {'Nc':8e17, 'Nv':1.8e19, 'Eg':1.5, 'affinity':3.9, 'epsilon':9.4,
+            'mu_e':100, 'mu_h':100, 'tau_e':10e-9, 'tau_h':10e-9, 'Et':0}
+    if input_length == 'm':
+        material.update({'Nc':8e23, 'Nv':1.8e25, 'mu_e':100e-4, 'mu_h':100e-4})
+    sys.add_material(material)
+
+    junction = 50e-7 * unit # extent of the junction from the left contact
+    N = 1e6 if input_length == 'm' else 1.
+    sys.add_donor(1e17 * N, lambda pos: pos[0] < junction)
+    sys.add_acceptor(1e15 * N, lambda pos: pos[0] >= junction)
+
+    sys.contact_type('Ohmic', 'Ohmic')
+    S = 1e-2 if input_length == 'm' else 1.
+    sys.contact_S(1e7 * S, 0, 0, 1e7 * S)
+
+    phi = 1e17 / unit**2       # photon flux
+    alpha = 2.3e4 / unit       # absorption coefficient
+    sys.generation(lambda x, y: phi * alpha * np.exp(-alpha * x))
+    return sys
+
+def solve(sys, vapp, guess=None):
+    solver = sesame.solvers.Solver()
+    eq = solver.solve(sys, compute='Poisson', verbose=False)
+    nx = sys.nx
+    s = [nx-1 + j*nx for j in range(sys.ny)]
+    result = eq
+    for v in np.linspace(0, vapp, 5):
+        result['v'][s] = solver.equilibrium[s] + v / sys.scaling.energy
+        result = solver.solve(sys, guess=result, tol=1e-10, verbose=False)
+    return result
+
+def runTest29():
+
+    L = 3e-4 # length of the system in the x-direction [cm]
+    Ly = 1e-4 # length of the system in the y-direction [cm]
+
+    x1 = np.concatenate((np.linspace(0,1.2e-4, 60, endpoint=False),
+                         np.linspace(1.2e-4, L, 30)))
+    y1 = np.linspace(0, Ly, 6)
+    sys1 = system(x1, y1)
+
+    errors = []
+
+    # bilinear fields are interpolated exactly (contacts excluded)
+    x2 = np.concatenate((np.linspace(0,1.2e-4, 90, endpoint=False),
+                         np.linspace(1.2e-4, L, 40)))
+    y2 = np.linspace(0, Ly, 9)
+    sys2 = system(x2, y2)
+    f = lambda X, Y: 1 + 2e3*X - 3e4*Y + 5e7*X*Y
+    X, Y = np.meshgrid(x1, y1)
+    guess = sesame.interpolate(sys1, {'efn': f(X, Y).flatten()}, sys2)
+    X, Y = np.meshgrid(x2, y2)
+    errors.append(np.max(np.abs(guess['efn'] - f(X, Y).flatten())))
+
+    # a solution under bias interpolated onto a finer mesh in meters at
+    # another temperature: the contacts keep the applied voltage and the
+    # guess converges to the solution of the new system
+    vapp = 0.4
+    solution = solve(sys1, vapp)
+    sys3 = system(x2, y2, input_length='m', T=310)
+    guess = sesame.interpolate(sys1, solution, sys3)
+    solver = sesame.solvers.Solver()
+    veq = solver.solve(sys3, compute='Poisson', verbose=False)['v']
+    v = (guess['v'] - veq).reshape(sys3.ny, sys3.nx) * sys3.scaling.energy
+    errors.append(np.max(np.abs(v[:, -1] - vapp)))
+    errors.append(np.max(np.abs(v[:, 0])))
+    result = solver.solve(sys3, guess=guess, tol=1e-10, verbose=False)
+    reference = solve(sys3, vapp)
+    errors.extend(np.max(np.abs(result[key] - reference[key])) \
+                  for key in ('efn', 'efp', 'v'))
+
+    error = max(errors)
+    print("error = {0}".format(error))
@@ -0,0 +1,95 @@
+import sesame
+import numpy as np
+from scipy.spatial import Voronoi
+from sesame.utils import voronoi_boundaries, get_line_defects_sites
+
+def system():
+    L = 3e-4 # length of the system in the x-direction [cm]
+    Ly = 3e-4 # length of the system in the y-direction [cm]
+
+    # Mesh
+    x = np.concatenate((np.linspace(0,1.2e-4, 60, endpoint=False),
+                        np.linspace(1.2e-4, L, 30)))
+    y = np.linspace(0, Ly, 31)
+
+    # Create a system
+    sys = sesame.Builder(x, y)
+
+    # Dictionary with the material parameters
+    material = {'Nc':8e17, 'Nv':1.8e19, 'Eg':1.5, 'affinity':3.9, 'epsilon':9.4,
+            'mu_e':100, 'mu_h':100, 'tau_e':10e-9, 'tau_h':10e-9, 'Et':0}
+    sys.add_material(material)
+
+    junction = 50e-7 # extent of the junction from the left contact [cm]
+    sys.add_donor(1e17, lambda pos: pos[0] < junction)
+    sys.add_acceptor(1e15, lambda pos: pos[0] >= junction)
+
+    sys.contact_type('Ohmic', 'Ohmic')
+    sys.contact_S(1e7, 0, 0, 1e7)
+
+    phi = 1e17         # photon flux [1/(cm^2 s)]
+    alpha = 2.3e4      # absorption coefficient [1/cm]
+    sys.generation(lambda x, y: phi * alpha * np.exp(-alpha * x))
+
+    return sys
+
+def solve(sys):
+    solver = sesame.solvers.Solver()
+    solution = solver.solve(sys, compute='Poisson', verbose=False)
+    return solver.solve(sys, guess=solution, tol=1e-10, verbose=False)
+
+def runTest30():
+
+    L, Ly = 3e-4, 3e-4
+    errors = []
+
+    # boundaries with different parameters in a single defect, and as
+    # separate defects
+    boundaries = [[(20e-7, Ly/3), (L, Ly/3)], [(20e-7, 2*Ly/3), (L, 2*Ly/3)]]
+    N, E = [1e10, 3e10], [0.1, 0.2]
+    sys1 = system()
+    sys1.add_grain_boundaries(boundaries, N, 1e-15, E=E)
+    sys2 = system()
+    for idx, line in enumerate(boundaries):
+        sys2.add_defects(line, N[idx], 1e-15, E=E[idx])
+    if len(sys1.defects_list) != 1:
+        errors.append(1.)
+    s1, s2 = solve(sys1), solve(sys2)
+    errors.extend(np.max(np.abs(s1[key] - s2[key])) \
+                  for key in ('efn', 'efp', 'v'))
+    J1 = sesame.Analyzer(sys1, s1).full_current()
+    J2 = sesame.Analyzer(sys2, s2).full_current()
+    errors.append(np.abs((J1 - J2) / J2))
+
+    # crossing boundaries: the sites of the crossing are counted once
+    sys = system()
+    cross = [[(L/2, 0), (L/2, Ly)], [(0, Ly/2), (L, Ly/2)]]
+    sys.add_grain_boundaries(cross, 1e11, 1e-15, E=0)
+    sites = sys.defects_list[0].sites
+    union = np.union1d(get_line_defects_sites(sys, cross[0])[0],
+                       get_line_defects_sites(sys, cross[1])[0])
+    if len(sites) != len(np.unique(sites)) or \
+       not np.array_equal(np.sort(sites), union):
+        errors.append(1.)
+
+    # the Voronoi tessellation of four seeds in the corners of the system is
+    # the same cross, made of four edges clipped to the system
+    seeds = np.array([(L/4, Ly/4), (3*L/4, Ly/4), (L/4, 3*Ly/4), (3*L/4, 3*Ly/4)])
+    edges = voronoi_boundaries(sys, Voronoi(seeds))
+    if len(edges) != 4:
+        errors.append(1.)
+    length = 0
+    for (xa, ya), (xb, yb) in edges:
+        on_cross = (np.isclose(xa, L/2) and np.isclose(xb, L/2)) or \
+                   (np.isclose(ya, Ly/2) and np.isclose(yb, Ly/2))
+        if not on_cross:
+            errors.append(1.)
+        length += np.hypot(xb - xa, yb - ya)
+    errors.append(np.abs(length - (L + Ly)) / (L + Ly))
+    sys_voronoi = system()
+    sys_voronoi.add_grain_boundaries(Voronoi(seeds), 1e11, 1e-15, E=0)
+    if not np.array_equal(np.sort(sys_voronoi.defects_list[0].sites), union):
+        errors.append(1.)
+
+    error = max(errors)
+    print("error = {0}".format(error))
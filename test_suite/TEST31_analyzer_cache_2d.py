@@ -0,0 +1,109 @@
+import sesame
+import numpy as np
+from sesame.observables import get_n, get_p, get_jn, get_jp
+from sesame.defects import defectsF
+
+def runTest31():
+
+    L = 3e-4 # length of the system in the x-direction [cm]
+    Ly = 3e-4 # length of the system in the y-direction [cm]
+
+    # Mesh
+    x = np.concatenate((np.linspace(0,1.2e-4, 60, endpoint=False),
+                        np.linspace(1.2e-4, L, 30)))
+    y = np.linspace(0, Ly, 10)
+
+    # Create a system
+    sys = sesame.Builder(x, y)
+
+    # Dictionary with the material parameters
+    material = {'Nc':8e17, 'Nv':1.8e19, 'Eg':1.5, 'affinity':3.9, 'epsilon':9.4,
+            'mu_e':100, 'mu_h':100, 'tau_e':10e-9, 'tau_h':10e-9, 'Et':0,
+            'B':1e-10, 'Cn':1e-30, 'Cp':1e-30}
+    sys.add_material(material)
+
+    junction = 50e-7 # extent of the junction from the left contact [cm]
+    sys.add_donor(1e17, lambda pos: pos[0] < junction)
+    sys.add_acceptor(1e15, lambda pos: pos[0] >= junction)
+
+    sys.contact_type('Ohmic', 'Ohmic')
+    sys.contact_S(1e7, 0, 0, 1e7)
+
+    # grain boundary along the x-direction
+    sys.add_defects([(20e-7, Ly/2), (L, Ly/2)], 1e11, 1e-15, E=0.1)
+
+    phi = 1e17         # photon flux [1/(cm^2 s)]
+    alpha = 2.3e4      # absorption coefficient [1/cm]
+    sys.generation(lambda x, y: phi * alpha * np.exp(-alpha * x))
+
+    solver = sesame.solvers.Solver()
+    solution = solver.solve(sys, compute='Poisson', verbose=False)
+    solution = solver.solve(sys, guess=solution, tol=1e-10, verbose=False)
+
+    def reference(solution):
+        # quantities computed directly from the solution
+        efn, efp, v = solution['efn'], solution['efp'], solution['v']
+        sites = np.arange(sys.nx*sys.ny)
+        n, p = get_n(sys, efn, v, sites), get_p(sys, efp, v, sites)
+        srh = (n*p - sys.ni**2) / (sys.tau_h*(n+sys.n1) + sys.tau_e*(p+sys.p1))
+        defect = sys.defects_list[0]
+        r = np.zeros_like(n)
+        defectsF(sys, [defect], n, p, np.zeros_like(n), r=r)
+        rd = r[defect.sites] * defect.perp_dl
+        s = sites.reshape(sys.ny, sys.nx)[:, :-1].flatten()
+        dx = np.tile(sys.dx, sys.ny)
+        jn = get_jn(sys, efn, v, s, s+1, dx)
+        jp = get_jp(sys, efp, v, s, s+1, dx)
+        return {'n': n, 'p': p, 'srh': srh, 'defect': rd, 'jn': jn, 'jp': jp}
+
+    def values(az):
+        return {'n': az.electron_density(), 'p': az.hole_density(),
+                'srh': az.bulk_srh_rr(), 'defect': az.defect_rr(sys.defects_list[0]),
+                'jn': az.electron_current(), 'jp': az.hole_current()}
+
+    def compare(a, b):
+        return max(np.max(np.abs(a[k] - b[k]) / np.max(np.abs(b[k]))) for k in b)
+
+    errors = []
+    az = sesame.Analyzer(sys, solution)
+    ref = reference(solution)
+    line = ((0, Ly/2), (L, Ly/2))
+
+    # values computed the first time and read from the cache afterwards
+    errors.append(compare(values(az), ref))
+    J = az.full_current()
+    field = az.current_field()
+
+    # the arrays returned can be modified without changing the stored ones
+    for array in list(values(az).values()) + list(field):
+        array[:] = 0
+    errors.append(compare(values(az), ref))
+    errors.append(max(np.max(np.abs(a - b)) for a, b in \
+                      zip(az.current_field(), sesame.Analyzer(sys, solution).current_field())))
+    errors.append(np.abs(az.full_current() - J) / np.abs(J))
+
+    # values on a line are those of the sites of the line
+    _, sites = sesame.Analyzer.line(sys, *line)
+    n = az.electron_density(line)
+    errors.append(np.max(np.abs(n - ref['n'][sites]) / ref['n'][sites]))
+    n[:] = 0
+    errors.append(np.max(np.abs(az.electron_density(line) - ref['n'][sites]) \
+                         / ref['n'][sites]))
+
+    # total recombination from the cached rates
+    total = ref['srh'] + sys.B * (ref['n']*ref['p'] - sys.ni**2) \
+            + (sys.Cn*ref['n'] + sys.Cp*ref['p']) * (ref['n']*ref['p'] - sys.ni**2)
+    total[sys.defects_list[0].sites] += ref['defect']
+    errors.append(np.max(np.abs(az.total_rr() - total)) / np.max(np.abs(total)))
+
+    # after a modification of the solution, clear_cache gives the values of
+    # the new solution
+    solution['v'] += 0.01
+    solution['efn'] -= 0.02
+    az.clear_cache()
+    errors.append(compare(values(az), reference(solution)))
+    errors.append(np.abs(az.full_current() - \
+                  sesame.Analyzer(sys, solution).full_current()) / np.abs(J))
+
+    error = max(errors)
+    print("error = {0}".format(error))
@@ -0,0 +1,95 @@
+import sesame
+import numpy as np
+from scipy.interpolate import InterpolatedUnivariateSpline as spline
+from sesame.integration import quadrature_weights
+
+def spline_integral(sys, r):
+    # integral of a field along x for each y, and of the results along y,
+    # with the splines of the values
+    x = sys.xpts / sys.scaling.length
+    u = [spline(x, r[j*sys.nx:(j+1)*sys.nx]).integral(x[0], x[-1]) \
+         for j in range(sys.ny)]
+    if sys.ny == 1:
+        return u[0]
+    y = sys.ypts / sys.scaling.length
+    return spline(y, u).integral(y[0], y[-1])
+
+def runTest32():
+
+    errors = []
+
+    # weights of the rules on random nonuniform points
+    rng = np.random.RandomState(0)
+    for n in (2, 3, 4, 5, 10, 51):
+        x = np.sort(rng.uniform(0, 3, n))
+        f = np.sin(x) + x**2
+        k = min(3, n-1)
+        I = spline(x, f, k=k).integral(x[0], x[-1])
+        errors.append(np.abs(quadrature_weights(x).dot(f) - I) / np.abs(I))
+        # exact integrals of polynomials
+        P = lambda t: 1 + 2*t - t**2
+        I = (x[-1] - x[0]) + (x[-1]**2 - x[0]**2) - (x[-1]**3 - x[0]**3) / 3
+        if n > 2:
+            errors.append(np.abs(quadrature_weights(x, 'simpson').dot(P(x)) - I))
+        P = lambda t: 1 + 2*t
+        I = (x[-1] - x[0]) + (x[-1]**2 - x[0]**2)
+        errors.append(np.abs(quadrature_weights(x, 'trapezoid').dot(P(x)) - I))
+
+    L = 3e-4 # length of the system in the x-direction [cm]
+    Ly = 3e-4 # length of the system in the y-direction [cm]
+
+    # Mesh
+    x = np.concatenate((np.linspace(0,1.2e-4, 60, endpoint=False),
+                        np.linspace(1.2e-4, L, 30)))
+    y = np.concatenate((np.linspace(0, 1.25e-4, 8, endpoint=False),
+                        np.linspace(1.25e-4, 1.75e-4, 10, endpoint=False),
+                        np.linspace(1.75e-4, Ly, 8)))
+
+    # Create a system
+    sys = sesame.Builder(x, y)
+
+    # Dictionary with the material parameters
+    material = {'Nc':8e17, 'Nv':1.8e19, 'Eg':1.5, 'affinity':3.9, 'epsilon':9.4,
+            'mu_e':100, 'mu_h':100, 'tau_e':10e-9, 'tau_h':10e-9, 'Et':0,
+            'B':1e-10}
+    sys.add_material(material)
+
+    junction = 50e-7 # extent of the junction from the left contact [cm]
+    sys.add_donor(1e17, lambda pos: pos[0] < junction)
+    sys.add_acceptor(1e15, lambda pos: pos[0] >= junction)
+
+    sys.contact_type('Ohmic', 'Ohmic')
+    sys.contact_S(1e7, 0, 0, 1e7)
+
+    # grain boundary along the x-direction
+    sys.add_defects([(20e-7, Ly/2), (L, Ly/2)], 1e11, 1e-15, E=0.1)
+
+    phi = 1e17         # photon flux [1/(cm^2 s)]
+    alpha = 2.3e4      # absorption coefficient [1/cm]
+    sys.generation(lambda x, y: phi * alpha * np.exp(-alpha * x))
+
+    solver = sesame.solvers.Solver()
+    solution = solver.solve(sys, compute='Poisson', verbose=False)
+    solution = solver.solve(sys, guess=solution, tol=1e-10, verbose=False)
+    az = sesame.Analyzer(sys, solution)
+
+    # integrals of the recombination over the system, as with the splines
+    for integral, r in ((az.integrated_bulk_srh_recombination(), az.bulk_srh_rr()),
+                        (az.integrated_radiative_recombination(), az.radiative_rr())):
+        I = spline_integral(sys, r)
+        errors.append(np.abs(integral - I) / np.abs(I))
+
+    # several fields at once
+    fields = np.vstack((az.bulk_srh_rr(), sys.g))
+    I = sesame.integrate(sys, fields)
+    errors.extend(np.abs(I[k] - spline_integral(sys, f)) / np.abs(I[k]) \
+                  for k, f in enumerate(fields))
+
+    # integral along the grain boundary
+    defect = sys.defects_list[0]
+    X, _ = sesame.Analyzer.line(sys, *defect.location)
+    I = spline(X, az.defect_rr(defect)).integral(X[0], X[-1])
+    errors.append(np.abs(az.integrated_defect_recombination(defect) - I) / np.abs(I))
+
+    error = max(errors)
+    print("error = {0}".format(error))
@@ -0,0 +1,92 @@
+import sesame
+import numpy as np
+from scipy.interpolate import RegularGridInterpolator
+from sesame.observables import get_jn, get_jp
+
+def interpolate(xp, yp, f, x, y):
+    # bilinear interpolation of the values f of the mesh (xp, yp) on the grid
+    # (x, y), the points outside taking the values of the nearest edge
+    interp = RegularGridInterpolator((yp, xp), f.reshape(len(yp), len(xp)))
+    X, Y = np.meshgrid(np.clip(x, xp[0], xp[-1]), np.clip(y, yp[0], yp[-1]))
+    return interp(np.column_stack((Y.flatten(), X.flatten()))).reshape(len(y), len(x))
+
+def runTest33():
+
+    L = 3e-4 # length of the system in the x-direction [cm]
+    Ly = 3e-4 # length of the system in the y-direction [cm]
+
+    # Mesh
+    x = np.concatenate((np.linspace(0,1.2e-4, 60, endpoint=False),
+                        np.linspace(1.2e-4, L, 30)))
+    y = np.concatenate((np.linspace(0, 1.25e-4, 8, endpoint=False),
+                        np.linspace(1.25e-4, 1.75e-4, 10, endpoint=False),
+                        np.linspace(1.75e-4, Ly, 8)))
+
+    # Create a system
+    sys = sesame.Builder(x, y)
+
+    # Dictionary with the material parameters
+    material = {'Nc':8e17, 'Nv':1.8e19, 'Eg':1.5, 'affinity':3.9, 'epsilon':9.4,
+            'mu_e':100, 'mu_h':100, 'tau_e':10e-9, 'tau_h':10e-9, 'Et':0}
+    sys.add_material(material)
+
+    junction = 50e-7 # extent of the junction from the left contact [cm]
+    sys.add_donor(1e17, lambda pos: pos[0] < junction)
+    sys.add_acceptor(1e15, lambda pos: pos[0] >= junction)
+
+    sys.contact_type('Ohmic', 'Ohmic')
+    sys.contact_S(1e7, 0, 0, 1e7)
+
+    # grain boundary along the x-direction, so that the current has a
+    # y-component
+    sys.add_defects([(20e-7, Ly/2), (L, Ly/2)], 1e11, 1e-15, E=0.1)
+
+    phi = 1e17         # photon flux [1/(cm^2 s)]
+    alpha = 2.3e4      # absorption coefficient [1/cm]
+    sys.generation(lambda x, y: phi * alpha * np.exp(-alpha * x))
+
+    solver = sesame.solvers.Solver()
+    solution = solver.solve(sys, compute='Poisson', verbose=False)
+    solution = solver.solve(sys, guess=solution, tol=1e-10, verbose=False)
+    az = sesame.Analyzer(sys, solution)
+
+    errors = []
+    nx, ny = sys.nx, sys.ny
+    xm, ym = (x[:-1] + x[1:]) / 2, (y[:-1] + y[1:]) / 2
+    efn, efp, v = solution['efn'], solution['efp'], solution['v']
+
+    # currents between the sites computed directly and interpolated on the
+    # grid
+    sx = np.array([i + j*nx for j in range(ny) for i in range(nx-1)])
+    sy = np.array([i + j*nx for j in range(ny-1) for i in range(nx)])
+    dx, dy = np.tile(sys.dx, ny), np.repeat(sys.dy[:ny-1], nx)
+    for shape in ((100, 100), (37, 53)):
+        for electron, get_j, ef in ((True, get_jn, efn), (False, get_jp, efp)):
+            jx = get_j(sys, ef, v, sx, sx+1, dx)
+            jy = get_j(sys, ef, v, sy, sy+nx, dy)
+            xg, yg, Jx, Jy = az.current_field(electron, shape)
+            if Jx.shape != shape or Jy.shape != shape:
+                errors.append(1.)
+            errors.append(np.max(np.abs(xg - np.linspace(0, L, shape[1]))) / L)
+            errors.append(np.max(np.abs(yg - np.linspace(0, Ly, shape[0]))) / Ly)
+            Jx_ref = interpolate(xm, y, jx, xg, yg)
+            Jy_ref = interpolate(x, ym, jy, xg, yg)
+            errors.append(np.max(np.abs(Jx - Jx_ref)) / np.max(np.abs(Jx_ref)))
+            errors.append(np.max(np.abs(Jy - Jy_ref)) / np.max(np.abs(Jy_ref)))
+
+    # bilinear fields of the staggered meshes are resampled exactly inside
+    # them
+    f = lambda X, Y: 1 + 2e3*X - 3e4*Y + 5e7*X*Y
+    X, Y = np.meshgrid(xm, y)
+    jx = f(X, Y).flatten()
+    X, Y = np.meshgrid(x, ym)
+    jy = f(X, Y).flatten()
+    xg, yg, Jx, Jy = sesame.currents.current_field(sys, jx, jy, (41, 43))
+    X, Y = np.meshgrid(xg, yg)
+    inside = (X >= xm[0]) & (X <= xm[-1])
+    errors.append(np.max(np.abs(Jx - f(X, Y))[inside]))
+    inside = (Y >= ym[0]) & (Y <= ym[-1])
+    errors.append(np.max(np.abs(Jy - f(X, Y))[inside]))
+
+    error = max(errors)
+    print("error = {0}".format(error))
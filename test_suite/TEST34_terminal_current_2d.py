@@ -0,0 +1,92 @@
+import sesame
+import numpy as np
+from scipy.interpolate import InterpolatedUnivariateSpline as spline
+from sesame.observables import get_jn, get_jp
+
+def refine(a, r):
+    # mesh with r-1 nodes added in every interval
+    b = [a[0]]
+    for i in range(len(a)-1):
+        b.extend(np.linspace(a[i], a[i+1], r+1)[1:])
+    return np.array(b)
+
+def system(x, y):
+    L = 3e-4 # length of the system in the x-direction [cm]
+    Ly = 3e-4 # length of the system in the y-direction [cm]
+
+    # Create a system
+    sys = sesame.Builder(x, y)
+
+    # Dictionary with the material parameters
+    material = {'Nc':8e17, 'Nv':1.8e19, 'Eg':1.5, 'affinity':3.9, 'epsilon':9.4,
+            'mu_e':100, 'mu_h':100, 'tau_e':10e-9, 'tau_h':10e-9, 'Et':0}
+    sys.add_material(material)
+
+    junction = 50e-7 # extent of the junction from the left contact [cm]
+    sys.add_donor(1e17, lambda pos: pos[0] < junction)
+    sys.add_acceptor(1e15, lambda pos: pos[0] >= junction)
+
+    sys.contact_type('Ohmic', 'Ohmic')
+    sys.contact_S(1e7, 0, 0, 1e7)
+
+    # grain boundary along the x-direction: the current has a kink across it
+    sys.add_defects([(20e-7, Ly/2), (L, Ly/2)], 1e11, 1e-15, E=0.1)
+
+    phi = 1e17         # photon flux [1/(cm^2 s)]
+    alpha = 2.3e4      # absorption coefficient [1/cm]
+    sys.generation(lambda x, y: phi * alpha * np.exp(-alpha * x))
+
+    solver = sesame.solvers.Solver()
+    solution = solver.solve(sys, compute='Poisson', verbose=False)
+    solution = solver.solve(sys, guess=solution, tol=1e-10, verbose=False)
+    return sys, sesame.Analyzer(sys, solution)
+
+def runTest34():
+
+    L, Ly = 3e-4, 3e-4
+
+    # nonuniform mesh, finer around the grain boundary
+    x = np.concatenate((np.linspace(0,1.2e-4, 60, endpoint=False),
+                        np.linspace(1.2e-4, L, 30)))
+    y = np.concatenate((np.linspace(0, 1.25e-4, 5, endpoint=False),
+                        np.linspace(1.25e-4, 1.75e-4, 6, endpoint=False),
+                        np.linspace(1.75e-4, Ly, 5)))
+    sys, az = system(x, y)
+
+    errors = []
+
+    # the current is the same on all the planes, and is the terminal current
+    result = az.terminal_current()
+    J = az.full_current()
+    errors.append(np.abs(result['current'] - J) / np.abs(J))
+    errors.append(np.max(np.abs(result['planes'] - J)) / np.abs(J))
+    errors.append(result['error'])
+    errors.append(np.abs(result['electron'] + result['hole'] - J) / np.abs(J))
+
+    # current of the middle plane integrated with a spline, as in earlier
+    # versions
+    nx, ny = sys.nx, sys.ny
+    sites = np.array([nx//2 + j*nx for j in range(ny)])
+    efn, efp, v = az.efn, az.efp, az.v
+    dl = sys.dx[nx//2]
+    j = get_jn(sys, efn, v, sites, sites+1, dl) + get_jp(sys, efp, v, sites, sites+1, dl)
+    Y = sys.ypts / sys.scaling.length
+    Jm = spline(Y, j).integral(Y[0], Y[-1])
+    errors.append(np.abs(az.full_current(method='middle') - Jm) / np.abs(Jm))
+    try:
+        az.full_current(method='left')
+        errors.append(1.)
+    except ValueError:
+        pass
+
+    # convergence with the mesh in the y-direction: the current of the coarse
+    # mesh is closer to the current of a finer mesh than the current of the
+    # middle plane is
+    _, fine = system(x, refine(y, 4))
+    Jf = fine.full_current()
+    errors.append(np.abs(J - Jf) / np.abs(Jf))
+    if np.abs(J - Jf) >= np.abs(az.full_current(method='middle') - Jf) / 5:
+        errors.append(1.)
+
+    error = max(errors)
+    print("error = {0}".format(error))
@@ -0,0 +1,57 @@
+import sesame
+import numpy as np
+import os
+import tempfile
+
+def runTest9():
+
+    L = 3e-4 # length of the system in the x-direction [cm]
+
+    # Mesh
+    x = np.concatenate((np.linspace(0,1.2e-4, 100, endpoint=False),
+                        np.linspace(1.2e-4, L, 50)))
+
+    # Create a system
+    sys = sesame.Builder(x)
+
+    # Dictionary with the material parameters
+    material = {'Nc':8e17, 'Nv':1.8e19, 'Eg':1.5, 'affinity':3.9, 'epsilon':9.4,
+            'mu_e':100, 'mu_h':100, 'tau_e':10e-9, 'tau_h':10e-9, 'Et':0}
+    sys.add_material(material)
+
+    junction = 50e-7 # extent of the junction from the left contact [cm]
+    sys.add_donor(1e17, lambda x: x < junction)
+    sys.add_acceptor(1e15, lambda x: x >= junction)
+
+    sys.contact_type('Ohmic', 'Ohmic')
+    sys.contact_S(1e7, 0, 0, 1e7)
+
+    phi = 1e17         # photon flux [1/(cm^2 s)]
+    alpha = 2.3e4      # absorption coefficient [1/cm]
+    sys.generation(lambda x, y: phi * alpha * np.exp(-alpha * x))
+
+    voltages = np.linspace(0, 0.8, 9)
+
+    with tempfile.TemporaryDirectory() as folder:
+        # reference IV curve without database
+        jref = sesame.IVcurve(sys, voltages, os.path.join(folder, 'ref'),
+                              verbose=False, fmt='sweep')
+
+        # sweep stores written by a solver with a database: the first curve
+        # fills the database, the second one starts from its solutions
+        db = sesame.SolutionDatabase(os.path.join(folder, 'db'))
+        errors = []
+        for name in ('first', 'second'):
+            solver = sesame.solvers.Solver(database=db)
+            j = solver.IVcurve(sys, voltages, os.path.join(folder, name),
+                               verbose=False, fmt='sweep')
+            store = sesame.SweepStore(os.path.join(folder, name + '.sweep'))
+            if len(store) != len(voltages):
+                errors.append(1.)
+            stored = np.array([store.metadata(idx)['current']
+                               for idx in range(len(store))])
+            errors.append(np.max(np.abs((j - jref) / jref)))
+            errors.append(np.max(np.abs((stored - jref) / jref)))
+
+    error = max(errors)
+    print("error = {0}".format(error))
@@ -6,6 +6,32 @@ from TEST5_variable_epsilon_2d_abrupt import runTest5
 from TEST6_variable_epsilon_2d_periodic import runTest6
 from TEST7_variable_gap_2d_pillars_abrupt import runTest7
 from TEST8_variable_gap_2d_pillars_periodic import runTest8
+from TEST9_warm_start_database_sweep_1d import runTest9
+from TEST10_ac_admittance_low_frequency_1d import runTest10
+from TEST11_current_sensitivities_2d import runTest11
+from TEST12_generation_scan_1d import runTest12
+from TEST13_eqe_1d import runTest13
+from TEST14_surrogate_lifetime_sweep_2d import runTest14
+from TEST15_uniform_3d_vs_2d import runTest15
+from TEST16_compact_materials_2d import runTest16
+from TEST17_derived_systems_2d import runTest17
+from TEST18_defect_line_rasterization_2d import runTest18
+from TEST19_sweep_store_round_trip_1d import runTest19
+from TEST20_memory_mapped_results_1d import runTest20
+from TEST21_checkpoint_resume_1d import runTest21
+from TEST22_batch_analysis_index_1d import runTest22
+from TEST23_figures_of_merit_1d import runTest23
+from TEST24_legacy_pickle_1d import runTest24
+from TEST25_checkpoint_fingerprint_1d import runTest25
+from TEST26_async_writer_2d import runTest26
+from TEST27_nested_iterations_2d import runTest27
+from TEST28_adaptive_mesh_1d import runTest28
+from TEST29_interpolate_between_meshes_2d import runTest29
+from TEST30_grain_boundaries_2d import runTest30
+from TEST31_analyzer_cache_2d import runTest31
+from TEST32_integration_weights_2d import runTest32
+from TEST33_current_field_2d import runTest33
+from TEST34_terminal_current_2d import runTest34
 
 
 print("\nrunning test suite: error should be less than 0.01 for all sims")
@@ -34,3 +60,81 @@ runTest7()
 
 print("\nrunning test 8: 2d variable electronic structure periodic b.c.")
 runTest8()
+
+print("\nrunning test 9: 1d sweep store written with a warm-start database")
+runTest9()
+
+print("\nrunning test 10: 1d low frequency admittance")
+runTest10()
+
+print("\nrunning test 11: 2d adjoint sensitivities of the current")
+runTest11()
+
+print("\nrunning test 12: 1d linear response to generation profiles")
+runTest12()
+
+print("\nrunning test 13: 1d external quantum efficiency under bias light")
+runTest13()
+
+print("\nrunning test 14: 2d surrogate of a lifetime sweep")
+runTest14()
+
+print("\nrunning test 15: 3d system uniform along z against 2d")
+runTest15()
+
+print("\nrunning test 16: 2d compact material storage")
+runTest16()
+
+print("\nrunning test 17: 2d systems derived with other parameters")
+runTest17()
+
+print("\nrunning test 18: 2d rasterization of line defects")
+runTest18()
+
+print("\nrunning test 19: 1d sweep store round trip")
+runTest19()
+
+print("\nrunning test 20: 1d memory-mapped results sharing their system")
+runTest20()
+
+print("\nrunning test 21: 1d IV curve resumed from a checkpoint")
+runTest21()
+
+print("\nrunning test 22: 1d batch analysis reusing its index")
+runTest22()
+
+print("\nrunning test 23: 1d figures of merit against a dense IV curve")
+runTest23()
+
+print("\nrunning test 24: 1d and 2d systems saved before 3d support")
+runTest24()
+
+print("\nrunning test 25: 1d checkpoints of systems with a continuum of defect states")
+runTest25()
+
+print("\nrunning test 26: 2d background writing of simulation files")
+runTest26()
+
+print("\nrunning test 27: 2d nested iterations on coarsened meshes")
+runTest27()
+
+print("\nrunning test 28: 1d adaptive mesh refinement against a fine mesh")
+runTest28()
+
+print("\nrunning test 29: 2d interpolation of solutions between meshes and units")
+runTest29()
+
+print("\nrunning test 30: 2d grain boundaries in a single defect and Voronoi tessellations")
+runTest30()
+
+print("\nrunning test 31: 2d analyzer cache and copies of the returned arrays")
+runTest31()
+
+print("\nrunning test 32: 2d integration weights against the spline integrals")
+runTest32()
+
+print("\nrunning test 33: 2d current field against a direct interpolation of the currents")
+runTest33()
+
+print("\nrunning test 34: 2d terminal current of the planes and mesh convergence")
+runTest34()